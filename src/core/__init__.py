@@ -0,0 +1,10 @@
+from .shared.helpers.lazy_imports import lazy_exports
+
+# The domains are imported on first access, so importing one domain does not load the others
+__getattr__, __dir__ = lazy_exports(__name__, submodules=[
+    'account',
+    'expense',
+    'period',
+    'shared',
+    'user',
+])
@@ -0,0 +1,5 @@
+from .reminder_kind import ReminderKind
+
+__all__ = [
+    'ReminderKind',
+]
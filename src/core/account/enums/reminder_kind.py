@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class ReminderKind(str, Enum):
+    PAYMENT_DUE = 'payment_due'
+    CARD_CLOSING = 'card_closing'
+    CARD_EXPIRING = 'card_expiring'
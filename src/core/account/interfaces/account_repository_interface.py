@@ -11,5 +11,8 @@ T = TypeVar('T', bound=Account)
 
 class AccountRepositoryInterface(RepositoryBase[T], Generic[T]):
     @abstractmethod
-    def get_by_owner_id(self, owner_id: str, filters: Optional[FilterBase] = None) -> PaginatedResult[T]:
+    def get_by_owner_id(
+        self, owner_id: str, filters: Optional[FilterBase] = None, page: int = 1, page_size: Optional[int] = None
+    ) -> PaginatedResult[T]:
+        '''Get a page of the accounts of an owner. Without a page size, the repository default is used.'''
         ...
@@ -1,7 +1,17 @@
-from .account import Account
-from .credit_card import CreditCard
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .account import Account
+    from .credit_card import CreditCard
 
 __all__ = [
     'Account',
     'CreditCard',
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'Account': '.account',
+    'CreditCard': '.credit_card',
+})
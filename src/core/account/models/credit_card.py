@@ -1,13 +1,17 @@
 from uuid import UUID
-from typing import Optional, List
+from typing import TYPE_CHECKING, Dict, Optional, List
 from datetime import date
 
 
-from ...expense.models.expense import Expense
-from ...period.models.period import Period
+from ...shared.value_objects import Amount, Currency
+from ...shared.currency_rates import CurrencyConverter, available_amount, group_by_currency
+from ...shared.instrumentation import instrumented
 from ...user import User
 from .account import Account
-from core.shared.value_objects import Amount
+
+if TYPE_CHECKING:
+    from ...expense.models.expense import Expense
+    from ...period.models.period import Period
 
 
 class CreditCard(Account):
@@ -21,8 +25,8 @@ class CreditCard(Account):
         next_closing_date: Optional[date] = None,
         next_expiring_date: Optional[date] = None,
         financing_limit: Amount = Amount(0),
-        expenses: List[Expense] = [],
-        periods: List[Period] = [],
+        expenses: Optional[List['Expense']] = None,
+        periods: Optional[List['Period']] = None,
         id: Optional[UUID] = None,
     ):
         super().__init__(owner, alias, limit, is_enabled, id)
@@ -30,7 +34,7 @@ class CreditCard(Account):
         self._next_closing_date = next_closing_date
         self._next_expiring_date = next_expiring_date
         self._financing_limit = financing_limit
-        self._expenses = expenses
+        self._expenses = expenses if expenses is not None else []
         self._periods = periods if periods is not None else []
 
     @property
@@ -45,6 +49,11 @@ class CreditCard(Account):
             raise ValueError('main_credit_card_id must be a UUID or None')
         self._main_credit_card_id = value
 
+    @property
+    def family_id(self) -> UUID:
+        'Get the ID of the main card of the family, which is the card itself for a main card.'
+        return self._main_credit_card_id or self.id
+
     @property
     def next_closing_date(self) -> Optional[date]:
         'Get the next closing date of the credit card.'
@@ -82,25 +91,45 @@ class CreditCard(Account):
         self._financing_limit = value
 
     @property
+    @instrumented('credit_card.available_limit', items=lambda card: len(card.expenses))
     def available_limit(self) -> Amount:
         'Calculate the available limit of the credit card.'
-        total_expenses = sum(expense.pending_amount.value for expense in self._expenses)
-        return Amount(self._limit.value - total_expenses)
+        return available_amount(self._limit, self.pending_by_currency())
 
     @property
+    @instrumented('credit_card.available_financing_limit', items=lambda card: len(card.expenses))
     def available_financing_limit(self) -> Amount:
         'Calculate the available financing limit of the credit card.'
-        total_financing = sum(expense.pending_financing_amount.value for expense in self._expenses)
-        return Amount(self._financing_limit.value - total_financing)
+        return available_amount(self._financing_limit, self.pending_by_currency(financing=True))
+
+    def pending_by_currency(self, financing: bool = False) -> Dict[Currency, Amount]:
+        'Add up the pending (or pending financing) amounts of the expenses per currency.'
+        if financing:
+            return group_by_currency(expense.pending_financing_amount for expense in self._expenses)
+        return group_by_currency(expense.pending_amount for expense in self._expenses)
+
+    def available_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Calculate the available limit, converting the pending amounts to the currency of the limit.'
+        return available_amount(self._limit, self.pending_by_currency(), converter, on)
+
+    def available_financing_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Calculate the available financing limit, converting the pending financing amounts to the currency of the limit.'
+        return available_amount(self._financing_limit, self.pending_by_currency(financing=True), converter, on)
+
+    @property
+    def expenses(self) -> List['Expense']:
+        'Get the list of expenses associated with the credit card.'
+        return self._expenses
 
     @property
-    def periods(self) -> List[Period]:
+    def periods(self) -> List['Period']:
         'Get the list of periods associated with the credit card.'
         return self._periods
 
     @periods.setter
-    def periods(self, value: List[Period]):
+    def periods(self, value: List['Period']):
         'Set the list of periods associated with the credit card.'
+        from ...period.models.period import Period
         if not isinstance(value, list) or not all(isinstance(p, Period) for p in value):
             raise ValueError('periods must be a list of Period instances')
         self._periods = value
@@ -111,11 +140,11 @@ class CreditCard(Account):
         return cls(
             owner=User.from_dict(data['owner']),
             alias=data['alias'],
-            limit=Amount(data['limit']),
+            limit=Amount(data['limit'], currency=Currency(data.get('currency', Currency.ARS.value))),
             is_enabled=data.get('is_enabled', True),
             main_credit_card_id=data.get('main_credit_card_id'),
             next_closing_date=data.get('next_closing_date'),
             next_expiring_date=data.get('next_expiring_date'),
-            financing_limit=Amount(data.get('financing_limit', 0)),
+            financing_limit=Amount(data.get('financing_limit', 0), currency=Currency(data.get('currency', Currency.ARS.value))),
             id=data.get('id')
         )
@@ -0,0 +1,66 @@
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .card_snapshot import CardSnapshotStore
+    from .card_family import CardFamilyRegistry, CardFamilySummary
+    from .dashboard_summary import CardSummary, DashboardSummaryStore, MonthSummary
+    from .due_date_scheduler import DueDateScheduler, Reminder
+    from .financing_projection import FinancingMonth, FinancingProjection, PlanEnd, project_financing
+    from .nightly_batch import NightlyBatchReport, NightlyRepositories, ShardReport, iter_user_ids, run_nightly_batch, shard_of
+    from .scenario_simulation import Scenario, ScenarioBaseline, ScenarioOverlay, ScenarioResult, simulate, simulate_many
+
+__all__ = [
+    'CardFamilyRegistry',
+    'CardFamilySummary',
+    'CardSnapshotStore',
+    'CardSummary',
+    'DashboardSummaryStore',
+    'DueDateScheduler',
+    'FinancingMonth',
+    'FinancingProjection',
+    'MonthSummary',
+    'NightlyBatchReport',
+    'NightlyRepositories',
+    'PlanEnd',
+    'Reminder',
+    'Scenario',
+    'ScenarioBaseline',
+    'ScenarioOverlay',
+    'ScenarioResult',
+    'ShardReport',
+    'iter_user_ids',
+    'project_financing',
+    'run_nightly_batch',
+    'shard_of',
+    'simulate',
+    'simulate_many',
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'CardFamilyRegistry': '.card_family',
+    'CardFamilySummary': '.card_family',
+    'CardSnapshotStore': '.card_snapshot',
+    'CardSummary': '.dashboard_summary',
+    'DashboardSummaryStore': '.dashboard_summary',
+    'MonthSummary': '.dashboard_summary',
+    'DueDateScheduler': '.due_date_scheduler',
+    'Reminder': '.due_date_scheduler',
+    'FinancingMonth': '.financing_projection',
+    'FinancingProjection': '.financing_projection',
+    'PlanEnd': '.financing_projection',
+    'project_financing': '.financing_projection',
+    'NightlyBatchReport': '.nightly_batch',
+    'NightlyRepositories': '.nightly_batch',
+    'ShardReport': '.nightly_batch',
+    'iter_user_ids': '.nightly_batch',
+    'run_nightly_batch': '.nightly_batch',
+    'shard_of': '.nightly_batch',
+    'Scenario': '.scenario_simulation',
+    'ScenarioBaseline': '.scenario_simulation',
+    'ScenarioOverlay': '.scenario_simulation',
+    'ScenarioResult': '.scenario_simulation',
+    'simulate': '.scenario_simulation',
+    'simulate_many': '.scenario_simulation',
+})
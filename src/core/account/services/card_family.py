@@ -0,0 +1,170 @@
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from ...shared.currency_rates import CurrencyConverter, available_amount, group_by_currency
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.value_objects import Amount, Currency
+from ...expense.events import PaymentEvent
+from ..models import CreditCard
+
+YearMonth = Tuple[int, int]
+
+
+class CardFamilySummary:
+    '''
+    Consolidated figures of a main credit card and its additional cards.
+
+    The pending amounts and the period totals are kept per currency. The available limits raise
+    CurrencyMismatchException when some pending amounts are in another currency than the limit,
+    like `CreditCard.available_limit`, and the `_in` variants convert them.
+    '''
+
+    def __init__(
+        self,
+        main_card_id: UUID,
+        member_ids: List[UUID],
+        limit: Amount,
+        financing_limit: Amount,
+        pending: Dict[Currency, Amount],
+        pending_financing: Dict[Currency, Amount],
+        period_totals: Dict[YearMonth, Dict[Currency, Amount]],
+    ):
+        self.main_card_id = main_card_id
+        self.member_ids = member_ids  # The main card and its additional cards
+        self.limit = limit  # Shared limit, taken from the main card
+        self.financing_limit = financing_limit  # Shared financing limit, taken from the main card
+        self.pending = pending  # Pending amount of every member, per currency
+        self.pending_financing = pending_financing  # Pending financing amount of every member, per currency
+        self.period_totals = period_totals  # Merged total of the periods of every member, per currency
+
+    @property
+    def available_limit(self) -> Amount:
+        'Get the available shared limit.'
+        return available_amount(self.limit, self.pending)
+
+    @property
+    def available_financing_limit(self) -> Amount:
+        'Get the available shared financing limit.'
+        return available_amount(self.financing_limit, self.pending_financing)
+
+    def available_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available shared limit, converting the pending amounts to the currency of the limit.'
+        return available_amount(self.limit, self.pending, converter, on)
+
+    def available_financing_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available shared financing limit, converting the pending financing amounts to the currency of the limit.'
+        return available_amount(self.financing_limit, self.pending_financing, converter, on)
+
+
+class CardFamilyRegistry:
+    '''
+    Groups credit cards by main card and serves their consolidated figures.
+
+    Additional cards share the limits of their main card, so the available limits of a family
+    are computed in one pass over the expenses and periods of all its members. The result is
+    cached per family and recomputed when a member changes: explicitly with `invalidate`, through
+    the payment events of its expenses, or when a read finds that the limits of a member were set
+    or that expenses or periods were added to or removed from it. Replacing an expense or a period
+    in place keeps the sizes, so call `invalidate` after that.
+    '''
+
+    def __init__(self, cards: Iterable[CreditCard] = (), dispatcher: EventDispatcher = default_dispatcher):
+        self._dispatcher = dispatcher
+        self._cards: Dict[UUID, CreditCard] = {}
+        self._families: Dict[UUID, List[UUID]] = {}
+        self._summaries: Dict[UUID, Tuple[List[tuple], CardFamilySummary]] = {}  # With the state of the members they were computed from
+        for card in cards:
+            self.add_card(card)
+
+    def add_card(self, card: CreditCard) -> None:
+        'Register a card, or re-register it after its main card changed.'
+        self.remove_card(card.id)
+        self._cards[card.id] = card
+        self._families.setdefault(card.family_id, []).append(card.id)
+        self._summaries.pop(card.family_id, None)
+
+    def remove_card(self, card_id: UUID) -> None:
+        'Unregister a card.'
+        card = self._cards.pop(card_id, None)
+        if card is None:
+            return
+        for family_id, member_ids in self._families.items():
+            if card_id in member_ids:
+                member_ids.remove(card_id)
+                self._summaries.pop(family_id, None)
+                break
+
+    def family_of(self, card_id: UUID) -> Optional[UUID]:
+        'Get the ID of the main card of the family a card belongs to.'
+        card = self._cards.get(card_id)
+        return card.family_id if card is not None else None
+
+    def invalidate(self, card_id: UUID) -> None:
+        'Drop the cached summary of the family of a card.'
+        family_id = self.family_of(card_id)
+        if family_id is not None:
+            self._summaries.pop(family_id, None)
+
+    def get_summary(self, card_id: UUID) -> Optional[CardFamilySummary]:
+        '''
+        Get the consolidated figures of the family of a card, computing them if needed.
+
+        :raises ValueError: If the main card of the family is not registered, since it holds the shared limits.
+        '''
+        family_id = self.family_of(card_id)
+        if family_id is None:
+            return None
+        states = [self.__state(self._cards[member_id]) for member_id in self._families[family_id]]
+        cached = self._summaries.get(family_id)
+        if cached is None or len(cached[0]) != len(states) or not all(map(self.__same_state, cached[0], states)):
+            cached = self._summaries[family_id] = (states, self.__summarize(family_id))
+        return cached[1]
+
+    def subscribe(self) -> None:
+        'Invalidate the family summaries when the payments of their cards change.'
+        self._dispatcher.subscribe(PaymentEvent, self._on_payment_event)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentEvent, self._on_payment_event)
+
+    def _on_payment_event(self, event: PaymentEvent) -> None:
+        self.invalidate(event.payment.expense.account.id)
+
+    @staticmethod
+    def __state(card: CreditCard) -> tuple:
+        'Get what the summary takes from a card besides its payments: its limits and its lists of expenses and periods, with their sizes.'
+        return card.limit, card.financing_limit, card.expenses, len(card.expenses), card.periods, len(card.periods)
+
+    @staticmethod
+    def __same_state(state: tuple, other: tuple) -> bool:
+        'Check if a card is in the same state, comparing the limits and lists by identity and the sizes by value.'
+        return all(value is other_value or (isinstance(value, int) and value == other_value) for value, other_value in zip(state, other))
+
+    def __summarize(self, family_id: UUID) -> CardFamilySummary:
+        'Compute the figures of a family in one pass over its members.'
+        member_ids = list(self._families.get(family_id, []))
+        members = [self._cards[member_id] for member_id in member_ids]
+        main_card = self._cards.get(family_id)
+        if main_card is None:
+            raise ValueError(f'The main card {family_id} of the family is not registered')
+        pending: List[Amount] = []
+        financing: List[Amount] = []
+        period_amounts: Dict[YearMonth, List[Amount]] = {}
+        for card in members:
+            for expense in card.expenses:
+                pending.append(expense.pending_amount)
+                financing.append(expense.pending_financing_amount)
+            for period in card.periods:
+                key = (period.year.value, period.month.value)
+                period_amounts.setdefault(key, []).extend(payment.amount for payment in period.payments)
+        return CardFamilySummary(
+            main_card_id=family_id,
+            member_ids=member_ids,
+            limit=main_card.limit,
+            financing_limit=main_card.financing_limit,
+            pending=group_by_currency(pending),
+            pending_financing=group_by_currency(financing),
+            period_totals={key: group_by_currency(amounts) for key, amounts in sorted(period_amounts.items())},
+        )
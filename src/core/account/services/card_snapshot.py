@@ -0,0 +1,370 @@
+import mmap
+import os
+import struct
+from array import array
+from datetime import date
+from typing import Dict, List, Optional, Set, Type
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.interning import DEFAULT_MAX_STRINGS, StringInterner
+from ...shared.instrumentation import instrumented
+from ...shared.value_objects import Currency, Month, Year
+from ...expense.events import ExpenseRenamed, PaymentEvent
+from ...expense.models import Expense, ExpenseCategory, Payment
+from ...expense.services.compact_records import EXPENSE_STATUS_CODEC, EXPENSE_TYPE_CODEC, PAYMENT_STATUS_CODEC
+from ...expense.services.payment_ledger import hydrate_expense
+from ...period.models.period import Period
+from ..models import CreditCard
+
+# The enums are stored by their codec codes, so reordering their members needs a new FORMAT_VERSION
+_NO_CATEGORY = bytes(16)
+
+
+def _ordinal(value: Optional[date]) -> int:
+    return value.toordinal() if value is not None else 0
+
+
+def _date(ordinal: int) -> Optional[date]:
+    return date.fromordinal(ordinal) if ordinal else None
+
+
+def _padding(size: int) -> bytes:
+    'Get the zero bytes that align the next section to 8 bytes.'
+    return bytes(-size % 8)
+
+
+class CardSnapshotStore:
+    '''
+    Local cache of the expenses, payments and periods of credit cards as compact binary images.
+
+    Each card is written to its own file: a header, a table of the distinct strings (titles,
+    credit card names and currencies), one fixed size record per expense and per period, and the
+    payments stored by column. A snapshot is read through a memory map and the numeric columns are
+    cast in place, so only the entities themselves are allocated while hydrating.
+
+    A snapshot records the version of the card and is ignored, and dropped, when the card has been
+    saved since. It also records the versions of the expenses and payments, which are checked when
+    the caller passes their current versions to `load`. Once subscribed, the snapshot of a card is also marked stale when the payments or
+    the names of its expenses change, since those are saved without the card. Marking a card costs
+    a set insertion; the file is dropped on its next load. A truncated or corrupt file is dropped
+    too, so the caller falls back to the repository and saves a new one.
+
+    Periods are only cached when a `period_type` is given to build them.
+    '''
+
+    MAGIC = b'SMMC'
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct('<4sH2x16sQIIIIII')
+    EXPENSE = struct.Struct('<16s16sQqiiIIIIIHBBB7x')
+    PERIOD = struct.Struct('<16sQHHII')
+
+    def __init__(
+        self,
+        directory: str,
+        period_type: Optional[Type[Period]] = None,
+        interner: Optional[StringInterner] = None,
+        dispatcher: EventDispatcher = default_dispatcher,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._period_type = period_type
+        # Shares the repeated strings of the snapshots loaded by this store
+        self._interner = interner if interner is not None else StringInterner(DEFAULT_MAX_STRINGS)
+        self._dispatcher = dispatcher
+        self._stale: Set[UUID] = set()  # Cards changed since their snapshot was written
+
+    def __contains__(self, card_id: UUID) -> bool:
+        return card_id not in self._stale and os.path.exists(self.path(card_id))
+
+    def path(self, card_id: UUID) -> str:
+        'Get the path of the snapshot file of a card.'
+        return os.path.join(self._directory, f'{card_id.hex}.snapshot')
+
+    @instrumented('card_snapshot.save', items=lambda store, card: len(card.expenses))
+    def save(self, card: CreditCard) -> int:
+        '''
+        Write the snapshot of a card, replacing the previous one atomically.
+
+        :param card: The credit card, with its expenses, payments and periods loaded.
+        :return: The size of the snapshot in bytes.
+        :raises ValueError: If a period holds a payment of an expense that is not loaded in the card,
+            since the snapshot could not restore it.
+        '''
+        # Cleared first, so a change made while writing marks the new snapshot stale again
+        self._stale.discard(card.id)
+        strings: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(strings)
+            return index
+
+        expense_records = []
+        payments: List[Payment] = []
+        for expense in card.expenses:
+            category = expense.category_id
+            category_id = getattr(category, 'id', category)
+            expense_records.append(self.EXPENSE.pack(
+                expense.id.bytes,
+                category_id.bytes if isinstance(category_id, UUID) else _NO_CATEGORY,
+                expense.version,
+                to_cents(expense.amount),
+                _ordinal(expense.acquired_at),
+                _ordinal(expense.first_payment_date),
+                intern(expense.title),
+                intern(expense.cc_name),
+                intern(expense.amount.currency.value),
+                len(payments),
+                len(expense.payments),
+                expense.installments,
+                EXPENSE_TYPE_CODEC.encode(expense.expense_type),
+                EXPENSE_STATUS_CODEC.encode(expense.status),
+                expense.amount.precision,
+            ))
+            payments.extend(expense.payments)
+
+        positions = {payment.id: position for position, payment in enumerate(payments)}
+        period_records = []
+        period_refs = array('I')
+        if self._period_type is not None:
+            for period in card.periods:
+                refs = []
+                for payment in period.payments:
+                    position = positions.get(payment.id)
+                    if position is None:
+                        raise ValueError(
+                            f'Period {period.id} holds payment {payment.id}, whose expense is not loaded in card {card.id}'
+                        )
+                    refs.append(position)
+                period_records.append(self.PERIOD.pack(
+                    period.id.bytes, period.version, period.year.value, period.month.value, len(period_refs), len(refs)
+                ))
+                period_refs.extend(refs)
+
+        encoded = [value.encode('utf-8') for value in strings]
+        string_offsets = array('I', [0])
+        for value in encoded:
+            string_offsets.append(string_offsets[-1] + len(value))
+        blob = b''.join(encoded)
+
+        sections = [
+            string_offsets.tobytes(),
+            blob,
+            b''.join(expense_records),
+            b''.join(payment.id.bytes for payment in payments),
+            array('Q', (payment.version for payment in payments)).tobytes(),
+            array('q', (to_cents(payment.amount) for payment in payments)).tobytes(),
+            array('i', (_ordinal(payment.payment_date) for payment in payments)).tobytes(),
+            array('I', (payment.no_installment for payment in payments)).tobytes(),
+            bytes(PAYMENT_STATUS_CODEC.encode(payment.status) for payment in payments),
+            b''.join(period_records),
+            period_refs.tobytes(),
+        ]
+        header = self.HEADER.pack(
+            self.MAGIC, self.FORMAT_VERSION, card.id.bytes, card.version,
+            len(strings), len(blob), len(expense_records), len(payments), len(period_records), len(period_refs),
+        )
+        path = self.path(card.id)
+        temporary_path = f'{path}.tmp'
+        size = 0
+        with open(temporary_path, 'wb') as file:
+            for section in [header, *sections]:
+                file.write(section)
+                file.write(_padding(len(section)))
+                size += len(section) + len(_padding(len(section)))
+        os.replace(temporary_path, path)
+        return size
+
+    @instrumented('card_snapshot.load')
+    def load(
+        self,
+        card: CreditCard,
+        categories: Optional[Dict[UUID, ExpenseCategory]] = None,
+        versions: Optional[Dict[UUID, int]] = None,
+    ) -> bool:
+        '''
+        Fill a card with the expenses, payments and periods of its snapshot.
+
+        :param card: The credit card, loaded without its expenses and periods.
+        :param categories: The categories of the expenses by ID. The expenses of other categories
+            keep the category ID.
+        :param versions: The stored versions of every expense and payment of the card by ID, e.g.
+            from a query of their IDs and versions. The snapshot is dropped when they differ from
+            its own, or when expenses or payments were added or removed since it was written.
+        :return: Whether the card was filled, False if there is no valid snapshot.
+        '''
+        if card.id in self._stale:
+            return self.__discard(card.id)
+        path = self.path(card.id)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return False
+        with file:
+            if os.fstat(file.fileno()).st_size < self.HEADER.size:
+                return self.__discard(card.id)
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, format_version, card_id, card_version, *counts = self.HEADER.unpack_from(data, 0)
+                if magic != self.MAGIC or format_version != self.FORMAT_VERSION or card_id != card.id.bytes:
+                    return self.__discard(card.id)
+                if card_version != card.version:
+                    return self.__discard(card.id)
+                try:
+                    expenses, periods = self.__hydrate(card, data, *counts, categories=categories or {})
+                except (struct.error, TypeError, ValueError, IndexError, OverflowError):
+                    # Truncated or corrupt: the sections overrun the file or hold invalid values
+                    return self.__discard(card.id)
+        if versions is not None and not self.__versions_match(expenses, versions):
+            return self.__discard(card.id)
+        card.expenses[:] = expenses
+        if periods is not None:
+            card.periods = periods
+        return True
+
+    def invalidate(self, card_id: UUID) -> None:
+        'Drop the snapshot of a card.'
+        self._stale.discard(card_id)
+        try:
+            os.remove(self.path(card_id))
+        except FileNotFoundError:
+            pass
+
+    def subscribe(self) -> None:
+        'Mark stale the snapshots of the cards whose expenses change.'
+        self._dispatcher.subscribe(PaymentEvent, self._on_payment_event)
+        self._dispatcher.subscribe(ExpenseRenamed, self._on_expense_renamed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the expense and payment events.'
+        self._dispatcher.unsubscribe(PaymentEvent, self._on_payment_event)
+        self._dispatcher.unsubscribe(ExpenseRenamed, self._on_expense_renamed)
+
+    def _on_payment_event(self, event: PaymentEvent) -> None:
+        self._stale.add(event.payment.expense.account.id)
+
+    def _on_expense_renamed(self, event: ExpenseRenamed) -> None:
+        self._stale.add(event.expense.account.id)
+
+    @staticmethod
+    def __versions_match(expenses: List[Expense], versions: Dict[UUID, int]) -> bool:
+        'Check if the snapshot holds every expense and payment at its stored version, and nothing else.'
+        entities = 0
+        for expense in expenses:
+            if versions.get(expense.id) != expense.version:
+                return False
+            for payment in expense.payments:
+                if versions.get(payment.id) != payment.version:
+                    return False
+            entities += 1 + len(expense.payments)
+        return entities == len(versions)
+
+    def __discard(self, card_id: UUID) -> bool:
+        self.invalidate(card_id)
+        return False
+
+    def __hydrate(
+        self,
+        card: CreditCard,
+        data: mmap.mmap,
+        string_count: int,
+        blob_size: int,
+        expense_count: int,
+        payment_count: int,
+        period_count: int,
+        period_ref_count: int,
+        categories: Dict[UUID, ExpenseCategory],
+    ):
+        'Build the expenses and periods of a snapshot.'
+        view = memoryview(data)
+        columns: List[memoryview] = []
+        offset = self.HEADER.size + len(_padding(self.HEADER.size))
+
+        def section(size: int, format: Optional[str] = None) -> memoryview:
+            nonlocal offset
+            start = offset
+            offset += size + len(_padding(size))
+            column = view[start:start + size]
+            if format is not None:
+                column = column.cast(format)
+            columns.append(column)
+            return column
+
+        try:
+            string_offsets = section(4 * (string_count + 1), 'I')
+            blob = section(blob_size)
+            strings = [
+                self._interner.intern(str(blob[string_offsets[i]:string_offsets[i + 1]], 'utf-8'))
+                for i in range(string_count)
+            ]
+            expense_section = section(self.EXPENSE.size * expense_count)
+            ids = section(16 * payment_count)
+            versions = section(8 * payment_count, 'Q')
+            amounts = section(8 * payment_count, 'q')
+            dates = section(4 * payment_count, 'i')
+            installments = section(4 * payment_count, 'I')
+            statuses = section(payment_count)
+            period_section = section(self.PERIOD.size * period_count)
+            period_refs = section(4 * period_ref_count, 'I')
+
+            currencies: Dict[str, Currency] = {}
+            expenses: List[Expense] = []
+            payments: List[Payment] = []
+            for (expense_id, category_id, expense_version, amount, acquired_at, first_payment_date, title, cc_name,
+                 currency_index, first_payment, expense_payments, expense_installments, expense_type, status,
+                 precision) in self.EXPENSE.iter_unpack(expense_section):
+                currency = currencies.get(strings[currency_index])
+                if currency is None:
+                    currency = currencies[strings[currency_index]] = Currency(strings[currency_index])
+                expense_payments_list = []
+                for position in range(first_payment, first_payment + expense_payments):
+                    payment = Payment(
+                        expense=None,
+                        amount=from_cents(amounts[position], precision, currency),
+                        no_installment=installments[position],
+                        status=PAYMENT_STATUS_CODEC.decode(statuses[position]),
+                        payment_date=_date(dates[position]),
+                        id=UUID(bytes=bytes(ids[16 * position:16 * position + 16])),
+                    )
+                    payment.version = versions[position]
+                    expense_payments_list.append(payment)
+                category = None
+                if category_id != _NO_CATEGORY:
+                    category = categories.get(UUID(bytes=category_id)) or UUID(bytes=category_id)
+                expense = hydrate_expense(
+                    EXPENSE_TYPE_CODEC.decode(expense_type),
+                    EXPENSE_STATUS_CODEC.decode(status),
+                    expense_payments_list,
+                    installments=expense_installments,
+                    account=card,
+                    title=strings[title],
+                    cc_name=strings[cc_name],
+                    acquired_at=_date(acquired_at),
+                    amount=from_cents(amount, precision, currency),
+                    first_payment_date=_date(first_payment_date),
+                    category=category,
+                    id=UUID(bytes=expense_id),
+                )
+                expense.version = expense_version
+                expenses.append(expense)
+                payments.extend(expense_payments_list)
+
+            periods = None
+            if self._period_type is not None:
+                periods = []
+                for period_id, period_version, year, month, first_ref, ref_count in self.PERIOD.iter_unpack(period_section):
+                    period = self._period_type(
+                        month=Month(month),
+                        year=Year(year),
+                        payments=[payments[period_refs[i]] for i in range(first_ref, first_ref + ref_count)],
+                        id=UUID(bytes=period_id),
+                    )
+                    period.version = period_version
+                    periods.append(period)
+            return expenses, periods
+        finally:
+            for column in reversed(columns):
+                column.release()
+            view.release()
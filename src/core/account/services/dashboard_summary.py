@@ -0,0 +1,341 @@
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from ...shared.currency_rates import CurrencyConverter
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.exceptions import CurrencyMismatchException
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.value_objects import Amount, Currency
+from ...expense.enums import ExpenseType, FINAL_PAYMENT_STATUSES, NON_SPENDING_PAYMENT_STATUSES, PaymentStatus
+from ...expense.events import PaymentAdded, PaymentRemoved, PaymentUpdated
+from ...expense.models import Expense, Payment
+from ..models import Account, CreditCard
+
+YearMonth = Tuple[int, int]
+
+
+class MonthSummary:
+    'Totals of the payments of one card in one month and one currency.'
+
+    def __init__(self, currency: Currency):
+        self.currency = currency
+        self.total_cents = 0
+        self.one_time_cents = 0
+        self.last_installment_cents = 0
+        self.subscription_cents = 0
+        self.count = 0
+
+    @property
+    def total(self) -> Amount:
+        'Get the total amount of the payments of the month.'
+        return from_cents(self.total_cents, currency=self.currency)
+
+    @property
+    def one_time_payments(self) -> Amount:
+        'Get the total amount of the purchases paid in one installment.'
+        return from_cents(self.one_time_cents, currency=self.currency)
+
+    @property
+    def last_installments(self) -> Amount:
+        'Get the total amount of the pending last installments of purchases in installments.'
+        return from_cents(self.last_installment_cents, currency=self.currency)
+
+    @property
+    def subscriptions(self) -> Amount:
+        'Get the total amount of the subscription payments.'
+        return from_cents(self.subscription_cents, currency=self.currency)
+
+    def is_empty(self) -> bool:
+        'Check if no payment is counted in the month.'
+        return not (self.count or self.total_cents or self.one_time_cents or self.last_installment_cents or self.subscription_cents)
+
+    def copy(self) -> 'MonthSummary':
+        'Get a copy of the summary, safe to keep while the store is updated.'
+        summary = MonthSummary(self.currency)
+        summary.total_cents = self.total_cents
+        summary.one_time_cents = self.one_time_cents
+        summary.last_installment_cents = self.last_installment_cents
+        summary.subscription_cents = self.subscription_cents
+        summary.count = self.count
+        return summary
+
+
+class CardSummary:
+    'Limits, pending amounts and monthly totals of one credit card.'
+
+    def __init__(self, card_id: UUID, alias: str, limit: Amount, financing_limit: Amount):
+        self.card_id = card_id
+        self.alias = alias
+        self.limit = limit
+        self.financing_limit = financing_limit
+        self.pending_cents: Dict[Currency, int] = {}  # Taken from the limit
+        self.financing_cents: Dict[Currency, int] = {}  # Taken from the financing limit
+        self.months: Dict[YearMonth, Dict[Currency, MonthSummary]] = {}
+
+    @property
+    def available_limit(self) -> Amount:
+        'Get the available limit of the card.'
+        return self.__available(self.limit, self.pending_cents)
+
+    @property
+    def available_financing_limit(self) -> Amount:
+        'Get the available financing limit of the card.'
+        return self.__available(self.financing_limit, self.financing_cents)
+
+    def available_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available limit, converting the pending amounts to the currency of the limit.'
+        return self.__available_in(self.limit, self.pending_cents, converter, on)
+
+    def available_financing_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available financing limit, converting the pending financing amounts to the currency of the limit.'
+        return self.__available_in(self.financing_limit, self.financing_cents, converter, on)
+
+    def month(self, year: int, month: int, currency: Optional[Currency] = None) -> MonthSummary:
+        'Get the totals of a month, by default in the currency of the limit.'
+        currency = currency or self.limit.currency
+        summary = self.months.get((year, month), {}).get(currency)
+        return summary if summary is not None else MonthSummary(currency)
+
+    def copy(self, start: Optional[YearMonth] = None, end: Optional[YearMonth] = None) -> 'CardSummary':
+        'Get a copy of the summary with the months between two year-months, both included.'
+        summary = CardSummary(self.card_id, self.alias, self.limit, self.financing_limit)
+        summary.pending_cents = dict(self.pending_cents)
+        summary.financing_cents = dict(self.financing_cents)
+        summary.months = {
+            year_month: {currency: month.copy() for currency, month in currencies.items()}
+            for year_month, currencies in sorted(self.months.items())
+            if (start is None or year_month >= start) and (end is None or year_month <= end)
+        }
+        return summary
+
+    @staticmethod
+    def __available(limit: Amount, pending_cents: Dict[Currency, int]) -> Amount:
+        other_currencies = [currency.value for currency, cents in pending_cents.items() if cents and currency != limit.currency]
+        if other_currencies:
+            raise CurrencyMismatchException(
+                f'The card has pending amounts in {", ".join(sorted(other_currencies))}, use a converter to get its available limit.'
+            )
+        return from_cents(to_cents(limit) - pending_cents.get(limit.currency, 0), limit.precision, limit.currency)
+
+    @staticmethod
+    def __available_in(limit: Amount, pending_cents: Dict[Currency, int], converter: CurrencyConverter, on: date) -> Amount:
+        totals = {currency: from_cents(cents, currency=currency) for currency, cents in pending_cents.items() if cents}
+        pending = converter.convert_totals(totals, limit.currency, on, limit.precision)
+        return from_cents(to_cents(limit) - to_cents(pending), limit.precision, limit.currency)
+
+
+class DashboardSummaryStore:
+    '''
+    Materialized (user, card, year-month) summaries of the payments, for the dashboard.
+
+    Every payment adds its amount to the totals of its card, month and currency, and its pending
+    amount to the limits of its card, so the summaries are updated incrementally from the payment
+    events and can be rebuilt in bulk from the cards. The dashboard of a user, with every card and
+    month, is read with one call that never touches the expenses or their payments.
+
+    The last installment of a purchase in installments is its highest pending installment, as in
+    `Payment.is_last_payment` and `Period.total_last_payments`. Paying it moves the last installment
+    to another payment, so every change of a payment of the purchase moves its contribution.
+
+    The payment events arrive from whichever thread changed the payment, so the summaries are only
+    read and written holding the lock of the store.
+    '''
+
+    def __init__(self, dispatcher: EventDispatcher = default_dispatcher):
+        self._dispatcher = dispatcher
+        self._lock = threading.RLock()
+        self._users: Dict[UUID, Dict[UUID, CardSummary]] = {}
+        self._owners: Dict[UUID, UUID] = {}  # Owner of each card
+        self._last_installments: Dict[UUID, Tuple[CardSummary, YearMonth, Currency, int]] = {}  # Counted contribution of each purchase
+
+    def add_card(self, card: Account) -> None:
+        'Register a card, or refresh its alias and limits after it was saved.'
+        with self._lock:
+            summary = self.__summary(card)
+            summary.alias = card.alias
+            summary.limit = card.limit
+            summary.financing_limit = getattr(card, 'financing_limit', Amount(0, currency=card.limit.currency))
+
+    def remove_card(self, card_id: UUID) -> None:
+        'Drop the summary of a card.'
+        with self._lock:
+            owner_id = self._owners.pop(card_id, None)
+            if owner_id is None:
+                return
+            cards = self._users[owner_id]
+            summary = cards.pop(card_id, None)
+            if not cards:
+                del self._users[owner_id]
+            self._last_installments = {
+                expense_id: counted for expense_id, counted in self._last_installments.items() if counted[0] is not summary
+            }
+
+    def get(self, card_id: UUID) -> Optional[CardSummary]:
+        'Get a copy of the summary of a card.'
+        with self._lock:
+            owner_id = self._owners.get(card_id)
+            if owner_id is None:
+                return None
+            return self._users[owner_id][card_id].copy()
+
+    def dashboard(self, user_id: UUID, start: Optional[YearMonth] = None, end: Optional[YearMonth] = None) -> List[CardSummary]:
+        '''
+        Get the dashboard of a user.
+
+        :param user_id: The ID of the user.
+        :param start: The first year-month to include. By default, the earliest one.
+        :param end: The last year-month to include. By default, the latest one.
+        :return: A copy of the summary of every card of the user, ordered by alias.
+        '''
+        with self._lock:
+            cards = self._users.get(user_id, {}).values()
+            return sorted((card.copy(start, end) for card in cards), key=lambda card: (card.alias, card.card_id))
+
+    def add_payment(self, payment: Payment) -> None:
+        'Add a payment to the summary of its card.'
+        with self._lock:
+            self.__drop_last_installment(payment.expense)
+            self.__apply(payment, to_cents(payment.amount), payment.amount.currency, payment.status, payment.payment_date, 1)
+            self.__add_last_installment(payment.expense)
+
+    def remove_payment(self, payment: Payment) -> None:
+        'Remove a payment from the summary of its card.'
+        with self._lock:
+            self.__drop_last_installment(payment.expense)
+            self.__apply(payment, -to_cents(payment.amount), payment.amount.currency, payment.status, payment.payment_date, -1)
+            self.__add_last_installment(payment.expense)
+
+    def clear(self) -> None:
+        'Drop every summary.'
+        with self._lock:
+            self._users.clear()
+            self._owners.clear()
+            self._last_installments.clear()
+
+    def rebuild(self, cards: Iterable[CreditCard]) -> None:
+        'Rebuild the summaries from scratch from the given cards and their expenses.'
+        with self._lock:
+            self.clear()
+            for card in cards:
+                self.rebuild_card(card)
+
+    def rebuild_card(self, card: CreditCard) -> None:
+        'Rebuild the summary of one card from its expenses.'
+        with self._lock:
+            self.remove_card(card.id)
+            self.add_card(card)
+            for expense in card.expenses:
+                for payment in expense.payments:
+                    self.add_payment(payment)
+
+    def subscribe(self) -> None:
+        'Keep the summaries up to date from the payment events.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        self.add_payment(event.payment)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        self.remove_payment(event.payment)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        with self._lock:
+            payment = event.payment
+            self.__drop_last_installment(payment.expense)
+            self.__apply(
+                payment,
+                -to_cents(event.previous_amount),
+                event.previous_currency,
+                event.previous_status,
+                event.previous_payment_date,
+                -1,
+            )
+            self.add_payment(payment)
+
+    def __summary(self, account: Account) -> CardSummary:
+        'Get the summary of a card, creating it if needed.'
+        cards = self._users.setdefault(account.owner.id, {})
+        summary = cards.get(account.id)
+        if summary is None:
+            financing_limit = getattr(account, 'financing_limit', Amount(0, currency=account.limit.currency))
+            summary = cards[account.id] = CardSummary(account.id, account.alias, account.limit, financing_limit)
+            self._owners[account.id] = account.owner.id
+        return summary
+
+    def __apply(
+        self, payment: Payment, cents: int, currency: Currency, status: PaymentStatus, payment_date: Optional[date], count: int
+    ) -> None:
+        'Apply the contribution of a payment, with the given amount, currency, status and date, to its card.'
+        expense = payment.expense
+        summary = self.__summary(expense.account)
+        is_subscription = expense.expense_type == ExpenseType.SUBSCRIPTION
+        is_final = status in FINAL_PAYMENT_STATUSES
+
+        if is_subscription:
+            if status == PaymentStatus.CONFIRMED:
+                summary.pending_cents[currency] = summary.pending_cents.get(currency, 0) + cents
+        elif not is_final:
+            pending = summary.pending_cents if expense.installments == 1 else summary.financing_cents
+            pending[currency] = pending.get(currency, 0) + cents
+
+        if payment_date is None or status in NON_SPENDING_PAYMENT_STATUSES:
+            return
+        year_month = (payment_date.year, payment_date.month)
+        month = self.__month(summary, year_month, currency)
+        month.total_cents += cents
+        month.count += count
+        if is_subscription:
+            month.subscription_cents += cents
+        elif expense.installments == 1:
+            month.one_time_cents += cents
+        self.__drop_if_empty(summary, year_month, currency)
+
+    def __add_last_installment(self, expense: Expense) -> None:
+        'Count the last installment of a purchase in installments in its month.'
+        if expense.expense_type != ExpenseType.PURCHASE or expense.installments == 1:
+            return
+        payment = next((payment for payment in expense.pending_payments if payment.is_last_payment()), None)
+        if payment is None or payment.payment_date is None or not payment.is_spending() or not to_cents(payment.amount):
+            return
+        summary = self.__summary(expense.account)
+        year_month = (payment.payment_date.year, payment.payment_date.month)
+        cents = to_cents(payment.amount)
+        self.__month(summary, year_month, payment.amount.currency).last_installment_cents += cents
+        self._last_installments[expense.id] = (summary, year_month, payment.amount.currency, cents)
+
+    def __drop_last_installment(self, expense: Expense) -> None:
+        'Remove the last installment counted for a purchase, before one of its payments changes.'
+        counted = self._last_installments.pop(expense.id, None)
+        if counted is None:
+            return
+        summary, year_month, currency, cents = counted
+        self.__month(summary, year_month, currency).last_installment_cents -= cents
+        self.__drop_if_empty(summary, year_month, currency)
+
+    @staticmethod
+    def __month(summary: CardSummary, year_month: YearMonth, currency: Currency) -> MonthSummary:
+        'Get the totals of a card in a month and currency, creating them if needed.'
+        currencies = summary.months.setdefault(year_month, {})
+        month = currencies.get(currency)
+        if month is None:
+            month = currencies[currency] = MonthSummary(currency)
+        return month
+
+    @staticmethod
+    def __drop_if_empty(summary: CardSummary, year_month: YearMonth, currency: Currency) -> None:
+        'Drop the totals of a card in a month and currency once nothing is counted in them.'
+        currencies = summary.months[year_month]
+        if currencies[currency].is_empty():
+            del currencies[currency]
+            if not currencies:
+                del summary.months[year_month]
@@ -0,0 +1,167 @@
+import heapq
+import threading
+from datetime import date, timedelta
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...expense.enums import FINAL_PAYMENT_STATUSES
+from ...expense.events import PaymentAdded, PaymentRemoved, PaymentUpdated
+from ...expense.models import Payment, PaymentDateIndex, PaymentStatusIndex
+from ..enums import ReminderKind
+from ..models import CreditCard
+
+ReminderKey = Tuple[ReminderKind, UUID]
+
+
+class Reminder:
+    'Something due on a date: a payment, or the closing or expiry of a card.'
+
+    def __init__(self, kind: ReminderKind, subject_id: UUID, due_date: date, subject: object = None):
+        self.kind = kind
+        self.subject_id = subject_id  # ID of the payment or the credit card
+        self.due_date = due_date
+        self.subject = subject  # The payment or the credit card, when known
+
+    @property
+    def key(self) -> ReminderKey:
+        'Get the key that identifies the reminder in a scheduler.'
+        return self.kind, self.subject_id
+
+
+class DueDateScheduler:
+    '''
+    Keeps the upcoming payment dates and card closing/expiry dates in a min-heap keyed by date.
+
+    Scheduling and rescheduling cost O(log n). Cancelling only marks the heap entry, which is
+    dropped when it reaches the top (the heap is compacted when most entries are stale), so the
+    daily reminder job costs O(k log n) for the k reminders due, whatever the total size.
+
+    The payment events arrive from whichever thread changed the payment, so the heap is only read
+    and written holding the lock of the scheduler.
+    '''
+
+    def __init__(self, dispatcher: EventDispatcher = default_dispatcher):
+        self._dispatcher = dispatcher
+        self._lock = threading.RLock()
+        self._heap: List[list] = []
+        self._entries: Dict[ReminderKey, list] = {}
+        self._sequence = count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: ReminderKey) -> bool:
+        return key in self._entries
+
+    def schedule(self, kind: ReminderKind, subject_id: UUID, due_date: date, subject: object = None) -> Reminder:
+        'Schedule a reminder, replacing the previous one of the same subject and kind.'
+        with self._lock:
+            self.cancel(kind, subject_id)
+            reminder = Reminder(kind, subject_id, due_date, subject)
+            entry = [due_date.toordinal(), next(self._sequence), reminder]
+            self._entries[reminder.key] = entry
+            heapq.heappush(self._heap, entry)
+            return reminder
+
+    def reschedule(self, kind: ReminderKind, subject_id: UUID, due_date: date) -> Optional[Reminder]:
+        'Move a scheduled reminder to a new date.'
+        with self._lock:
+            entry = self._entries.get((kind, subject_id))
+            if entry is None:
+                return None
+            return self.schedule(kind, subject_id, due_date, entry[2].subject)
+
+    def cancel(self, kind: ReminderKind, subject_id: UUID) -> bool:
+        'Cancel a scheduled reminder, returning whether it was scheduled.'
+        with self._lock:
+            entry = self._entries.pop((kind, subject_id), None)
+            if entry is None:
+                return False
+            entry[2] = None
+            if len(self._heap) > 32 and len(self._entries) < len(self._heap) // 2:
+                self._heap = [entry for entry in self._heap if entry[2] is not None]
+                heapq.heapify(self._heap)
+            return True
+
+    def schedule_payment(self, payment: Payment) -> Optional[Reminder]:
+        'Schedule a payment on its payment date, unless it has no date or is already settled.'
+        with self._lock:
+            if payment.payment_date is None or payment.is_final_status():
+                self.cancel(ReminderKind.PAYMENT_DUE, payment.id)
+                return None
+            return self.schedule(ReminderKind.PAYMENT_DUE, payment.id, payment.payment_date, payment)
+
+    def schedule_payments_between(self, payments: PaymentDateIndex, start: date, end: date) -> int:
+        'Schedule the pending payments of a date index dated between two dates, both included, and get how many were scheduled.'
+        with self._lock:
+            scheduled = 0
+            for payment in payments.range(start, end, statuses=PaymentStatusIndex.PENDING_STATUSES):
+                if self.schedule_payment(payment) is not None:
+                    scheduled += 1
+            return scheduled
+
+    def schedule_card(self, card: CreditCard) -> None:
+        'Schedule the next closing and expiry dates of a credit card.'
+        with self._lock:
+            for kind, due_date in (
+                (ReminderKind.CARD_CLOSING, card.next_closing_date),
+                (ReminderKind.CARD_EXPIRING, card.next_expiring_date),
+            ):
+                if due_date is None:
+                    self.cancel(kind, card.id)
+                else:
+                    self.schedule(kind, card.id, due_date, card)
+
+    def peek_due_date(self) -> Optional[date]:
+        'Get the date of the next reminder.'
+        with self._lock:
+            self.__drop_cancelled()
+            return date.fromordinal(self._heap[0][0]) if self._heap else None
+
+    def pop_due_until(self, until: date) -> List[Reminder]:
+        'Remove and return every reminder due on or before the given date, ordered by date.'
+        with self._lock:
+            due: List[Reminder] = []
+            limit = until.toordinal()
+            self.__drop_cancelled()
+            while self._heap and self._heap[0][0] <= limit:
+                reminder = heapq.heappop(self._heap)[2]
+                del self._entries[reminder.key]
+                due.append(reminder)
+                self.__drop_cancelled()
+            return due
+
+    def pop_due_within(self, days: int, today: Optional[date] = None) -> List[Reminder]:
+        'Remove and return every reminder due in the next given days.'
+        return self.pop_due_until((today or date.today()) + timedelta(days=days))
+
+    def subscribe(self) -> None:
+        'Keep the payment reminders in sync with the payment events.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        self.schedule_payment(event.payment)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        payment = event.payment
+        was_final = event.previous_status in FINAL_PAYMENT_STATUSES
+        if event.previous_payment_date != payment.payment_date or was_final != payment.is_final_status():
+            self.schedule_payment(payment)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        self.cancel(ReminderKind.PAYMENT_DUE, event.payment.id)
+
+    def __drop_cancelled(self) -> None:
+        'Pop the cancelled entries from the top of the heap.'
+        while self._heap and self._heap[0][2] is None:
+            heapq.heappop(self._heap)
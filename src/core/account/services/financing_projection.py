@@ -0,0 +1,168 @@
+import heapq
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ...shared.exceptions import CurrencyMismatchException
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.value_objects import Amount
+from ...expense.enums import ExpenseType
+from ...expense.models import Payment, Purchase
+from ..models import CreditCard
+
+YearMonth = Tuple[int, int]
+
+
+class PlanEnd:
+    'The last pending installment of a purchase in installments.'
+
+    def __init__(self, purchase: Purchase, last_payment: Payment):
+        self.purchase = purchase
+        self.last_payment = last_payment
+
+    @property
+    def last_payment_date(self) -> date:
+        'Get the date of the last installment.'
+        return self.last_payment.payment_date
+
+
+class FinancingMonth:
+    'Projected installments of one month and the financed balance left after them.'
+
+    def __init__(
+        self,
+        year: int,
+        month: int,
+        freed_limit: Amount,
+        remaining_balance: Amount,
+        available_financing_limit: Amount,
+        installments: int,
+        ending_plans: List[PlanEnd],
+    ):
+        self.year = year
+        self.month = month
+        self.freed_limit = freed_limit  # Installments due in the month, freed once they are paid
+        self.remaining_balance = remaining_balance
+        self.available_financing_limit = available_financing_limit
+        self.installments = installments
+        self.ending_plans = ending_plans
+
+
+class FinancingProjection:
+    'Month by month projection of the pending installment plans of a credit card.'
+
+    def __init__(
+        self,
+        financing_limit: Amount,
+        financed_balance: Amount,
+        months: List[FinancingMonth],
+        unscheduled: Amount,
+    ):
+        self.financing_limit = financing_limit
+        self.financed_balance = financed_balance  # Pending installments with a payment date
+        self.months = months
+        self.unscheduled = unscheduled  # Pending installments without a payment date
+        self._by_month: Dict[YearMonth, FinancingMonth] = {(month.year, month.month): month for month in months}
+
+    @property
+    def plan_ends(self) -> List[PlanEnd]:
+        'Get the last installment of every pending plan, soonest first.'
+        return [plan_end for month in self.months for plan_end in month.ending_plans]
+
+    @property
+    def payoff_date(self) -> Optional[date]:
+        'Get the date of the last pending installment, or None if nothing is financed.'
+        ends = self.plan_ends
+        return ends[-1].last_payment_date if ends else None
+
+    def month(self, year: int, month: int) -> Optional[FinancingMonth]:
+        'Get the projection of a month, or None if no installment is due in it.'
+        return self._by_month.get((year, month))
+
+    def remaining_balance_after(self, year: int, month: int) -> Amount:
+        'Get the financed balance left once the installments up to a month are paid.'
+        remaining = self.financed_balance
+        for projected in self.months:
+            if (projected.year, projected.month) > (year, month):
+                break
+            remaining = projected.remaining_balance
+        return remaining
+
+
+def _pending_schedule(purchase: Purchase) -> List[Payment]:
+    'Get the pending installments of a purchase that have a date, in date order.'
+    payments = [payment for payment in purchase.pending_payments if payment.payment_date is not None]
+    payments.sort(key=lambda payment: (payment.payment_date, payment.no_installment))
+    return payments
+
+
+def project_financing(card: CreditCard, since: Optional[date] = None) -> FinancingProjection:
+    '''
+    Project how the financing limit of a card frees up as its installment plans are paid.
+
+    The pending installments of every purchase in installments are already sorted by date within
+    the purchase, so the schedules are merged with a heap in one pass, grouping the installments
+    by month as they come. The cost is O(n log k) for n installments of k purchases.
+
+    :param card: The credit card.
+    :param since: Only project the installments due on or after this date. The earlier ones are
+        still part of the financed balance and are reported in the first projected month.
+    :return: The projection.
+    '''
+    limit = card.financing_limit
+    purchases = [
+        expense for expense in card.expenses
+        if expense.expense_type == ExpenseType.PURCHASE and expense.installments > 1
+    ]
+    other_currencies = {purchase.amount.currency.value for purchase in purchases} - {limit.currency.value}
+    if other_currencies:
+        raise CurrencyMismatchException(
+            f'The card has installments in {", ".join(sorted(other_currencies))}, convert them before projecting.'
+        )
+
+    schedules = [_pending_schedule(purchase) for purchase in purchases]
+    balance_cents = sum(to_cents(payment.amount) for schedule in schedules for payment in schedule)
+    unscheduled_cents = sum(to_cents(purchase.pending_financing_amount) for purchase in purchases) - balance_cents
+    last_payments = {schedule[-1].id for schedule in schedules if schedule}
+    since_key = (since.year, since.month) if since is not None else None
+
+    months: List[FinancingMonth] = []
+    remaining_cents = balance_cents
+    current: Optional[YearMonth] = None
+    freed_cents = installments = 0
+    ending_plans: List[PlanEnd] = []
+
+    def close_month() -> None:
+        months.append(FinancingMonth(
+            year=current[0],
+            month=current[1],
+            freed_limit=from_cents(freed_cents, limit.precision, limit.currency),
+            remaining_balance=from_cents(remaining_cents, limit.precision, limit.currency),
+            available_financing_limit=from_cents(to_cents(limit) - remaining_cents - unscheduled_cents, limit.precision, limit.currency),
+            installments=installments,
+            ending_plans=ending_plans,
+        ))
+
+    merged: Iterator[Payment] = heapq.merge(*schedules, key=lambda payment: payment.payment_date)
+    for payment in merged:
+        key = (payment.payment_date.year, payment.payment_date.month)
+        if since_key is not None and key < since_key:
+            key = since_key
+        if key != current:
+            if current is not None:
+                close_month()
+            current, freed_cents, installments, ending_plans = key, 0, 0, []
+        cents = to_cents(payment.amount)
+        freed_cents += cents
+        remaining_cents -= cents
+        installments += 1
+        if payment.id in last_payments:
+            ending_plans.append(PlanEnd(payment.expense, payment))
+    if current is not None:
+        close_month()
+
+    return FinancingProjection(
+        financing_limit=limit,
+        financed_balance=from_cents(balance_cents, limit.precision, limit.currency),
+        months=months,
+        unscheduled=from_cents(unscheduled_cents, limit.precision, limit.currency),
+    )
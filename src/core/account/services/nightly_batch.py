@@ -0,0 +1,255 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from ...shared.events import dispatcher
+from ...expense.enums import NON_SPENDING_PAYMENT_STATUSES, ExpenseStatus
+from ...expense.interfaces.purchase_repository_interface import PurchaseRepositoryInterface
+from ...expense.interfaces.subscription_repository_interface import SubscriptionRepositoryInterface
+from ...expense.models import Expense, PaymentDateIndex, Purchase, Subscription
+from ...period.interfaces.period_repository_interfaces import PeriodRepositoryInterface
+from ...period.models import Period
+from ...user.interfaces.user_repository_interface import UserRepositoryInterface
+from ..interfaces.credit_card_repository_interfaces import CreditCardRepositoryInterface
+from ..models import CreditCard
+
+YearMonth = Tuple[int, int]
+
+
+class NightlyRepositories:
+    'The repositories used by a nightly batch worker.'
+
+    def __init__(
+        self,
+        credit_cards: CreditCardRepositoryInterface,
+        purchases: PurchaseRepositoryInterface,
+        subscriptions: SubscriptionRepositoryInterface,
+        periods: PeriodRepositoryInterface,
+    ):
+        self.credit_cards = credit_cards
+        self.purchases = purchases
+        self.subscriptions = subscriptions
+        self.periods = periods
+
+
+class ShardReport:
+    'Counters and timing of one shard of a nightly batch.'
+
+    def __init__(self, shard: int):
+        self.shard = shard
+        self.users = 0
+        self.purchases_finished = 0
+        self.subscription_payments_created = 0
+        self.periods_refreshed = 0
+        self.entities_saved = 0
+        self.elapsed_seconds = 0.0
+
+
+class NightlyBatchReport:
+    'Aggregated report of a nightly batch.'
+
+    def __init__(self, shards: List[ShardReport], elapsed_seconds: float):
+        self.shards = sorted(shards, key=lambda report: report.shard)
+        self.elapsed_seconds = elapsed_seconds
+
+    @property
+    def users(self) -> int:
+        'Get the number of users processed.'
+        return sum(report.users for report in self.shards)
+
+    @property
+    def purchases_finished(self) -> int:
+        'Get the number of purchases marked as finished.'
+        return sum(report.purchases_finished for report in self.shards)
+
+    @property
+    def subscription_payments_created(self) -> int:
+        'Get the number of subscription payments generated.'
+        return sum(report.subscription_payments_created for report in self.shards)
+
+    @property
+    def periods_refreshed(self) -> int:
+        'Get the number of periods whose payments changed.'
+        return sum(report.periods_refreshed for report in self.shards)
+
+    @property
+    def slowest_shard(self) -> Optional[ShardReport]:
+        'Get the shard that took the longest, to spot unbalanced shards.'
+        return max(self.shards, key=lambda report: report.elapsed_seconds, default=None)
+
+
+ProgressCallback = Callable[[ShardReport, int, int], None]
+
+
+def shard_of(user_id: UUID, shards: int) -> int:
+    'Get the shard of a user, stable across runs.'
+    return user_id.int % shards
+
+
+def iter_user_ids(repository: UserRepositoryInterface, page_size: int = 1000) -> Iterator[UUID]:
+    'Stream the IDs of every user, one page at a time.'
+    page = 1
+    while True:
+        result = repository.get_paginated(page, page_size)
+        for user in result.items:
+            yield user.id
+        if not result.has_next:
+            break
+        page += 1
+
+
+def _get_cards(repository: CreditCardRepositoryInterface, user_id: UUID, page_size: int) -> List[CreditCard]:
+    'Get every credit card of a user, reading all the pages.'
+    cards: List[CreditCard] = []
+    page = 1
+    while True:
+        result = repository.get_by_owner_id(str(user_id), page=page, page_size=page_size)
+        cards.extend(result.items)
+        if not result.has_next:
+            return cards
+        page += 1
+
+
+def _iter_expenses(repository, account_ids: List[UUID], page_size: int) -> Iterator[List[Expense]]:
+    'Stream the expenses of some accounts, one page at a time.'
+    page = 1
+    while True:
+        result = repository.get_by_account_ids(account_ids, page, page_size)
+        yield result.items
+        if not result.has_next:
+            break
+        page += 1
+
+
+def _refresh_purchases(purchases: List[Purchase]) -> List[Purchase]:
+    'Update the status of the purchases and get the ones that changed.'
+    changed = []
+    for purchase in purchases:
+        previous_status = purchase.status
+        purchase.update_status()
+        if purchase.status != previous_status:
+            changed.append(purchase)
+    return changed
+
+
+def _generate_subscription_payments(subscription: Subscription, until: YearMonth) -> int:
+    'Generate the payments of an active subscription up to the given month and get how many were created.'
+    if subscription.status != ExpenseStatus.ACTIVE:
+        return 0
+    created = 0
+    while True:
+        last_date = subscription.payments[-1].payment_date if subscription.payments else None
+        if last_date is not None and (last_date.year, last_date.month) >= until:
+            return created
+        subscription.add_new_payment(subscription.get_next_payment())
+        created += 1
+
+
+def _refresh_periods(periods: List[Period], payments: PaymentDateIndex) -> List[Period]:
+    'Replace the payments of the periods with the current ones and get the periods that changed.'
+    changed = []
+    for period in periods:
+        month_payments = payments.month(period.year.value, period.month.value)
+        if {payment.id for payment in period.payments} != {payment.id for payment in month_payments}:
+            period.payments = month_payments
+            changed.append(period)
+    return changed
+
+
+def _collect_payments(expenses: Iterable[Expense], payments_by_card: Dict[UUID, PaymentDateIndex]) -> None:
+    'Index the spending payments of the expenses by date, in the index of the card of each expense.'
+    for expense in expenses:
+        payments = payments_by_card.get(expense.account.id)
+        if payments is not None:
+            payments.add_many(payment for payment in expense.payments if payment.status not in NON_SPENDING_PAYMENT_STATUSES)
+
+
+def _run_shard(job: Tuple[int, Callable[[], NightlyRepositories], List[UUID], date, int]) -> ShardReport:
+    'Recompute every user of a shard. Runs in a worker process.'
+    shard, repositories_factory, user_ids, as_of, page_size = job
+    report = ShardReport(shard)
+    started_at = time.perf_counter()
+    repositories = repositories_factory()
+    until = (as_of.year, as_of.month)
+    # Nobody listens in the worker, so skip building the payment events altogether
+    with dispatcher.muted():
+        for user_id in user_ids:
+            cards = _get_cards(repositories.credit_cards, user_id, page_size)
+            if cards:
+                account_ids = [card.id for card in cards]
+                payments_by_card: Dict[UUID, PaymentDateIndex] = {card.id: PaymentDateIndex() for card in cards}
+                for purchases in _iter_expenses(repositories.purchases, account_ids, page_size):
+                    changed_purchases = _refresh_purchases(purchases)
+                    report.purchases_finished += sum(purchase.status == ExpenseStatus.FINISHED for purchase in changed_purchases)
+                    report.entities_saved += len(repositories.purchases.save_many(changed_purchases)) if changed_purchases else 0
+                    _collect_payments(purchases, payments_by_card)
+                for subscriptions in _iter_expenses(repositories.subscriptions, account_ids, page_size):
+                    changed_subscriptions = []
+                    for subscription in subscriptions:
+                        created = _generate_subscription_payments(subscription, until)
+                        if created:
+                            report.subscription_payments_created += created
+                            changed_subscriptions.append(subscription)
+                    report.entities_saved += len(repositories.subscriptions.save_many(changed_subscriptions)) if changed_subscriptions else 0
+                    _collect_payments(subscriptions, payments_by_card)
+                # Every card only gets the payments of its own expenses
+                changed_periods = [
+                    period for card in cards for period in _refresh_periods(card.periods, payments_by_card[card.id])
+                ]
+                report.periods_refreshed += len(changed_periods)
+                report.entities_saved += len(repositories.periods.save_many(changed_periods)) if changed_periods else 0
+            report.users += 1
+    report.elapsed_seconds = time.perf_counter() - started_at
+    return report
+
+
+def run_nightly_batch(
+    user_ids: Iterable[UUID],
+    repositories_factory: Callable[[], NightlyRepositories],
+    as_of: date,
+    shards: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    page_size: int = 500,
+    on_progress: Optional[ProgressCallback] = None,
+) -> NightlyBatchReport:
+    '''
+    Run the nightly recomputations of every user in a process pool.
+
+    Users are sharded by ID and every shard runs in a worker that opens its own repositories,
+    streams the expenses of each user page by page, marks the finished purchases, generates the
+    subscription payments up to the month of `as_of`, refreshes the payments of the periods of the
+    cards and saves what changed in bulk.
+
+    :param user_ids: The IDs of the users, e.g. from `iter_user_ids`.
+    :param repositories_factory: A picklable function that opens the repositories in a worker.
+    :param as_of: The date of the run.
+    :param shards: The number of shards, by default four per worker to balance uneven users.
+    :param max_workers: The size of the process pool, by default the number of CPUs.
+    :param page_size: The number of expenses read at a time.
+    :param on_progress: Called in the parent process with each finished shard report, the number of shards done and the total.
+    :return: The report of the run.
+    '''
+    if page_size <= 0:
+        raise ValueError('page_size must be greater than zero')
+    shards = shards or (max_workers or os.cpu_count() or 1) * 4
+    users_by_shard: List[List[UUID]] = [[] for _ in range(shards)]
+    for user_id in user_ids:
+        users_by_shard[shard_of(user_id, shards)].append(user_id)
+    jobs = [
+        (shard, repositories_factory, shard_user_ids, as_of, page_size)
+        for shard, shard_user_ids in enumerate(users_by_shard)
+        if shard_user_ids
+    ]
+
+    started_at = time.perf_counter()
+    reports: List[ShardReport] = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_shard, job) for job in jobs]
+        for future in as_completed(futures):
+            reports.append(future.result())
+            if on_progress is not None:
+                on_progress(reports[-1], len(reports), len(jobs))
+    return NightlyBatchReport(reports, time.perf_counter() - started_at)
@@ -0,0 +1,304 @@
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from ...shared.currency_rates import CurrencyConverter, available_amount, group_by_currency
+from ...shared.events import dispatcher
+from ...shared.value_objects import Amount, Currency
+from ...expense.enums import PaymentStatus
+from ...expense.models import Expense, Payment, PaymentStatusIndex, Purchase, Subscription
+from ..models import CreditCard
+
+YearMonth = Tuple[int, int]
+
+
+class Scenario:
+    '''
+    A named list of what-if operations to try on a credit card.
+
+    Scenarios only hold plain values, so they can be sent to worker processes.
+    '''
+
+    def __init__(self, name: str):
+        self.name = name
+        self.operations: List[tuple] = []
+
+    def add_purchase(
+        self, title: str, amount: Amount, acquired_at: date, installments: int = 1, first_payment_date: Optional[date] = None
+    ) -> 'Scenario':
+        'Simulate a new purchase on the card.'
+        self.operations.append(('add_purchase', title, amount, acquired_at, installments, first_payment_date))
+        return self
+
+    def scale_subscriptions(self, factor: float) -> 'Scenario':
+        'Simulate a price change of every subscription, e.g. 1.3 for a 30% rise.'
+        if factor <= 0:
+            raise ValueError('factor must be greater than zero')
+        self.operations.append(('scale_subscriptions', factor))
+        return self
+
+    def cancel_expense(self, expense_id: UUID) -> 'Scenario':
+        'Simulate that an expense is removed from the card.'
+        self.operations.append(('cancel_expense', expense_id))
+        return self
+
+
+class ScenarioResult:
+    '''
+    Effect of a scenario on the figures of a credit card.
+
+    The amounts are kept per currency. The available limits and their deltas raise
+    CurrencyMismatchException when some pending amounts are in another currency than the limit,
+    like `CreditCard.available_limit`, and the `_in` variants convert them.
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        limit: Amount,
+        financing_limit: Amount,
+        pending: Dict[Currency, Amount],
+        pending_financing: Dict[Currency, Amount],
+        period_totals: Dict[YearMonth, Dict[Currency, Amount]],
+        pending_delta: Dict[Currency, Amount],
+        financing_delta: Dict[Currency, Amount],
+    ):
+        self.name = name
+        self.limit = limit
+        self.financing_limit = financing_limit
+        self.pending = pending  # Pending amount per currency, scenario included
+        self.pending_financing = pending_financing  # Pending financing amount per currency, scenario included
+        self.period_totals = period_totals  # Total per month and currency, scenario included
+        self.pending_delta = pending_delta  # Change of the pending amounts caused by the scenario
+        self.financing_delta = financing_delta  # Change of the pending financing amounts
+
+    @property
+    def available_limit(self) -> Amount:
+        'Get the available limit of the card with the scenario applied.'
+        return available_amount(self.limit, self.pending)
+
+    @property
+    def available_financing_limit(self) -> Amount:
+        'Get the available financing limit of the card with the scenario applied.'
+        return available_amount(self.financing_limit, self.pending_financing)
+
+    @property
+    def limit_delta(self) -> Amount:
+        'Get the change of the available limit caused by the scenario.'
+        return available_amount(Amount(0, self.limit.precision, self.limit.currency), self.pending_delta)
+
+    @property
+    def financing_limit_delta(self) -> Amount:
+        'Get the change of the available financing limit caused by the scenario.'
+        limit = self.financing_limit
+        return available_amount(Amount(0, limit.precision, limit.currency), self.financing_delta)
+
+    def available_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available limit, converting the pending amounts to the currency of the limit.'
+        return available_amount(self.limit, self.pending, converter, on)
+
+    def available_financing_limit_in(self, converter: CurrencyConverter, on: date) -> Amount:
+        'Get the available financing limit, converting the pending financing amounts to the currency of the limit.'
+        return available_amount(self.financing_limit, self.pending_financing, converter, on)
+
+
+class ScenarioBaseline:
+    '''
+    Figures of a credit card before any scenario: its pending amounts and the totals of its loaded periods.
+
+    Building it walks the expenses and the loaded periods of the card once, so share it between
+    the scenarios of a card (`simulate_many` builds one per worker). It is only valid while the
+    card is not modified.
+    '''
+
+    def __init__(self, card: CreditCard):
+        self.card = card
+        self.expenses: Dict[UUID, Expense] = {expense.id: expense for expense in card.expenses}
+        self.subscription_ids: List[UUID] = [expense.id for expense in card.expenses if isinstance(expense, Subscription)]
+        self.pending = card.pending_by_currency()
+        self.pending_financing = card.pending_by_currency(financing=True)
+        self.period_keys: Dict[UUID, YearMonth] = {}  # Month of the loaded period of each payment
+        month_amounts: Dict[YearMonth, List[Amount]] = {}
+        for period in card.periods:
+            key = (period.year.value, period.month.value)
+            month_amounts.setdefault(key, []).extend(payment.amount for payment in period.payments)
+            for payment in period.payments:
+                self.period_keys[payment.id] = key
+        self.month_totals = {key: group_by_currency(amounts) for key, amounts in month_amounts.items()}
+
+
+class ScenarioOverlay:
+    '''
+    Copy-on-write view of the expenses of a credit card.
+
+    The card is never modified: an expense is copied, with its payments, the first time an
+    operation touches it, and new expenses only live in the overlay. The figures are computed as
+    the baseline of the card adjusted by the touched expenses, so once the baseline is built,
+    applying a scenario and computing its result cost in proportion to what it touches (and the
+    number of months) instead of the size of the card. The month totals start from the loaded
+    periods of the card, so the payments of its expenses only adjust those periods.
+    '''
+
+    def __init__(self, card: CreditCard, baseline: Optional[ScenarioBaseline] = None):
+        if baseline is not None and baseline.card is not card:
+            raise ValueError('baseline must be built from the same card')
+        self._card = card
+        self._baseline = baseline if baseline is not None else ScenarioBaseline(card)
+        self._expenses = self._baseline.expenses
+        self._copies: Dict[UUID, Expense] = {}
+        self._added: List[Expense] = []
+        self._removed: Set[UUID] = set()
+
+    @property
+    def expenses(self) -> List[Expense]:
+        'Get the expenses of the card as seen by the scenario.'
+        expenses = [
+            self._copies.get(expense.id, expense)
+            for expense in self._card.expenses
+            if expense.id not in self._removed
+        ]
+        return expenses + self._added
+
+    def touch(self, expense_id: UUID) -> Expense:
+        'Get the private copy of an expense of the card, copying it on first use.'
+        expense_copy = self._copies.get(expense_id)
+        if expense_copy is None:
+            expense_copy = self._copies[expense_id] = self.__copy_expense(self._expenses[expense_id])
+        return expense_copy
+
+    def apply(self, scenario: Scenario) -> None:
+        'Apply the operations of a scenario to the overlay.'
+        with dispatcher.muted():
+            for operation, *args in scenario.operations:
+                getattr(self, f'_apply_{operation}')(*args)
+
+    def result(self, name: str = '') -> ScenarioResult:
+        'Compute the figures of the card with the overlay applied.'
+        baseline = self._baseline
+        month_amounts: Dict[YearMonth, List[Amount]] = {}
+        pending_delta: List[Amount] = []
+        financing_delta: List[Amount] = []
+        changes: List[Tuple[Expense, int]] = [(self._expenses[expense_id], -1) for expense_id in self._copies.keys() | self._removed]
+        changes += [(expense_copy, 1) for expense_id, expense_copy in self._copies.items() if expense_id not in self._removed]
+        changes += [(expense, 1) for expense in self._added]
+        for expense, sign in changes:
+            pending_delta.append(_signed(expense.pending_amount, sign))
+            financing_delta.append(_signed(expense.pending_financing_amount, sign))
+            for payment in expense.payments:
+                key = self.__month_of(payment, baseline.period_keys)
+                if key is not None:
+                    month_amounts.setdefault(key, []).append(_signed(payment.amount, sign))
+
+        period_totals = {key: dict(totals) for key, totals in baseline.month_totals.items()}  # Results never share the baseline
+        for key, amounts in month_amounts.items():
+            period_totals[key] = group_by_currency([*period_totals.get(key, {}).values(), *amounts])
+        pending_delta_totals = group_by_currency(pending_delta)
+        financing_delta_totals = group_by_currency(financing_delta)
+        return ScenarioResult(
+            name=name,
+            limit=self._card.limit,
+            financing_limit=self._card.financing_limit,
+            pending=group_by_currency([*baseline.pending.values(), *pending_delta_totals.values()]),
+            pending_financing=group_by_currency([*baseline.pending_financing.values(), *financing_delta_totals.values()]),
+            period_totals=dict(sorted(period_totals.items())),
+            pending_delta=pending_delta_totals,
+            financing_delta=financing_delta_totals,
+        )
+
+    def _apply_add_purchase(
+        self, title: str, amount: Amount, acquired_at: date, installments: int, first_payment_date: Optional[date]
+    ) -> None:
+        purchase = Purchase(
+            account=self._card,
+            title=title,
+            cc_name=title,
+            acquired_at=acquired_at,
+            amount=amount,
+            installments=installments,
+            first_payment_date=first_payment_date,
+        )
+        for payment in purchase.payments:
+            payment.status = PaymentStatus.SIMULATED
+        self._added.append(purchase)
+
+    def _apply_scale_subscriptions(self, factor: float) -> None:
+        for expense_id in self._baseline.subscription_ids:
+            if expense_id not in self._removed:
+                subscription = self.touch(expense_id)
+                subscription.amount = Amount(subscription.amount.value * factor, subscription.amount.precision, subscription.amount.currency)
+                # Confirmed payments were already charged at their price, only the upcoming ones change
+                for status in (PaymentStatus.UNCONFIRMED, PaymentStatus.SIMULATED):
+                    for payment in subscription.payments_by_status(status):
+                        payment.amount = Amount(payment.amount.value * factor, payment.amount.precision, payment.amount.currency)
+
+    def _apply_cancel_expense(self, expense_id: UUID) -> None:
+        if expense_id not in self._expenses:
+            raise ValueError(f'Expense {expense_id} does not belong to the card')
+        self._removed.add(expense_id)
+
+    def __month_of(self, payment: Payment, period_keys: Dict[UUID, YearMonth]) -> Optional[YearMonth]:
+        '''
+        Get the month whose total a payment of a touched expense changes.
+
+        The payments of the expenses of the card only change the months of the loaded periods
+        they belong to, counted like `Period.total_amount` does. The payments of the simulated
+        purchases go to the month of their date.
+        '''
+        if payment.expense.id in self._expenses:
+            return period_keys.get(payment.id)
+        if payment.payment_date is None or payment.status == PaymentStatus.CANCELED:
+            return None
+        return (payment.payment_date.year, payment.payment_date.month)
+
+    @staticmethod
+    def __copy_expense(expense: Expense) -> Expense:
+        'Copy an expense with its own payments, leaving the original untouched.'
+        expense_copy = copy.copy(expense)
+        payments: List[Payment] = []
+        for payment in expense.payments:
+            payment_copy = copy.copy(payment)
+            payment_copy._expense = expense_copy
+            payments.append(payment_copy)
+        expense_copy._payments = payments
+        expense_copy._payment_index = PaymentStatusIndex(payments)
+        return expense_copy
+
+
+def _signed(amount: Amount, sign: int) -> Amount:
+    'Get an amount, negated if the sign is negative.'
+    return amount if sign > 0 else Amount(-amount.value, amount.precision, amount.currency)
+
+
+def simulate(card: CreditCard, scenario: Scenario, baseline: Optional[ScenarioBaseline] = None) -> ScenarioResult:
+    'Run a scenario on a credit card without modifying it, from a shared baseline of the card if given.'
+    overlay = ScenarioOverlay(card, baseline)
+    overlay.apply(scenario)
+    return overlay.result(scenario.name)
+
+
+_worker_baseline: Optional[ScenarioBaseline] = None
+
+
+def _init_worker(card: CreditCard) -> None:
+    'Receive the card once per worker process instead of once per scenario, and build its baseline.'
+    global _worker_baseline
+    _worker_baseline = ScenarioBaseline(card)
+
+
+def _simulate_in_worker(scenario: Scenario) -> ScenarioResult:
+    return simulate(_worker_baseline.card, scenario, _worker_baseline)
+
+
+def simulate_many(card: CreditCard, scenarios: Iterable[Scenario], max_workers: Optional[int] = None) -> List[ScenarioResult]:
+    '''
+    Run many scenarios on a credit card in parallel processes.
+
+    :param card: The credit card, sent once to every worker.
+    :param scenarios: The scenarios to run.
+    :param max_workers: The size of the process pool, by default the number of CPUs.
+    :return: The results, in the order of the scenarios.
+    '''
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(card,)) as executor:
+        return list(executor.map(_simulate_in_worker, scenarios))
@@ -0,0 +1,11 @@
+from ..shared.helpers.lazy_imports import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, submodules=[
+    'enums',
+    'events',
+    'exceptions',
+    'helpers',
+    'interfaces',
+    'models',
+    'services',
+])
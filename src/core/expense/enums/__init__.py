@@ -1,9 +1,13 @@
-from expense_status import ExpenseStatus
-from expense_type import ExpenseType
-from payment_status import PaymentStatus
+from .anomaly_kind import AnomalyKind
+from .expense_status import ExpenseStatus
+from .expense_type import ExpenseType
+from .payment_status import PaymentStatus, FINAL_PAYMENT_STATUSES, NON_SPENDING_PAYMENT_STATUSES
 
 __all__ = [
+    'AnomalyKind',
     'ExpenseStatus',
     'ExpenseType',
     'PaymentStatus',
+    'FINAL_PAYMENT_STATUSES',
+    'NON_SPENDING_PAYMENT_STATUSES',
 ]
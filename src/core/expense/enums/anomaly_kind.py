@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class AnomalyKind(str, Enum):
+    PRICE_JUMP = 'price_jump'
+    DUPLICATE_CHARGE = 'duplicate_charge'
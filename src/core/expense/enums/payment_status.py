@@ -7,3 +7,7 @@ class PaymentStatus(str, Enum):
     PAID = 'paid'
     CANCELED = 'canceled'
     SIMULATED = 'simulated'
+
+
+FINAL_PAYMENT_STATUSES = frozenset({PaymentStatus.PAID, PaymentStatus.CANCELED})
+NON_SPENDING_PAYMENT_STATUSES = frozenset({PaymentStatus.CANCELED, PaymentStatus.SIMULATED})
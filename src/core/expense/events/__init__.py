@@ -0,0 +1,13 @@
+from .expense_events import ExpenseEvent, ExpenseRenamed
+from .payment_events import PaymentEvent, PaymentAdded, PaymentRemoved, PaymentUpdated
+
+__all__ = [
+    # Expense events
+    'ExpenseEvent',
+    'ExpenseRenamed',
+    # Payment events
+    'PaymentEvent',
+    'PaymentAdded',
+    'PaymentRemoved',
+    'PaymentUpdated',
+]
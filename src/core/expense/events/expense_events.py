@@ -0,0 +1,22 @@
+from typing import TYPE_CHECKING
+
+from ...shared.events import DomainEvent
+
+if TYPE_CHECKING:
+    from ..models.expense import Expense
+
+
+class ExpenseEvent(DomainEvent):
+    '''Base class for the events about an expense.'''
+
+    def __init__(self, expense: 'Expense'):
+        self.expense = expense
+
+
+class ExpenseRenamed(ExpenseEvent):
+    '''Published when the title or the credit card name of an expense changes.'''
+
+    def __init__(self, expense: 'Expense', previous_title: str, previous_cc_name: str):
+        super().__init__(expense)
+        self.previous_title = previous_title
+        self.previous_cc_name = previous_cc_name
@@ -0,0 +1,45 @@
+from datetime import date
+from typing import Optional, TYPE_CHECKING
+
+from ...shared.events import DomainEvent
+from ...shared.value_objects import Amount, Currency
+from ..enums import PaymentStatus
+
+if TYPE_CHECKING:
+    from ..models.payment import Payment
+
+
+class PaymentEvent(DomainEvent):
+    '''Base class for the events about the payments of an expense.'''
+
+    def __init__(self, payment: 'Payment'):
+        self.payment = payment
+
+
+class PaymentAdded(PaymentEvent):
+    '''Published when a payment is added to an expense.'''
+
+
+class PaymentRemoved(PaymentEvent):
+    '''Published when a payment is removed from an expense.'''
+
+
+class PaymentUpdated(PaymentEvent):
+    '''Published when the amount, status or date of a payment of an expense changes.'''
+
+    def __init__(
+        self,
+        payment: 'Payment',
+        previous_amount: Amount,
+        previous_status: PaymentStatus,
+        previous_payment_date: Optional[date],
+    ):
+        super().__init__(payment)
+        self.previous_amount = previous_amount
+        self.previous_status = previous_status
+        self.previous_payment_date = previous_payment_date
+
+    @property
+    def previous_currency(self) -> Currency:
+        'Get the currency of the payment before the change, which may differ from the current one.'
+        return self.previous_amount.currency
@@ -0,0 +1,40 @@
+import re
+from typing import Optional, Tuple
+
+# "Cuota 3/12" or "C.03/12" anywhere, or a bare "03/12" at the end of the field. A bare N/M elsewhere
+# is most likely a date, such as "03/12/2024"
+INSTALLMENT_PATTERN = re.compile(
+    r'(?:\b(?:cuotas?|c\.?)\s*|(?<![\d/])(?=\d{1,2}\s*/\s*\d{1,2}\s*$))(\d{1,2})\s*/\s*(\d{1,2})\b(?!\s*/\s*\d)',
+    re.IGNORECASE,
+)
+_NON_ALPHANUMERIC_PATTERN = re.compile(r'[^0-9a-z]+')
+
+
+def parse_installment(description: str) -> Optional[Tuple[int, int]]:
+    '''
+    Parse the installment notation of a statement description, such as "Cuota 3/12".
+
+    :param description: The description as printed on the card statement.
+    :return: A tuple with the installment number and the total installments, or None if there is no notation.
+    '''
+    match = INSTALLMENT_PATTERN.search(description)
+    if not match:
+        return None
+    no_installment, installments = int(match.group(1)), int(match.group(2))
+    if not 1 <= no_installment <= installments:
+        return None
+    return no_installment, installments
+
+
+def normalize_description(description: str) -> str:
+    '''
+    Normalize a statement description or expense name so both can be compared as keys.
+
+    The installment notation is removed, the text is lowercased and every run of
+    non-alphanumeric characters is collapsed into a single space.
+
+    :param description: The text to normalize.
+    :return: The normalized text.
+    '''
+    without_installment = INSTALLMENT_PATTERN.sub(' ', description)
+    return _NON_ALPHANUMERIC_PATTERN.sub(' ', without_installment.lower()).strip()
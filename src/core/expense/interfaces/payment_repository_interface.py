@@ -1,4 +1,5 @@
 from abc import abstractmethod
+from datetime import date
 from typing import Optional
 from uuid import UUID
 
@@ -18,7 +19,7 @@ class PaymentRepositoryInterface(RepositoryBase[Payment]):
 
     @abstractmethod
     def get_by_date_range(
-        self, start_date: str, end_date: str, page: int, page_size: int, filter: Optional[FilterBase] = None
+        self, start_date: date, end_date: date, page: int, page_size: int, filter: Optional[FilterBase] = None
     ) -> PaginatedResult[Payment]:
-        '''Get a paginated result of payments within a date range, optionally filtered by a given filter.'''
+        '''Get a paginated result of payments dated between two dates (both included), optionally filtered by a given filter.'''
         ...
@@ -1,13 +1,32 @@
-from .expense import Expense
-from .expense_category import ExpenseCategory
-from .payment import Payment
-from .purchase import Purchase
-from .subscription import Subscription
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .expense import Expense
+    from .expense_category import ExpenseCategory
+    from .payment import Payment
+    from .payment_date_index import PaymentDateIndex
+    from .payment_status_index import PaymentStatusIndex
+    from .purchase import Purchase
+    from .subscription import Subscription
 
 __all__ = [
     'Expense',
     'ExpenseCategory',
     'Payment',
+    'PaymentDateIndex',
+    'PaymentStatusIndex',
     'Purchase',
     'Subscription',
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'Expense': '.expense',
+    'ExpenseCategory': '.expense_category',
+    'Payment': '.payment',
+    'PaymentDateIndex': '.payment_date_index',
+    'PaymentStatusIndex': '.payment_status_index',
+    'Purchase': '.purchase',
+    'Subscription': '.subscription',
+})
@@ -2,15 +2,19 @@ from abc import ABC, abstractmethod
 from uuid import UUID
 from typing import Optional
 from datetime import date
-from typing import List
+from typing import Dict, List
 
-from ...shared.entity_base import EntityBase
+from ...shared.entity_base import EntityBase, after_unlock, synchronized
+from ...shared.events import dispatcher
+from ...shared.exceptions import CurrencyMismatchException
 from ...shared.value_objects import Amount
 from ...account.models.account import Account
 from ..exceptions import ExpenseStatusException
-from ..enums import ExpenseType, ExpenseStatus
+from ..enums import ExpenseType, ExpenseStatus, PaymentStatus
+from ..events import ExpenseRenamed, PaymentAdded, PaymentRemoved
 from .expense_category import ExpenseCategory as Category
 from .payment import Payment
+from .payment_status_index import PaymentStatusIndex
 
 
 class Expense(EntityBase, ABC):
@@ -28,7 +32,7 @@ class Expense(EntityBase, ABC):
         first_payment_date: Optional[date] = None,
         status: ExpenseStatus = ExpenseStatus.ACTIVE,
         category: Optional[Category] = None,
-        payments: List[Payment] = [],
+        payments: Optional[List[Payment]] = None,
         id: Optional[UUID] = None
     ):
         super().__init__(id)
@@ -43,6 +47,7 @@ class Expense(EntityBase, ABC):
         self._status = status
         self._category = category
         self._payments = payments if payments is not None else []
+        self._payment_index = PaymentStatusIndex(self._payments)
 
     @property
     def account(self) -> Account:
@@ -62,7 +67,10 @@ class Expense(EntityBase, ABC):
     @title.setter
     def title(self, value: str):
         'Set the title of the expense.'
+        previous_title = self._title
         self._title = value
+        if previous_title != value:
+            dispatcher.emit(ExpenseRenamed, self, previous_title, self._cc_name)
 
     @property
     def cc_name(self) -> str:
@@ -72,7 +80,10 @@ class Expense(EntityBase, ABC):
     @cc_name.setter
     def cc_name(self, value: str):
         'Set the credit card name.'
+        previous_cc_name = self._cc_name
         self._cc_name = value
+        if previous_cc_name != value:
+            dispatcher.emit(ExpenseRenamed, self, self._title, previous_cc_name)
 
     @property
     def acquired_at(self) -> date:
@@ -152,15 +163,63 @@ class Expense(EntityBase, ABC):
         return self._payments
 
     @payments.setter
+    @synchronized
     def payments(self, value: List[Payment]):
         'Set the payments list.'
         self._payments = value
+        self._payment_index = PaymentStatusIndex(value)
+
+    @property
+    def payment_index(self) -> PaymentStatusIndex:
+        'Get the index of the payments grouped by status.'
+        return self._payment_index
+
+    @property
+    def pending_payments(self) -> List[Payment]:
+        'Get the payments that are not in a final status.'
+        return self._payment_index.pending()
+
+    def payments_by_status(self, status: PaymentStatus) -> List[Payment]:
+        'Get the payments with the given status.'
+        return self._payment_index.by_status(status)
+
+    def count_payments_by_status(self) -> Dict[PaymentStatus, int]:
+        'Count the payments grouped by status.'
+        return self._payment_index.count_by_status()
+
+    def _check_currency(self, amount: Amount) -> None:
+        'Reject a payment amount in a currency other than the one of the expense.'
+        if amount.currency != self._amount.currency:
+            raise CurrencyMismatchException(
+                f'Payment amount in {amount.currency.value} does not match the {self._amount.currency.value} of expense {self.title}.'
+            )
+
+    @synchronized
+    def _attach_payment(self, payment: Payment) -> None:
+        'Append a payment to the expense, index it and publish a PaymentAdded event once unlocked.'
+        self._payments.append(payment)
+        self._payment_index.add(payment)
+        after_unlock(dispatcher.emit, PaymentAdded, payment)
+
+    @synchronized
+    def _detach_payment(self, payment_id: UUID) -> Optional[Payment]:
+        'Remove a payment from the expense by its ID and publish a PaymentRemoved event once unlocked.'
+        payment = self._payment_index.remove(payment_id)
+        if payment is not None:
+            self._payments.remove(payment)
+            after_unlock(dispatcher.emit, PaymentRemoved, payment)
+        return payment
 
     @abstractmethod
     def calculate_payments(self) -> None:
         'Calculate the payments based on the expense details.'
         ...
 
+    @abstractmethod
+    def update_payments(self, payments: List[Payment]) -> None:
+        'Apply a batch of payment updates, recomputing the expense only once.'
+        ...
+
     @property
     @abstractmethod
     def pending_amount(self) -> Amount:
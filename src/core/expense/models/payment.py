@@ -1,18 +1,22 @@
+from contextlib import nullcontext
 from uuid import UUID
-from typing import Optional
+from typing import TYPE_CHECKING, ContextManager, Optional
 from datetime import date
 
-from ...shared.entity_base import EntityBase
-from ...shared.value_objects import Amount
-from ..enums import PaymentStatus, ExpenseType
-from expense import Expense
-from purchase import Purchase
+from ...shared.entity_base import EntityBase, after_unlock
+from ...shared.events import dispatcher
+from ...shared.value_objects import Amount, Currency
+from ..enums import PaymentStatus, ExpenseType, FINAL_PAYMENT_STATUSES, NON_SPENDING_PAYMENT_STATUSES
+from ..events import PaymentUpdated
+
+if TYPE_CHECKING:
+    from .expense import Expense
 
 
 class Payment(EntityBase):
     def __init__(
             self,
-            expense: Expense,
+            expense: 'Expense',
             amount: Amount,
             no_installment: int,
             status: PaymentStatus = PaymentStatus.UNCONFIRMED,
@@ -27,13 +31,14 @@ class Payment(EntityBase):
         self._payment_date = payment_date
 
     @property
-    def expense(self) -> Expense:
+    def expense(self) -> 'Expense':
         'Get the associated expense for this payment.'
         return self._expense
 
     @expense.setter
-    def expense(self, value: Expense):
+    def expense(self, value: 'Expense'):
         'Set the associated expense for this payment.'
+        from .expense import Expense
         if not isinstance(value, Expense):
             raise ValueError('expense must be an instance of Expense')
         self._expense = value
@@ -45,8 +50,14 @@ class Payment(EntityBase):
 
     @amount.setter
     def amount(self, value: Amount):
-        'Set the payment amount.'
-        self._amount = value
+        'Set the payment amount, in the currency of its expense.'
+        if self._expense is not None:
+            self._expense._check_currency(value)
+        with self.__expense_lock():
+            previous_amount = self._amount
+            self._amount = value
+        if previous_amount.value != value.value or previous_amount.currency != value.currency:
+            self.__publish_update(previous_amount, self._status, self._payment_date)
 
     @property
     def no_installment(self) -> int:
@@ -56,7 +67,10 @@ class Payment(EntityBase):
     @no_installment.setter
     def no_installment(self, value: int):
         'Set the installment number.'
+        previous_no_installment = self._no_installment
         self._no_installment = value
+        if previous_no_installment != value and self._expense is not None:
+            self._expense.payment_index.renumber(self)
 
     @property
     def status(self) -> PaymentStatus:
@@ -65,8 +79,14 @@ class Payment(EntityBase):
 
     @status.setter
     def status(self, value: PaymentStatus):
-        'Set the payment status.'
-        self._status = value
+        'Set the payment status and keep the expense status index in sync.'
+        with self.__expense_lock():
+            previous_status = self._status
+            self._status = value
+            if previous_status != value and self._expense is not None:
+                self._expense.payment_index.move(self, previous_status)
+        if previous_status != value:
+            self.__publish_update(self._amount, previous_status, self._payment_date)
 
     @property
     def payment_date(self) -> Optional[date]:
@@ -76,21 +96,39 @@ class Payment(EntityBase):
     @payment_date.setter
     def payment_date(self, value: date):
         'Set the payment date.'
-        self._payment_date = value
+        with self.__expense_lock():
+            previous_payment_date = self._payment_date
+            self._payment_date = value
+        if previous_payment_date != value:
+            self.__publish_update(self._amount, self._status, previous_payment_date)
+
+    def is_spending(self) -> bool:
+        'Check if the payment counts towards the spent amounts (it is neither canceled nor simulated).'
+        return self._status not in NON_SPENDING_PAYMENT_STATUSES
+
+    def __expense_lock(self) -> ContextManager:
+        'Get the lock of the expense, which guards the changes of its payments, or a no-op one for a detached payment.'
+        return self._expense.lock if self._expense is not None else nullcontext()
+
+    def __publish_update(self, previous_amount: Amount, previous_status: PaymentStatus, previous_payment_date: Optional[date]) -> None:
+        'Publish a PaymentUpdated event, once unlocked, if the payment belongs to its expense and somebody is listening.'
+        if self._expense is not None and dispatcher.has_subscribers(PaymentUpdated) and self in self._expense.payment_index:
+            after_unlock(dispatcher.publish, PaymentUpdated(self, previous_amount, previous_status, previous_payment_date))
 
     def is_final_status(self) -> bool:
         'Check if the payment status is final.'
-        return self._status in {PaymentStatus.PAID, PaymentStatus.CANCELED}
+        return self._status in FINAL_PAYMENT_STATUSES
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Payment':
         '''Create a Payment instance from a dictionary representation.'''
+        from .expense import Expense
         expense = data.get('expense')
         if not isinstance(expense, Expense):
             raise ValueError('expense must be an instance of Expense')
         return cls(
             expense=expense,
-            amount=Amount(data['amount']),
+            amount=Amount(data['amount'], currency=Currency(data.get('currency', Currency.ARS.value))),
             no_installment=data['no_installment'],
             status=PaymentStatus(data['status']),
             payment_date=data.get('payment_date'),
@@ -104,11 +142,9 @@ class Payment(EntityBase):
         return self._expense.installments == 1
 
     def is_last_payment(self) -> bool:
-        'Check if this is the last payment for the expense.'
-        if not isinstance(self._expense, Purchase):
+        'Check if this is the last pending installment of a purchase in installments.'
+        if self._expense.expense_type != ExpenseType.PURCHASE or self._expense.installments == 1:
             return False
         if self.is_final_status():
             return False
-        total_installments = self._expense.installments
-        pending_installments = self._expense.pending_installments
-        return (total_installments - pending_installments) == 1
+        return self._no_installment >= self._expense.payment_index.last_pending_installment()
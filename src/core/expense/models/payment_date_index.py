@@ -0,0 +1,188 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.dates import add_months_to_date
+from ...shared.value_objects import Amount
+from ..enums import ExpenseType, PaymentStatus
+from ..events import PaymentAdded, PaymentRemoved, PaymentUpdated
+
+if TYPE_CHECKING:
+    from .payment import Payment
+
+PaymentFilter = Callable[['Payment'], bool]
+
+
+class PaymentDateIndex:
+    '''
+    Keeps payments sorted by their payment date for range queries.
+
+    The payments are kept in a list sorted by date ordinal, with a parallel list of ordinals, so a
+    range is located with two binary searches and a range, sum or count query costs O(log n + k)
+    for the k payments in the range. Payments without a date are not indexed.
+
+    It is the building block for the code that works on date windows (periods, forecasts and
+    reminders). It can keep itself up to date from the payment events, adding the new payments
+    accepted by the `accepts` predicate, or every new payment without one.
+    '''
+
+    def __init__(
+        self,
+        payments: Iterable['Payment'] = (),
+        accepts: Optional[PaymentFilter] = None,
+        dispatcher: EventDispatcher = default_dispatcher,
+    ):
+        self._ordinals: List[int] = []
+        self._payments: List['Payment'] = []
+        self._dates: Dict[UUID, int] = {}  # Indexed ordinal of each payment
+        self._accepts = accepts
+        self._dispatcher = dispatcher
+        self.add_many(payments)
+
+    def __len__(self) -> int:
+        return len(self._payments)
+
+    def __contains__(self, payment: 'Payment') -> bool:
+        return payment.id in self._dates
+
+    def __iter__(self) -> Iterator['Payment']:
+        return iter(self._payments)
+
+    def add(self, payment: 'Payment') -> None:
+        'Index a payment, replacing its previous entry.'
+        self.remove(payment)
+        if payment.payment_date is None:
+            return
+        ordinal = payment.payment_date.toordinal()
+        position = bisect_right(self._ordinals, ordinal)
+        self._ordinals.insert(position, ordinal)
+        self._payments.insert(position, payment)
+        self._dates[payment.id] = ordinal
+
+    def add_many(self, payments: Iterable['Payment']) -> None:
+        'Index many payments, sorting once instead of inserting one at a time.'
+        new_payments = {payment.id: payment for payment in payments if payment.payment_date is not None}
+        if not new_payments:
+            return
+        for payment in new_payments.values():
+            self.remove(payment)
+        entries = list(zip(self._ordinals, self._payments))
+        for payment in new_payments.values():
+            ordinal = self._dates[payment.id] = payment.payment_date.toordinal()
+            entries.append((ordinal, payment))
+        entries.sort(key=lambda entry: entry[0])
+        self._ordinals = [ordinal for ordinal, _ in entries]
+        self._payments = [payment for _, payment in entries]
+
+    def remove(self, payment: 'Payment') -> bool:
+        'Drop a payment from the index, returning whether it was indexed.'
+        ordinal = self._dates.pop(payment.id, None)
+        if ordinal is None:
+            return False
+        position = bisect_left(self._ordinals, ordinal)
+        while self._payments[position].id != payment.id:
+            position += 1
+        del self._ordinals[position]
+        del self._payments[position]
+        return True
+
+    def update_date(self, payment: 'Payment') -> None:
+        'Move an indexed payment after its payment date changed.'
+        if payment.id in self._dates:
+            self.add(payment)
+
+    def range(
+        self,
+        start: date,
+        end: date,
+        statuses: Optional[Iterable[PaymentStatus]] = None,
+        expense_types: Optional[Iterable[ExpenseType]] = None,
+    ) -> List['Payment']:
+        '''
+        Get the payments dated between two dates, both included, in date order.
+
+        :param start: The first date of the range.
+        :param end: The last date of the range.
+        :param statuses: Only return the payments with these statuses.
+        :param expense_types: Only return the payments of expenses of these types.
+        :return: The payments in the range.
+        '''
+        payments = self._payments[bisect_left(self._ordinals, start.toordinal()):bisect_right(self._ordinals, end.toordinal())]
+        if statuses is None and expense_types is None:
+            return payments
+        status_set = frozenset(statuses) if statuses is not None else None
+        type_set = frozenset(expense_types) if expense_types is not None else None
+        return [
+            payment
+            for payment in payments
+            if (status_set is None or payment.status in status_set)
+            and (type_set is None or payment.expense.expense_type in type_set)
+        ]
+
+    def count(
+        self,
+        start: date,
+        end: date,
+        statuses: Optional[Iterable[PaymentStatus]] = None,
+        expense_types: Optional[Iterable[ExpenseType]] = None,
+    ) -> int:
+        'Count the payments dated between two dates, both included.'
+        if statuses is None and expense_types is None:
+            return bisect_right(self._ordinals, end.toordinal()) - bisect_left(self._ordinals, start.toordinal())
+        return len(self.range(start, end, statuses, expense_types))
+
+    def sum(
+        self,
+        start: date,
+        end: date,
+        statuses: Optional[Iterable[PaymentStatus]] = None,
+        expense_types: Optional[Iterable[ExpenseType]] = None,
+    ) -> Amount:
+        'Add up, in exact cents, the amounts of the payments dated between two dates, both included.'
+        return from_cents(sum(to_cents(payment.amount) for payment in self.range(start, end, statuses, expense_types)))
+
+    def month(
+        self,
+        year: int,
+        month: int,
+        statuses: Optional[Iterable[PaymentStatus]] = None,
+        expense_types: Optional[Iterable[ExpenseType]] = None,
+    ) -> List['Payment']:
+        'Get the payments of a calendar month, e.g. to fill a period.'
+        first_day = date(year, month, 1)
+        return self.range(first_day, date.fromordinal(add_months_to_date(first_day, 1).toordinal() - 1), statuses, expense_types)
+
+    def next_on_or_after(self, day: date, statuses: Optional[Iterable[PaymentStatus]] = None) -> Optional['Payment']:
+        'Get the first payment dated on or after a date.'
+        status_set = frozenset(statuses) if statuses is not None else None
+        for position in range(bisect_left(self._ordinals, day.toordinal()), len(self._payments)):
+            payment = self._payments[position]
+            if status_set is None or payment.status in status_set:
+                return payment
+        return None
+
+    def subscribe(self) -> None:
+        'Keep the index up to date from the payment events.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        if self._accepts is None or self._accepts(event.payment):
+            self.add(event.payment)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        if event.previous_payment_date != event.payment.payment_date:
+            self.update_date(event.payment)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        self.remove(event.payment)
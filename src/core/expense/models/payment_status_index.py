@@ -0,0 +1,102 @@
+from uuid import UUID
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from ..enums import PaymentStatus, FINAL_PAYMENT_STATUSES
+
+if TYPE_CHECKING:
+    from .payment import Payment
+
+
+class PaymentStatusIndex:
+    '''
+    Groups the payments of an expense by their status.
+
+    The index is owned by the expense and kept up to date by the expense mutators and by the
+    payment `status` setter, so status based lookups do not need to scan the payments list.
+    The highest pending installment number is cached until the pending payments change.
+    '''
+
+    PENDING_STATUSES = tuple(status for status in PaymentStatus if status not in FINAL_PAYMENT_STATUSES)
+
+    def __init__(self, payments: Iterable['Payment'] = ()):
+        self._by_id: Dict[UUID, 'Payment'] = {}
+        self._by_status: Dict[PaymentStatus, Dict[UUID, 'Payment']] = {status: {} for status in PaymentStatus}
+        self._last_pending_installment: Optional[int] = None  # None until computed, 0 if nothing is pending
+        for payment in payments:
+            self.add(payment)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, payment: 'Payment') -> bool:
+        return self._by_id.get(payment.id) is payment
+
+    def add(self, payment: 'Payment') -> None:
+        'Add a payment to the index, replacing any payment with the same ID.'
+        self.remove(payment.id)
+        self._by_id[payment.id] = payment
+        self._by_status[payment.status][payment.id] = payment
+        self._last_pending_installment = None
+
+    def remove(self, payment_id: UUID) -> Optional['Payment']:
+        'Remove a payment from the index by its ID and return it, if it was indexed.'
+        payment = self._by_id.pop(payment_id, None)
+        if payment is not None:
+            self._by_status[payment.status].pop(payment_id, None)
+            self._last_pending_installment = None
+        return payment
+
+    def move(self, payment: 'Payment', previous_status: PaymentStatus) -> None:
+        'Move an indexed payment from its previous status bucket to its current one.'
+        if self._by_id.get(payment.id) is not payment:
+            # A detached copy with the same ID (e.g. an update request) must not replace the indexed payment
+            return
+        if self._by_status[previous_status].pop(payment.id, None) is not None:
+            self._by_status[payment.status][payment.id] = payment
+            self._last_pending_installment = None
+
+    def renumber(self, payment: 'Payment') -> None:
+        'Forget the cached last pending installment after the installment number of an indexed payment changed.'
+        if self._by_id.get(payment.id) is payment:
+            self._last_pending_installment = None
+
+    def get(self, payment_id: UUID) -> Optional['Payment']:
+        'Get an indexed payment by its ID.'
+        return self._by_id.get(payment_id)
+
+    def by_status(self, status: PaymentStatus) -> List['Payment']:
+        'Get the payments with the given status.'
+        return list(self._by_status[status].values())
+
+    def count(self, status: PaymentStatus) -> int:
+        'Count the payments with the given status.'
+        return len(self._by_status[status])
+
+    def count_by_status(self) -> Dict[PaymentStatus, int]:
+        'Count the payments grouped by status.'
+        return {status: len(bucket) for status, bucket in self._by_status.items()}
+
+    def pending(self) -> List['Payment']:
+        'Get the payments that are not in a final status.'
+        return [payment for status in self.PENDING_STATUSES for payment in self._by_status[status].values()]
+
+    def final(self) -> List['Payment']:
+        'Get the payments that are in a final status.'
+        return [payment for status in FINAL_PAYMENT_STATUSES for payment in self._by_status[status].values()]
+
+    def last_pending_installment(self) -> int:
+        'Get the highest installment number of the pending payments, 0 if there are none.'
+        if self._last_pending_installment is None:
+            self._last_pending_installment = max(
+                (payment.no_installment for status in self.PENDING_STATUSES for payment in self._by_status[status].values()),
+                default=0,
+            )
+        return self._last_pending_installment
+
+    def pending_count(self) -> int:
+        'Count the payments that are not in a final status.'
+        return len(self._by_id) - self.final_count()
+
+    def final_count(self) -> int:
+        'Count the payments that are in a final status.'
+        return sum(len(self._by_status[status]) for status in FINAL_PAYMENT_STATUSES)
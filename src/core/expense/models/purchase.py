@@ -3,8 +3,11 @@ from typing import Optional
 from datetime import date
 from typing import List
 
+from ...shared.entity_base import synchronized
+from ...shared.helpers.amounts import from_cents, split_amount, to_cents
 from ...shared.helpers.dates import add_months_to_date
-from ...shared.value_objects import Amount
+from ...shared.instrumentation import instrumented
+from ...shared.value_objects import Amount, Currency
 from ...account.models.account import Account
 from ..exceptions import PaymentNotFoundInExpenseException
 from ..enums import ExpenseType, ExpenseStatus, PaymentStatus
@@ -26,7 +29,7 @@ class Purchase(Expense):
         installments: int = 1,
         first_payment_date: Optional[date] = None,
         category: Optional[Category] = None,
-        payments: List[Payment] = [],
+        payments: Optional[List[Payment]] = None,
         id: Optional[UUID] = None
     ):
         super().__init__(
@@ -49,47 +52,52 @@ class Purchase(Expense):
     @property
     def paid_amount(self) -> Amount:
         'Calculate the total amount paid for the purchase.'
-        total_paid = sum(payment.amount.value for payment in self._payments if payment.is_final_status())
-        return Amount(total_paid)
+        total_paid = sum(payment.amount.value for payment in self._payment_index.final())
+        return Amount(total_paid, currency=self._amount.currency)
 
     @property
     def pending_installments(self) -> int:
         'Calculate the number of pending installments.'
-        return len([payment for payment in self._payments if not payment.is_final_status()])
+        return self._payment_index.pending_count()
 
     @property
     def done_installments(self) -> int:
         'Calculate the number of installments that have been paid.'
-        return len([payment for payment in self._payments if payment.is_final_status()])
+        return self._payment_index.final_count()
 
     @property
     def pending_financing_amount(self) -> Amount:
         '''Calculate the pending financing amount of the purchase.'''
-        total_financing = Amount(0)
+        total_financing = Amount(0, currency=self._amount.currency)
         if self._installments == 1:
             # If there is only one installment, there is no financing
             return total_financing
-        for payment in self._payments:
-            if not payment.is_final_status():
-                total_financing += payment.amount
+        for payment in self._payment_index.pending():
+            total_financing += payment.amount
         return total_financing
 
     @property
     def pending_amount(self) -> Amount:
         'Calculate the pending amount of the purchase made in one payment.'
         if self._installments > 1:
-            return Amount(0)
+            return Amount(0, currency=self._amount.currency)
         # If the purchase has only one installment and it is not a final status, return the total amount
         if self._payments[0].is_final_status():
-            return Amount(0)
+            return Amount(0, currency=self._amount.currency)
         return self._amount
 
+    @property
+    def remaining_amount(self) -> Amount:
+        'Calculate the amount of the purchase that is neither settled nor confirmed yet.'
+        settled_cents = sum(to_cents(payment.amount) for payment in self._payment_index.final())
+        confirmed_cents = sum(to_cents(payment.amount) for payment in self._payment_index.by_status(PaymentStatus.CONFIRMED))
+        return from_cents(max(to_cents(self._amount) - settled_cents - confirmed_cents, 0), self._amount.precision, self._amount.currency)
+
+    @instrumented('purchase.calculate_payments', items=lambda purchase: purchase.installments)
+    @synchronized
     def calculate_payments(self) -> None:
-        remaining_amount = self._amount.value
-        remaining_installments = self._installments
         payment_date: date = self._first_payment_date or self._acquired_at
-        for no in range(1, self._installments + 1):
-            installment_amount = Amount(remaining_amount / remaining_installments)
+        for no, installment_amount in enumerate(split_amount(self._amount, self._installments), start=1):
             payment = Payment(
                 expense=self,
                 amount=installment_amount,
@@ -97,43 +105,63 @@ class Purchase(Expense):
                 status=PaymentStatus.UNCONFIRMED,
                 payment_date=payment_date
             )
-            self._payments.append(payment)
-            remaining_amount -= installment_amount.value
-            remaining_installments -= 1
+            self._attach_payment(payment)
             payment_date = add_months_to_date(payment_date, 1) if self._installments > 1 else payment_date
 
+    @synchronized
     def update_status(self) -> None:
         'Update the status of the purchase based on current conditions.'
-        if any(not payment.is_final_status() for payment in self._payments):
+        if self._payment_index.pending_count():
             self._status = ExpenseStatus.PENDING
         else:
             self._status = ExpenseStatus.FINISHED
 
     def update_payment(self, payment: Payment) -> None:
         'Update a specific payment and adjust the purchase status and unconfirmed payment amounts accordingly.'
-        payment_to_update = next((p for p in self._payments if p.id == payment.id), None)
-        if not payment_to_update:
-            raise PaymentNotFoundInExpenseException(f'Payment with id {payment.id} not found in purchase.')
-
-        payment_to_update.amount = payment.amount
-        payment_to_update.status = payment.status
-
-        pending_payments = [p for p in self._payments if not p.is_final_status()]
-        if not pending_payments:
-            self.update_status()
-            return
-
-        pendig_amount = self.pending_amount
-        if all(payment.status == PaymentStatus.CONFIRMED for payment in pending_payments):
-            self.amount = Amount(sum(payment.amount.value for payment in pending_payments))
+        self.update_payments([payment])
+
+    @instrumented('purchase.update_payments', items=lambda purchase, payments: len(purchase.payments))
+    @synchronized
+    def update_payments(self, payments: List[Payment]) -> None:
+        '''
+        Apply a batch of payment updates and redistribute the remaining amount once.
+
+        Every payment is looked up and its currency checked before anything is changed, so the batch
+        is applied entirely or not at all.
+        '''
+        updates = []
+        for payment in payments:
+            payment_to_update = self._payment_index.get(payment.id)
+            if not payment_to_update:
+                raise PaymentNotFoundInExpenseException(f'Payment with id {payment.id} not found in purchase.')
+            self._check_currency(payment.amount)
+            updates.append((payment_to_update, payment))
+
+        for payment_to_update, payment in updates:
+            payment_to_update.amount = payment.amount
+            payment_to_update.status = payment.status
+
+        self.__redistribute_remaining_amount()
+        self.update_status()
+
+    def __redistribute_remaining_amount(self) -> None:
+        '''Spread the remaining amount over the unconfirmed installments, keeping exact cents.'''
+        unconfirmed_payments = sorted(
+            (payment for payment in self._payment_index.pending() if payment.status != PaymentStatus.CONFIRMED),
+            key=lambda p: p.no_installment
+        )
+        if not unconfirmed_payments:
+            if self._payment_index.count(PaymentStatus.CONFIRMED):
+                # Every pending installment has its real amount, so they define the purchase total
+                self._amount = self.paid_amount + Amount(
+                    sum(payment.amount.value for payment in self._payment_index.by_status(PaymentStatus.CONFIRMED)),
+                    currency=self._amount.currency,
+                )
             return
 
-        for payment in pending_payments:
-            if payment.status == PaymentStatus.CONFIRMED:
-                continue
-            else:
-                payment.amount = Amount(pendig_amount.value / len(pending_payments))
-                pendig_amount = Amount(pendig_amount.value - payment.amount.value)
+        installment_amounts = split_amount(self.remaining_amount, len(unconfirmed_payments))
+        for payment, installment_amount in zip(unconfirmed_payments, installment_amounts):
+            payment.amount = installment_amount
 
     @classmethod
     def from_dict(cls, data: dict) -> 'Purchase':
@@ -144,7 +172,7 @@ class Purchase(Expense):
             title=data['title'],
             cc_name=data['cc_name'],
             acquired_at=data['acquired_at'],
-            amount=Amount(data['amount']),
+            amount=Amount(data['amount'], currency=Currency(data.get('currency', Currency.ARS.value))),
             installments=data.get('installments', 1),
             first_payment_date=data.get('first_payment_date'),
             category=data.get('category'),
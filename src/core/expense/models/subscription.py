@@ -3,8 +3,10 @@ from typing import Optional
 from datetime import date
 from typing import List
 
+from ...shared.entity_base import synchronized
 from ...shared.helpers.dates import add_months_to_date
-from ...shared.value_objects import Amount
+from ...shared.instrumentation import instrumented
+from ...shared.value_objects import Amount, Currency
 from ...account.models.account import Account
 from ..exceptions import PaymentNotFoundInExpenseException
 from ..enums import ExpenseType, ExpenseStatus, PaymentStatus
@@ -25,7 +27,7 @@ class Subscription(Expense):
         amount: Amount,
         first_payment_date: Optional[date] = None,
         category: Optional[Category] = None,
-        payments: List[Payment] = [],
+        payments: Optional[List[Payment]] = None,
         id: Optional[UUID] = None
     ):
         super().__init__(
@@ -48,14 +50,15 @@ class Subscription(Expense):
     @property
     def pending_amount(self) -> Amount:
         'Calculate the pending amount of the subscription.'
-        total_pending = sum(payment.amount.value for payment in self._payments if payment.status == PaymentStatus.CONFIRMED)
-        return Amount(total_pending)
+        total_pending = sum(payment.amount.value for payment in self._payment_index.by_status(PaymentStatus.CONFIRMED))
+        return Amount(total_pending, currency=self._amount.currency)
 
     @property
     def pending_financing_amount(self) -> Amount:
         'A suscription has not financing amounts.'
-        return Amount(0)
+        return Amount(0, currency=self._amount.currency)
 
+    @synchronized
     def calculate_payments(self) -> None:
         payment = Payment(
             expense=self,
@@ -64,34 +67,61 @@ class Subscription(Expense):
             status=PaymentStatus.UNCONFIRMED,
             payment_date=self._first_payment_date
         )
-        self._payments.append(payment)
+        self._attach_payment(payment)
 
+    @instrumented('subscription.add_new_payment', items=lambda subscription, payment: len(subscription.payments))
+    @synchronized
     def add_new_payment(self, payment: Payment) -> None:
         if payment.expense.id != self.id:
             raise ValueError('Payment expense ID does not match subscription ID')
+        self._check_currency(payment.amount)
         self._amount = payment.amount
-        self._payments.append(payment)
+        self._attach_payment(payment)
         self.__sort_payments_by_date()
         self.__update_amount()
 
+    @synchronized
     def remove_payment(self, payment_id: UUID) -> None:
-        for payment in self._payments:
-            if payment.id == payment_id:
-                self._payments.remove(payment)
-                self.__sort_payments_by_date()
-                self.__update_amount()
-                return
-        raise PaymentNotFoundInExpenseException(f'Payment with ID {payment_id} not found in subscription {self.title}.')
+        if self._detach_payment(payment_id) is None:
+            raise PaymentNotFoundInExpenseException(f'Payment with ID {payment_id} not found in subscription {self.title}.')
+        self.__sort_payments_by_date()
+        self.__update_amount()
 
+    @synchronized
     def update_payment(self, payment_id: UUID, payment: Payment) -> None:
-        for i, payment in enumerate(self._payments):
-            if payment.id == payment_id:
-                self._payments[i] = payment
-                self.__sort_payments_by_date()
-                self.__update_amount()
-                return
-        raise PaymentNotFoundInExpenseException(f'Payment with ID {payment_id} not found in subscription {self.title}.')
+        self._check_currency(payment.amount)
+        if self._detach_payment(payment_id) is None:
+            raise PaymentNotFoundInExpenseException(f'Payment with ID {payment_id} not found in subscription {self.title}.')
+        self._attach_payment(payment)
+        self.__sort_payments_by_date()
+        self.__update_amount()
+
+    @instrumented('subscription.update_payments', items=lambda subscription, payments: len(subscription.payments))
+    @synchronized
+    def update_payments(self, payments: List[Payment]) -> None:
+        '''
+        Apply a batch of payment updates in place, sorting and updating the amount only once.
+
+        Every payment is looked up and its currency checked before anything is changed, so the batch
+        is applied entirely or not at all.
+        '''
+        updates = []
+        for payment in payments:
+            payment_to_update = self._payment_index.get(payment.id)
+            if payment_to_update is None:
+                raise PaymentNotFoundInExpenseException(f'Payment with ID {payment.id} not found in subscription {self.title}.')
+            self._check_currency(payment.amount)
+            updates.append((payment_to_update, payment))
+
+        for payment_to_update, payment in updates:
+            payment_to_update.amount = payment.amount
+            payment_to_update.status = payment.status
+            if payment.payment_date is not None:
+                payment_to_update.payment_date = payment.payment_date
+        self.__sort_payments_by_date()
+        self.__update_amount()
 
+    @synchronized
     def get_next_payment(self, factor: Amount = Amount(1.0), is_simulated: bool = False) -> Payment:
         if factor.value <= 0:
             raise ValueError('Factor must be greater than zero')
@@ -99,7 +129,7 @@ class Subscription(Expense):
         next_payment_date = add_months_to_date(last_payment_date, 1) if last_payment_date else self._acquired_at
         return Payment(
             expense=self,
-            amount=Amount(self._amount.value * factor.value),
+            amount=Amount(self._amount.value * factor.value, self._amount.precision, self._amount.currency),
             no_installment=len(self._payments) + 1,
             status=PaymentStatus.SIMULATED if is_simulated else PaymentStatus.UNCONFIRMED,
             payment_date=next_payment_date
@@ -126,7 +156,7 @@ class Subscription(Expense):
             title=data['title'],
             cc_name=data['cc_name'],
             acquired_at=data['acquired_at'],
-            amount=Amount(data['amount']),
+            amount=Amount(data['amount'], currency=Currency(data.get('currency', Currency.ARS.value))),
             first_payment_date=data.get('first_payment_date'),
             category=data.get('category'),
             payments=payments,
@@ -0,0 +1,82 @@
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .anomaly_detector import Anomaly, AnomalyDetector, RollingStats
+    from .compact_records import CompactExpense, CompactPayment, MemoryReport, compact_expense, expand_expense, memory_report
+    from .category_rollups import CategoryRollup, CategoryRollupStore
+    from .expense_factory import ExpenseFactory
+    from .expense_search import ExpenseSearchIndex, tokenize
+    from .payment_batch import PaymentBatchProcessor, PaymentBatchSummary, StatementEntry
+    from .payment_ledger import LedgerRecordKind, PaymentLedger, expense_from_state, expense_to_state, hydrate_expense
+    from .statement_importer import ImportReport, StatementImporter, parse_statement_amount, read_csv_lines, read_ofx_lines
+    from .statement_reconciliation import ReconciliationMatch, ReconciliationResult, StatementLine, StatementReconciler
+
+__all__ = [
+    'Anomaly',
+    'AnomalyDetector',
+    'RollingStats',
+    'CategoryRollup',
+    'CategoryRollupStore',
+    'CompactExpense',
+    'CompactPayment',
+    'MemoryReport',
+    'compact_expense',
+    'expand_expense',
+    'memory_report',
+    'ExpenseFactory',
+    'ExpenseSearchIndex',
+    'tokenize',
+    'PaymentBatchProcessor',
+    'PaymentBatchSummary',
+    'StatementEntry',
+    'LedgerRecordKind',
+    'PaymentLedger',
+    'expense_from_state',
+    'expense_to_state',
+    'hydrate_expense',
+    'ImportReport',
+    'StatementImporter',
+    'parse_statement_amount',
+    'read_csv_lines',
+    'read_ofx_lines',
+    'ReconciliationMatch',
+    'ReconciliationResult',
+    'StatementLine',
+    'StatementReconciler',
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'Anomaly': '.anomaly_detector',
+    'AnomalyDetector': '.anomaly_detector',
+    'RollingStats': '.anomaly_detector',
+    'CategoryRollup': '.category_rollups',
+    'CategoryRollupStore': '.category_rollups',
+    'CompactExpense': '.compact_records',
+    'CompactPayment': '.compact_records',
+    'MemoryReport': '.compact_records',
+    'compact_expense': '.compact_records',
+    'expand_expense': '.compact_records',
+    'memory_report': '.compact_records',
+    'ExpenseFactory': '.expense_factory',
+    'ExpenseSearchIndex': '.expense_search',
+    'tokenize': '.expense_search',
+    'PaymentBatchProcessor': '.payment_batch',
+    'PaymentBatchSummary': '.payment_batch',
+    'StatementEntry': '.payment_batch',
+    'LedgerRecordKind': '.payment_ledger',
+    'PaymentLedger': '.payment_ledger',
+    'expense_from_state': '.payment_ledger',
+    'expense_to_state': '.payment_ledger',
+    'hydrate_expense': '.payment_ledger',
+    'ImportReport': '.statement_importer',
+    'StatementImporter': '.statement_importer',
+    'parse_statement_amount': '.statement_importer',
+    'read_csv_lines': '.statement_importer',
+    'read_ofx_lines': '.statement_importer',
+    'ReconciliationMatch': '.statement_reconciliation',
+    'ReconciliationResult': '.statement_reconciliation',
+    'StatementLine': '.statement_reconciliation',
+    'StatementReconciler': '.statement_reconciliation',
+})
@@ -0,0 +1,285 @@
+import math
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import to_cents
+from ...shared.value_objects import Currency
+from ..enums import AnomalyKind, ExpenseType
+from ..events import PaymentAdded, PaymentRemoved, PaymentUpdated
+from ..models import Expense, Payment
+
+# (account ID, currency, cents, date bucket)
+ChargeKey = Tuple[UUID, Currency, int, int]
+
+
+class Anomaly:
+    'Something unusual about a payment: a subscription price jump or a possible duplicate charge.'
+
+    def __init__(
+        self,
+        kind: AnomalyKind,
+        payment: Payment,
+        related: Optional[Payment] = None,
+        ratio: Optional[float] = None,
+    ):
+        self.kind = kind
+        self.payment = payment
+        self.related = related  # The possibly duplicated payment
+        self.ratio = ratio  # New price over the usual price, for price jumps
+
+    @property
+    def expense(self) -> Expense:
+        'Get the expense of the flagged payment.'
+        return self.payment.expense
+
+
+class RollingStats:
+    'Mean and standard deviation of the last amounts of a subscription, updated in O(1).'
+
+    def __init__(self, window: int):
+        self._window: Deque[int] = deque(maxlen=window)
+        self._sum = 0
+        self._sum_of_squares = 0
+
+    def __len__(self) -> int:
+        return len(self._window)
+
+    @property
+    def mean(self) -> float:
+        'Get the mean of the amounts in the window, in cents.'
+        return self._sum / len(self._window) if self._window else 0.0
+
+    @property
+    def stdev(self) -> float:
+        'Get the population standard deviation of the amounts in the window, in cents.'
+        if not self._window:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(max(self._sum_of_squares / len(self._window) - mean * mean, 0.0))
+
+    def push(self, cents: int) -> None:
+        'Add an amount, dropping the oldest one when the window is full.'
+        if len(self._window) == self._window.maxlen:
+            dropped = self._window[0]
+            self._sum -= dropped
+            self._sum_of_squares -= dropped * dropped
+        self._window.append(cents)
+        self._sum += cents
+        self._sum_of_squares += cents * cents
+
+    def reset(self) -> None:
+        'Drop every amount, e.g. when a new price starts.'
+        self._window.clear()
+        self._sum = self._sum_of_squares = 0
+
+
+class AnomalyDetector:
+    '''
+    Flags subscription price jumps and possible duplicate charges as payments come in.
+
+    Every subscription keeps rolling statistics of its last amounts, and a payment whose amount
+    differs from their mean by more than `price_jump_ratio` is a price jump, after which the
+    statistics restart from the new price. The first installment of every purchase is indexed by
+    (account, currency, cents, date bucket) with buckets one day wider than the duplicate window, so a
+    possible duplicate is found by looking up the bucket of the charge and its two neighbours.
+    Either check is O(1) per payment, which keeps the detector cheap enough for the import path.
+
+    Every subscription payment counts once in the statistics, even when an update detaches and
+    re-adds it, and every anomaly is reported once. Only the last `max_anomalies` anomalies are
+    kept in `anomalies`; `drain` hands them over and clears them.
+    '''
+
+    def __init__(
+        self,
+        price_jump_ratio: float = 0.2,
+        duplicate_window_days: int = 3,
+        stats_window: int = 6,
+        max_anomalies: int = 1000,
+        on_anomaly: Optional[Callable[[Anomaly], None]] = None,
+        dispatcher: EventDispatcher = default_dispatcher,
+    ):
+        if price_jump_ratio <= 0:
+            raise ValueError('price_jump_ratio must be greater than zero')
+        if duplicate_window_days < 0:
+            raise ValueError('duplicate_window_days cannot be negative')
+        if stats_window < 1:
+            raise ValueError('stats_window must be at least 1')
+        if max_anomalies < 1:
+            raise ValueError('max_anomalies must be at least 1')
+        self._price_jump_ratio = price_jump_ratio
+        self._duplicate_window_days = duplicate_window_days
+        self._stats_window = stats_window
+        self._on_anomaly = on_anomaly
+        self._dispatcher = dispatcher
+        self._stats: Dict[UUID, RollingStats] = {}
+        self._charges: Dict[ChargeKey, List[Payment]] = {}
+        self._charge_keys: Dict[UUID, ChargeKey] = {}  # Indexed key of each charge
+        self._observed: Dict[UUID, Dict[UUID, int]] = {}  # Cents of the payments in the statistics, per subscription
+        self._reported: Dict[UUID, Set[Tuple[AnomalyKind, Optional[UUID]]]] = {}  # Anomalies reported per payment
+        self.anomalies: Deque[Anomaly] = deque(maxlen=max_anomalies)
+
+    def observe(self, payment: Payment) -> List[Anomaly]:
+        '''
+        Check a new payment and remember it for the next ones.
+
+        :param payment: The payment, observed in payment date order within its expense.
+        :return: The anomalies found, also kept in `anomalies`.
+        '''
+        if payment.payment_date is None or not payment.is_spending():
+            return []
+        if payment.expense.expense_type == ExpenseType.SUBSCRIPTION:
+            observed = self._observed.setdefault(payment.expense.id, {})
+            cents = observed.get(payment.id)
+            if cents is None:
+                anomaly = self.__check_price(payment, record=True)
+                observed[payment.id] = to_cents(payment.amount)
+            elif cents != to_cents(payment.amount):
+                # Already in the statistics, e.g. re-added by an update, so only the new amount is checked
+                anomaly = self.__check_price(payment, record=False)
+                observed[payment.id] = to_cents(payment.amount)
+            else:
+                anomaly = None
+            found = [anomaly] if anomaly is not None else []
+        elif payment.no_installment == 1:
+            self.forget(payment)
+            found = self.__check_duplicates(payment)
+            self.__index_charge(payment)
+        else:
+            found = []
+        return self.__report(found)
+
+    def observe_many(self, payments: Iterable[Payment]) -> List[Anomaly]:
+        'Check a stream of payments, in payment date order within each expense.'
+        found = []
+        for payment in payments:
+            found.extend(self.observe(payment))
+        return found
+
+    def scan(self, expenses: Iterable[Expense]) -> List[Anomaly]:
+        'Check the payments of existing expenses, e.g. to build the detector state on start-up.'
+        found = []
+        for expense in expenses:
+            dated = [payment for payment in expense.payments if payment.payment_date is not None]
+            found.extend(self.observe_many(sorted(dated, key=lambda payment: payment.payment_date)))
+        return found
+
+    def forget(self, payment: Payment) -> None:
+        'Drop a charge from the duplicate index, e.g. after the payment is removed.'
+        key = self._charge_keys.pop(payment.id, None)
+        if key is None:
+            return
+        charges = [charge for charge in self._charges[key] if charge.id != payment.id]
+        if charges:
+            self._charges[key] = charges
+        else:
+            del self._charges[key]
+
+    def forget_expense(self, expense_id: UUID) -> None:
+        'Drop the price statistics of a subscription, e.g. after it is deleted.'
+        self._stats.pop(expense_id, None)
+        for payment_id in self._observed.pop(expense_id, {}):
+            self._reported.pop(payment_id, None)
+
+    def drain(self) -> List[Anomaly]:
+        'Get the anomalies kept so far and clear them.'
+        anomalies = list(self.anomalies)
+        self.anomalies.clear()
+        return anomalies
+
+    def clear(self) -> None:
+        'Drop the statistics, the indexed charges and the anomalies found so far.'
+        self._stats.clear()
+        self._charges.clear()
+        self._charge_keys.clear()
+        self._observed.clear()
+        self._reported.clear()
+        self.anomalies.clear()
+
+    def subscribe(self) -> None:
+        'Check the payments as they are added or changed.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        self.observe(event.payment)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        payment = event.payment
+        if payment.expense.expense_type == ExpenseType.PURCHASE:
+            if payment.id in self._charge_keys or payment.no_installment == 1:
+                # The amount, date or status of the charge may have changed, so check it again
+                self.forget(payment)
+                self.observe(payment)
+        elif payment.expense.expense_type == ExpenseType.SUBSCRIPTION:
+            # The subscription amount follows its latest payment, so a corrected amount is checked
+            # against the usual price without counting twice in the statistics
+            self.observe(payment)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        # A subscription payment stays in the statistics, since an update detaches and re-adds it
+        self.forget(event.payment)
+        if event.payment.expense.expense_type == ExpenseType.PURCHASE:
+            self._reported.pop(event.payment.id, None)
+
+    def __check_price(self, payment: Payment, record: bool) -> Optional[Anomaly]:
+        'Compare a subscription payment with the usual price of the subscription.'
+        stats = self._stats.get(payment.expense.id)
+        if stats is None:
+            stats = self._stats[payment.expense.id] = RollingStats(self._stats_window)
+        cents = to_cents(payment.amount)
+        anomaly = None
+        if len(stats) and stats.mean > 0:
+            ratio = cents / stats.mean
+            if abs(ratio - 1) > self._price_jump_ratio:
+                anomaly = Anomaly(AnomalyKind.PRICE_JUMP, payment, ratio=ratio)
+                if record:
+                    stats.reset()
+        if record:
+            stats.push(cents)
+        return anomaly
+
+    def __check_duplicates(self, payment: Payment) -> List[Anomaly]:
+        'Find the indexed charges of the same amount and account a few days around a charge.'
+        account_id, currency, cents, bucket = self.__charge_key(payment)
+        ordinal = payment.payment_date.toordinal()
+        found = []
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for charge in self._charges.get((account_id, currency, cents, neighbour), ()):
+                if charge.expense.id == payment.expense.id or not charge.is_spending():
+                    continue
+                if abs(charge.payment_date.toordinal() - ordinal) <= self._duplicate_window_days:
+                    found.append(Anomaly(AnomalyKind.DUPLICATE_CHARGE, payment, related=charge))
+        return found
+
+    def __index_charge(self, payment: Payment) -> None:
+        key = self.__charge_key(payment)
+        self._charges.setdefault(key, []).append(payment)
+        self._charge_keys[payment.id] = key
+
+    def __charge_key(self, payment: Payment) -> ChargeKey:
+        bucket = payment.payment_date.toordinal() // (self._duplicate_window_days + 1)
+        return payment.expense.account.id, payment.amount.currency, to_cents(payment.amount), bucket
+
+    def __report(self, found: List[Anomaly]) -> List[Anomaly]:
+        'Keep and hand over the anomalies that were not reported yet.'
+        new_anomalies = []
+        for anomaly in found:
+            reported = self._reported.setdefault(anomaly.payment.id, set())
+            key = (anomaly.kind, anomaly.related.id if anomaly.related is not None else None)
+            if key not in reported:
+                reported.add(key)
+                new_anomalies.append(anomaly)
+        self.anomalies.extend(new_anomalies)
+        if self._on_anomaly is not None:
+            for anomaly in new_anomalies:
+                self._on_anomaly(anomaly)
+        return new_anomalies
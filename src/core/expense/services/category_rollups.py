@@ -0,0 +1,259 @@
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from ...shared.currency_rates import CurrencyConverter, single_currency_total
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.dates import add_months_to_date
+from ...shared.value_objects import Amount, Currency
+from ..enums import NON_SPENDING_PAYMENT_STATUSES
+from ..events import PaymentAdded, PaymentRemoved, PaymentUpdated
+from ..interfaces.expense_repository_interface import ExpenseRepositoryInterface
+from ..models import Expense, ExpenseCategory, Payment
+
+YearMonth = Tuple[int, int]
+
+
+class CategoryRollup:
+    '''
+    Totals of the payments of one category in one month, per currency.
+
+    `total` raises CurrencyMismatchException when the payments are in several currencies; use
+    `totals` or `total_in` for those.
+    '''
+
+    def __init__(self, is_income: bool = False):
+        self.is_income = is_income
+        self.cents: Dict[Currency, int] = {}
+        self.count = 0
+
+    @property
+    def totals(self) -> Dict[Currency, Amount]:
+        'Get the total amount of the payments per currency.'
+        return {currency: from_cents(cents, currency=currency) for currency, cents in self.cents.items() if cents}
+
+    @property
+    def total(self) -> Amount:
+        'Get the total amount of the payments.'
+        return single_currency_total(self.totals)
+
+    @property
+    def income(self) -> Amount:
+        'Get the total amount if the category is for income.'
+        return self.total if self.is_income else Amount(0)
+
+    @property
+    def expenses(self) -> Amount:
+        'Get the total amount if the category is for expenses.'
+        return Amount(0) if self.is_income else self.total
+
+    def total_in(self, converter: CurrencyConverter, currency: Currency, on: date) -> Amount:
+        'Get the total amount of the payments converted to one currency.'
+        return converter.convert_totals(self.totals, currency, on)
+
+
+class CategoryRollupStore:
+    '''
+    Materialized (owner, category, year-month) rollups of the payments.
+
+    Rollups are updated incrementally from the payment events and can be rebuilt in bulk from the
+    expense repositories. Reading a rollup, a month breakdown (pie chart) or a month income and
+    expense split never touches the expenses or their payments.
+
+    Expenses may hold their category or only its ID. Categories given to the store resolve those
+    IDs, so their income flag is known; an unknown category ID counts as an expense category.
+
+    The payment events arrive from whichever thread changed the payment, so the rollups are only
+    read and written holding the lock of the store.
+    '''
+
+    def __init__(self, categories: Iterable[ExpenseCategory] = (), dispatcher: EventDispatcher = default_dispatcher):
+        self._dispatcher = dispatcher
+        self._lock = threading.RLock()
+        self._rollups: Dict[UUID, Dict[YearMonth, Dict[Optional[UUID], CategoryRollup]]] = {}
+        self._categories: Dict[UUID, ExpenseCategory] = {}
+        self.add_categories(categories)
+
+    def add_categories(self, categories: Iterable[ExpenseCategory]) -> None:
+        'Register categories to resolve the category IDs of the expenses.'
+        with self._lock:
+            for category in categories:
+                self._categories[category.id] = category
+
+    def get(self, owner_id: UUID, category_id: Optional[UUID], year: int, month: int) -> CategoryRollup:
+        'Get the rollup of a category in a month. Uncategorized payments use a None category ID.'
+        with self._lock:
+            rollup = self._rollups.get(owner_id, {}).get((year, month), {}).get(category_id)
+            return rollup if rollup is not None else CategoryRollup()
+
+    def month_breakdown(self, owner_id: UUID, year: int, month: int) -> Dict[Optional[UUID], CategoryRollup]:
+        'Get the rollups of every category of an owner in a month.'
+        with self._lock:
+            return dict(self._rollups.get(owner_id, {}).get((year, month), {}))
+
+    def month_split(self, owner_id: UUID, year: int, month: int) -> Tuple[Amount, Amount]:
+        'Get the income and expense totals of an owner in a month, when they are in a single currency.'
+        income, expenses = self.__month_split_totals(owner_id, year, month)
+        return single_currency_total(income), single_currency_total(expenses)
+
+    def month_split_in(
+        self, owner_id: UUID, year: int, month: int, converter: CurrencyConverter, currency: Currency
+    ) -> Tuple[Amount, Amount]:
+        'Get the income and expense totals of an owner in a month, converted with the rates of its last day.'
+        on = date.fromordinal(add_months_to_date(date(year, month, 1), 1).toordinal() - 1)
+        income, expenses = self.__month_split_totals(owner_id, year, month)
+        return converter.convert_totals(income, currency, on), converter.convert_totals(expenses, currency, on)
+
+    def trend(self, owner_id: UUID, category_id: Optional[UUID]) -> List[Tuple[YearMonth, CategoryRollup]]:
+        'Get the monthly rollups of a category, ordered by month.'
+        with self._lock:
+            months = self._rollups.get(owner_id, {})
+            return sorted(
+                (year_month, categories[category_id])
+                for year_month, categories in months.items()
+                if category_id in categories
+            )
+
+    def add_payment(self, payment: Payment) -> None:
+        'Add a payment to its rollup.'
+        with self._lock:
+            if payment.is_spending():
+                self.__apply(payment.expense, payment.payment_date, payment.amount.currency, to_cents(payment.amount), 1)
+
+    def remove_payment(self, payment: Payment) -> None:
+        'Remove a payment from its rollup.'
+        with self._lock:
+            if payment.is_spending():
+                self.__apply(payment.expense, payment.payment_date, payment.amount.currency, -to_cents(payment.amount), -1)
+
+    def clear(self, owner_ids: Optional[Iterable[UUID]] = None) -> None:
+        'Drop the rollups of some owners, or of every owner.'
+        with self._lock:
+            if owner_ids is None:
+                self._rollups.clear()
+                return
+            for owner_id in owner_ids:
+                self._rollups.pop(owner_id, None)
+
+    def rebuild_from_expenses(self, expenses: Iterable[Expense], owner_ids: Optional[Iterable[UUID]] = None) -> None:
+        '''
+        Rebuild the rollups of some owners from scratch from their expenses.
+
+        :param expenses: Every expense of the owners.
+        :param owner_ids: The owners to rebuild, also those without expenses. By default, the
+            owners of the expenses.
+        '''
+        with self._lock:
+            rebuilt: Set[UUID] = set()
+            if owner_ids is not None:
+                rebuilt.update(owner_ids)
+                self.clear(rebuilt)
+            for expense in expenses:
+                self.__rebuild_expense(expense, rebuilt)
+
+    def rebuild(
+        self,
+        repository: ExpenseRepositoryInterface,
+        account_ids: List[UUID],
+        page_size: int = 500,
+        owner_ids: Optional[Iterable[UUID]] = None,
+    ) -> None:
+        '''
+        Rebuild the rollups of some owners from scratch, paging through the expenses of their accounts.
+
+        The rollups of the other owners are kept. The rollups of an owner cover all their accounts,
+        so `account_ids` must include every account of the owners being rebuilt.
+
+        :param repository: The expense repository.
+        :param account_ids: The accounts of the owners.
+        :param page_size: The number of expenses per page.
+        :param owner_ids: The owners to rebuild, also those without expenses. By default, the
+            owners of the expenses found.
+        '''
+        with self._lock:
+            rebuilt: Set[UUID] = set()
+            if owner_ids is not None:
+                rebuilt.update(owner_ids)
+                self.clear(rebuilt)
+            page = 1
+            while True:
+                result = repository.get_by_account_ids(account_ids, page, page_size)
+                for expense in result.items:
+                    self.__rebuild_expense(expense, rebuilt)
+                if not result.has_next:
+                    break
+                page += 1
+
+    def subscribe(self) -> None:
+        'Keep the rollups up to date from the payment events.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        self.add_payment(event.payment)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        self.remove_payment(event.payment)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        with self._lock:
+            payment = event.payment
+            if event.previous_status not in NON_SPENDING_PAYMENT_STATUSES:
+                self.__apply(
+                    payment.expense, event.previous_payment_date, event.previous_currency, -to_cents(event.previous_amount), -1
+                )
+            self.add_payment(payment)
+
+    def __apply(
+        self, expense: Expense, payment_date: Optional[date], currency: Currency, delta_cents: int, delta_count: int
+    ) -> None:
+        'Apply a payment delta to the rollup of its owner, category, month and currency.'
+        if payment_date is None:
+            return
+        category = expense.category_id
+        if not isinstance(category, ExpenseCategory):
+            category = self._categories.get(category, category)
+        if isinstance(category, ExpenseCategory):
+            category_id, is_income = category.id, category.is_income
+        else:
+            category_id, is_income = category, False
+        categories = self._rollups.setdefault(expense.account.owner.id, {}).setdefault((payment_date.year, payment_date.month), {})
+        rollup = categories.get(category_id)
+        if rollup is None:
+            rollup = categories[category_id] = CategoryRollup(is_income)
+        rollup.cents[currency] = rollup.cents.get(currency, 0) + delta_cents
+        rollup.count += delta_count
+        if not rollup.count and not any(rollup.cents.values()):
+            del categories[category_id]
+
+    def __rebuild_expense(self, expense: Expense, rebuilt: Set[UUID]) -> None:
+        'Add the payments of an expense, dropping the previous rollups of its owner the first time it is seen.'
+        owner_id = expense.account.owner.id
+        if owner_id not in rebuilt:
+            rebuilt.add(owner_id)
+            self._rollups.pop(owner_id, None)
+        for payment in expense.payments:
+            self.add_payment(payment)
+
+    def __month_split_totals(self, owner_id: UUID, year: int, month: int) -> Tuple[Dict[Currency, Amount], Dict[Currency, Amount]]:
+        'Add up the income and expense rollups of an owner in a month, per currency.'
+        with self._lock:
+            income_cents: Dict[Currency, int] = {}
+            expense_cents: Dict[Currency, int] = {}
+            for rollup in self._rollups.get(owner_id, {}).get((year, month), {}).values():
+                cents = income_cents if rollup.is_income else expense_cents
+                for currency, rollup_cents in rollup.cents.items():
+                    cents[currency] = cents.get(currency, 0) + rollup_cents
+            return (
+                {currency: from_cents(total, currency=currency) for currency, total in income_cents.items()},
+                {currency: from_cents(total, currency=currency) for currency, total in expense_cents.items()},
+            )
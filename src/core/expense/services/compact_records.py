@@ -0,0 +1,243 @@
+import sys
+from datetime import date
+from enum import Enum
+from typing import Iterable, Optional
+from uuid import UUID
+
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.interning import EnumCodec, StringInterner
+from ...shared.value_objects import Currency
+from ...account.models.account import Account
+from ..enums import ExpenseStatus, ExpenseType, PaymentStatus
+from ..models import Expense, Payment
+from .payment_ledger import hydrate_expense
+
+# Codes are the definition order of the members, so reordering them invalidates stored codes
+EXPENSE_TYPE_CODEC = EnumCodec(ExpenseType)
+EXPENSE_STATUS_CODEC = EnumCodec(ExpenseStatus)
+PAYMENT_STATUS_CODEC = EnumCodec(PaymentStatus)
+CURRENCY_CODEC = EnumCodec(Currency)
+
+
+def _ordinal(value: Optional[date]) -> int:
+    return value.toordinal() if value is not None else 0
+
+
+def _date(ordinal: int) -> Optional[date]:
+    return date.fromordinal(ordinal) if ordinal else None
+
+
+class CompactPayment:
+    'A payment reduced to integers: ID, cents, date ordinal and status code.'
+
+    __slots__ = ('id', 'cents', 'payment_date', 'no_installment', 'status', 'version')
+
+    def __init__(self, id: int, cents: int, payment_date: int, no_installment: int, status: int, version: int = 0):
+        self.id = id  # UUID as an int, lighter than a UUID object
+        self.cents = cents
+        self.payment_date = payment_date  # Date ordinal, 0 if there is no date
+        self.no_installment = no_installment
+        self.status = status  # PAYMENT_STATUS_CODEC code
+        self.version = version
+
+
+class CompactExpense:
+    '''
+    An expense reduced to integers and interned string codes, to keep many in memory.
+
+    The title and credit card name are codes of a `StringInterner` and the enums are codes of
+    their `EnumCodec`, so a record holds no strings or enum members of its own.
+    '''
+
+    __slots__ = (
+        'id', 'expense_type', 'status', 'title', 'cc_name', 'currency', 'cents', 'precision',
+        'acquired_at', 'first_payment_date', 'installments', 'category_id', 'version', 'payments',
+    )
+
+    def __init__(
+        self,
+        id: int,
+        expense_type: int,
+        status: int,
+        title: int,
+        cc_name: int,
+        currency: int,
+        cents: int,
+        precision: int,
+        acquired_at: int,
+        first_payment_date: int,
+        installments: int,
+        category_id: Optional[UUID],
+        version: int,
+        payments: tuple,
+    ):
+        self.id = id  # UUID as an int
+        self.expense_type = expense_type
+        self.status = status
+        self.title = title
+        self.cc_name = cc_name
+        self.currency = currency
+        self.cents = cents
+        self.precision = precision
+        self.acquired_at = acquired_at
+        self.first_payment_date = first_payment_date
+        self.installments = installments
+        self.category_id = category_id
+        self.version = version
+        self.payments = payments
+
+
+def compact_expense(expense: Expense, interner: StringInterner) -> CompactExpense:
+    'Reduce an expense and its payments to a compact record, encoding its strings with the given interner.'
+    category = expense.category_id
+    category_id = getattr(category, 'id', category)
+    return CompactExpense(
+        id=expense.id.int,
+        expense_type=EXPENSE_TYPE_CODEC.encode(expense.expense_type),
+        status=EXPENSE_STATUS_CODEC.encode(expense.status),
+        title=interner.code(expense.title),
+        cc_name=interner.code(expense.cc_name),
+        currency=CURRENCY_CODEC.encode(expense.amount.currency),
+        cents=to_cents(expense.amount),
+        precision=expense.amount.precision,
+        acquired_at=_ordinal(expense.acquired_at),
+        first_payment_date=_ordinal(expense.first_payment_date),
+        installments=expense.installments,
+        category_id=category_id if isinstance(category_id, UUID) else None,
+        version=expense.version,
+        payments=tuple(
+            CompactPayment(
+                payment.id.int,
+                to_cents(payment.amount),
+                _ordinal(payment.payment_date),
+                payment.no_installment,
+                PAYMENT_STATUS_CODEC.encode(payment.status),
+                payment.version,
+            )
+            for payment in expense.payments
+        ),
+    )
+
+
+def expand_expense(
+    record: CompactExpense,
+    account: Account,
+    interner: StringInterner,
+    category: object = None,
+) -> Expense:
+    '''
+    Hydrate the expense of a compact record, without publishing events.
+
+    :param record: The compact record.
+    :param account: The account the expense belongs to.
+    :param interner: The interner that encoded the strings of the record.
+    :param category: The category of the expense. By default, the category ID of the record.
+    :return: The hydrated Purchase or Subscription.
+    '''
+    currency = CURRENCY_CODEC.decode(record.currency)
+    payments = []
+    for compact in record.payments:
+        payment = Payment(
+            expense=None,
+            amount=from_cents(compact.cents, record.precision, currency),
+            no_installment=compact.no_installment,
+            status=PAYMENT_STATUS_CODEC.decode(compact.status),
+            payment_date=_date(compact.payment_date),
+            id=UUID(int=compact.id),
+        )
+        payment.version = compact.version
+        payments.append(payment)
+    expense = hydrate_expense(
+        EXPENSE_TYPE_CODEC.decode(record.expense_type),
+        EXPENSE_STATUS_CODEC.decode(record.status),
+        payments,
+        installments=record.installments,
+        account=account,
+        title=interner.value(record.title),
+        cc_name=interner.value(record.cc_name),
+        acquired_at=_date(record.acquired_at),
+        amount=from_cents(record.cents, record.precision, currency),
+        first_payment_date=_date(record.first_payment_date),
+        category=category if category is not None else record.category_id,
+        id=UUID(int=record.id),
+    )
+    expense.version = record.version
+    return expense
+
+
+class MemoryReport:
+    'Memory held by hydrated expenses compared with their compact records.'
+
+    def __init__(self, expenses: int, payments: int, entity_bytes: int, compact_bytes: int, strings: int, distinct_strings: int):
+        self.expenses = expenses
+        self.payments = payments
+        self.entity_bytes = entity_bytes  # Expenses, payments and their own strings
+        self.compact_bytes = compact_bytes  # Compact records plus the interned strings they use
+        self.strings = strings  # Titles and credit card names
+        self.distinct_strings = distinct_strings
+
+    @property
+    def saved_bytes(self) -> int:
+        'Get the memory saved by the compact records.'
+        return self.entity_bytes - self.compact_bytes
+
+    @property
+    def ratio(self) -> float:
+        'Get the size of the compact records relative to the entities.'
+        return self.compact_bytes / self.entity_bytes if self.entity_bytes else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f'{self.expenses} expenses, {self.payments} payments: '
+            f'{self.entity_bytes / 1024:.1f} KiB as entities, {self.compact_bytes / 1024:.1f} KiB compact '
+            f'({self.ratio:.0%}), {self.distinct_strings} distinct of {self.strings} strings'
+        )
+
+
+def _deep_size(obj: object, seen: set) -> int:
+    'Get the memory of an object and everything it owns, counting shared objects once.'
+    if id(obj) in seen or obj is None or isinstance(obj, (Enum, Account, type)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    elif not isinstance(obj, (str, bytes, int, float, bool, date)):
+        attributes = getattr(obj, '__dict__', None)
+        if attributes is not None:
+            size += _deep_size(attributes, seen)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                if isinstance(slot, str) and slot != '__weakref__' and hasattr(obj, slot):
+                    size += _deep_size(getattr(obj, slot), seen)
+    return size
+
+
+def memory_report(expenses: Iterable[Expense]) -> MemoryReport:
+    '''
+    Measure the memory of hydrated expenses and of the same expenses as compact records.
+
+    The categories and accounts are shared with the rest of the application and are not counted.
+    Run it over a realistic dataset (e.g. several years of a heavy user) to size the savings.
+
+    :param expenses: The hydrated expenses.
+    :return: The report.
+    '''
+    expenses = list(expenses)
+    interner = StringInterner()
+    records = [compact_expense(expense, interner) for expense in expenses]
+    # The category of an expense may be an ExpenseCategory, shared and not owned by the expense
+    entity_seen = {id(expense.category_id) for expense in expenses if not isinstance(expense.category_id, UUID)}
+    entity_bytes = sum(_deep_size(expense, entity_seen) for expense in expenses)
+    compact_seen: set = set()
+    compact_bytes = sum(_deep_size(record, compact_seen) for record in records) + interner.memory()
+    return MemoryReport(
+        expenses=len(expenses),
+        payments=sum(len(record.payments) for record in records),
+        entity_bytes=entity_bytes,
+        compact_bytes=compact_bytes,
+        strings=2 * len(expenses),
+        distinct_strings=len(interner),
+    )
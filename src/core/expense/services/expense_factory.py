@@ -0,0 +1,140 @@
+from contextlib import nullcontext
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ...shared.events import dispatcher
+from ...shared.helpers.interning import StringInterner
+from ...shared.value_objects import Amount, Currency
+from ...account.models.account import Account
+from ..models import ExpenseCategory, Purchase, Subscription
+
+# (title, amount, acquired_at, installments, first_payment_date)
+PurchaseRow = Tuple[str, Amount, date, int, Optional[date]]
+# (title, amount, acquired_at, first_payment_date)
+SubscriptionRow = Tuple[str, Amount, date, Optional[date]]
+
+
+class ExpenseFactory:
+    '''
+    Builds the purchases and subscriptions of one account.
+
+    The account and category are bound once and every expense gets its own payments list. The
+    expenses built by a factory share one copy of each repeated title, credit card name, date and
+    amount, so building many similar expenses (a statement, a subscription history) keeps memory
+    flat. Amounts are never changed in place, a payment gets a new one, so they can be shared.
+    The pools live as long as the factory, so use one factory per import or batch.
+
+    Bulk builds can run with the payment events muted, e.g. for imports or fixtures whose
+    listeners are rebuilt afterwards.
+    '''
+
+    def __init__(
+        self,
+        account: Account,
+        category: Optional[ExpenseCategory] = None,
+        publish_events: bool = True,
+        interner: Optional[StringInterner] = None,
+    ):
+        self._account = account
+        self._category = category
+        self._publish_events = publish_events
+        self._interner = interner if interner is not None else StringInterner()
+        self._dates: Dict[date, date] = {}
+        self._amounts: Dict[Tuple[float, int, Currency], Amount] = {}
+
+    def purchase(
+        self,
+        title: str,
+        amount: Amount,
+        acquired_at: date,
+        installments: int = 1,
+        first_payment_date: Optional[date] = None,
+        cc_name: Optional[str] = None,
+    ) -> Purchase:
+        'Build a purchase with its payments calculated.'
+        with self.__events():
+            return self.__purchase(title, amount, acquired_at, installments, first_payment_date, cc_name)
+
+    def subscription(
+        self,
+        title: str,
+        amount: Amount,
+        acquired_at: date,
+        first_payment_date: Optional[date] = None,
+        cc_name: Optional[str] = None,
+    ) -> Subscription:
+        'Build a subscription with its first payment.'
+        with self.__events():
+            return self.__subscription(title, amount, acquired_at, first_payment_date, cc_name)
+
+    def purchases(self, rows: Iterable[PurchaseRow]) -> List[Purchase]:
+        'Build many purchases at once.'
+        with self.__events():
+            return [self.__purchase(*row) for row in rows]
+
+    def subscriptions(self, rows: Iterable[SubscriptionRow]) -> List[Subscription]:
+        'Build many subscriptions at once.'
+        with self.__events():
+            return [self.__subscription(*row) for row in rows]
+
+    def iter_purchases(self, rows: Iterable[PurchaseRow]) -> Iterator[Purchase]:
+        'Lazily build purchases one at a time, to stream them into a repository.'
+        for row in rows:
+            yield self.purchase(*row)
+
+    def __purchase(
+        self,
+        title: str,
+        amount: Amount,
+        acquired_at: date,
+        installments: int = 1,
+        first_payment_date: Optional[date] = None,
+        cc_name: Optional[str] = None,
+    ) -> Purchase:
+        purchase = Purchase(
+            account=self._account,
+            title=self._interner.intern(title),
+            cc_name=self._interner.intern(cc_name or title),
+            acquired_at=self.__date(acquired_at),
+            amount=self.__amount(amount),
+            installments=installments,
+            first_payment_date=self.__date(first_payment_date),
+            category=self._category,
+        )
+        for payment in purchase.payments:
+            # Equal values, so no PaymentUpdated is published
+            payment.amount = self.__amount(payment.amount)
+            payment.payment_date = self.__date(payment.payment_date)
+        return purchase
+
+    def __subscription(
+        self,
+        title: str,
+        amount: Amount,
+        acquired_at: date,
+        first_payment_date: Optional[date] = None,
+        cc_name: Optional[str] = None,
+    ) -> Subscription:
+        return Subscription(
+            account=self._account,
+            title=self._interner.intern(title),
+            cc_name=self._interner.intern(cc_name or title),
+            acquired_at=self.__date(acquired_at),
+            amount=self.__amount(amount),
+            first_payment_date=self.__date(first_payment_date),
+            category=self._category,
+        )
+
+    def __date(self, value: Optional[date]) -> Optional[date]:
+        'Get the shared copy of a date.'
+        if value is None:
+            return None
+        return self._dates.setdefault(value, value)
+
+    def __amount(self, value: Amount) -> Amount:
+        'Get the shared copy of an amount.'
+        return self._amounts.setdefault((value.value, value.precision, value.currency), value)
+
+    def __events(self):
+        'Get the context in which the expenses are built.'
+        return nullcontext() if self._publish_events else dispatcher.muted()
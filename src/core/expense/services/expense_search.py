@@ -0,0 +1,218 @@
+import json
+import math
+import os
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ..events import ExpenseRenamed
+from ..helpers.statements import normalize_description
+from ..models import Expense
+
+
+def tokenize(text: str) -> List[str]:
+    '''
+    Split an expense name or a search query into normalized tokens.
+
+    Accents are folded, so "Café" and "cafe" match, and the installment notation is dropped.
+
+    :param text: The text to tokenize.
+    :return: The distinct tokens, in order of appearance.
+    '''
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return list(dict.fromkeys(normalize_description(folded).split()))
+
+
+def trigrams(token: str) -> Set[str]:
+    'Get the trigrams of a token, padded so short tokens and word starts weigh in.'
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ExpenseSearchIndex:
+    '''
+    In-process inverted index over the titles and credit card names of the expenses.
+
+    Every token points to the expenses that contain it, the sorted vocabulary answers prefix
+    queries with a binary search, and a trigram index over the vocabulary finds the tokens similar
+    to a misspelled query token, so a fuzzy query only compares the query against the vocabulary
+    tokens that share trigrams with it instead of every expense.
+
+    The index is updated with `add` when an expense is saved and from the `ExpenseRenamed` events
+    once subscribed, and it can be saved to and loaded from a JSON file.
+    '''
+
+    EXACT_SCORE = 1.0
+    PREFIX_SCORE = 0.8
+    FUZZY_SCORE = 0.6  # Multiplied by the trigram similarity
+
+    def __init__(self, min_similarity: float = 0.4, dispatcher: EventDispatcher = default_dispatcher):
+        if not 0 < min_similarity <= 1:
+            raise ValueError('min_similarity must be in (0, 1]')
+        self._min_similarity = min_similarity
+        self._dispatcher = dispatcher
+        self._documents: Dict[UUID, Tuple[UUID, List[str]]] = {}  # Expense ID to account ID and tokens
+        self._postings: Dict[str, Set[UUID]] = {}
+        self._vocabulary: List[str] = []  # Sorted tokens, for prefix queries
+        self._trigrams: Dict[str, Set[str]] = {}  # Trigram to tokens of the vocabulary
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, expense_id: UUID) -> bool:
+        return expense_id in self._documents
+
+    def add(self, expense: Expense) -> None:
+        'Index an expense, replacing its previous entry.'
+        self.__index(expense.id, expense.account.id, tokenize(f'{expense.title} {expense.cc_name}'))
+
+    def add_many(self, expenses: Iterable[Expense]) -> None:
+        'Index several expenses.'
+        for expense in expenses:
+            self.add(expense)
+
+    def remove(self, expense_id: UUID) -> None:
+        'Drop an expense from the index.'
+        document = self._documents.pop(expense_id, None)
+        if document is None:
+            return
+        for token in document[1]:
+            expense_ids = self._postings[token]
+            expense_ids.discard(expense_id)
+            if not expense_ids:
+                self.__drop_token(token)
+
+    def clear(self) -> None:
+        'Drop every expense.'
+        self._documents.clear()
+        self._postings.clear()
+        self._vocabulary.clear()
+        self._trigrams.clear()
+
+    def search(
+        self,
+        query: str,
+        account_ids: Optional[Iterable[UUID]] = None,
+        limit: Optional[int] = 20,
+        prefix: bool = True,
+        fuzzy: bool = True,
+    ) -> List[UUID]:
+        '''
+        Search the expenses that match every token of the query.
+
+        A query token matches an indexed token exactly, as a prefix (e.g. while typing) or, when
+        nothing else matches, by trigram similarity (e.g. a typo). Rarer tokens weigh more.
+
+        :param query: The search text.
+        :param account_ids: Only return the expenses of these accounts.
+        :param limit: The maximum number of results, or None for all.
+        :param prefix: Whether query tokens match as prefixes.
+        :param fuzzy: Whether query tokens match similar tokens.
+        :return: The IDs of the matching expenses, best first.
+        '''
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        accounts = set(account_ids) if account_ids is not None else None
+        scores: Optional[Dict[UUID, float]] = None
+        for query_token in query_tokens:
+            token_scores: Dict[UUID, float] = {}
+            for token, score in self.__match(query_token, prefix, fuzzy):
+                expense_ids = self._postings[token]
+                weighted = score * math.log(1 + len(self._documents) / len(expense_ids))
+                for expense_id in expense_ids:
+                    if weighted > token_scores.get(expense_id, 0.0):
+                        token_scores[expense_id] = weighted
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {expense_id: score + token_scores[expense_id] for expense_id, score in scores.items() if expense_id in token_scores}
+            if not scores:
+                return []
+        if accounts is not None:
+            scores = {expense_id: score for expense_id, score in scores.items() if self._documents[expense_id][0] in accounts}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [expense_id for expense_id, _ in ranked[:limit]]
+
+    def search_prefix(self, prefix: str, account_ids: Optional[Iterable[UUID]] = None, limit: Optional[int] = 20) -> List[UUID]:
+        'Search the expenses with a token starting with the prefix, for autocompletion.'
+        return self.search(prefix, account_ids, limit, prefix=True, fuzzy=False)
+
+    def subscribe(self) -> None:
+        'Reindex the expenses when they are renamed.'
+        self._dispatcher.subscribe(ExpenseRenamed, self._on_expense_renamed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the expense events.'
+        self._dispatcher.unsubscribe(ExpenseRenamed, self._on_expense_renamed)
+
+    def save(self, path: str) -> None:
+        'Write the index to a JSON file, replacing it atomically.'
+        data = {
+            'version': 1,
+            'documents': [
+                [expense_id.hex, account_id.hex, tokens]
+                for expense_id, (account_id, tokens) in self._documents.items()
+            ],
+        }
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+
+    def load(self, path: str) -> None:
+        'Replace the index with the one saved in a JSON file.'
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        self.clear()
+        for expense_id, account_id, tokens in data['documents']:
+            self.__index(UUID(expense_id), UUID(account_id), tokens)
+
+    def _on_expense_renamed(self, event: ExpenseRenamed) -> None:
+        if event.expense.id in self._documents:
+            self.add(event.expense)
+
+    def __match(self, query_token: str, prefix: bool, fuzzy: bool) -> List[Tuple[str, float]]:
+        'Get the indexed tokens matching a query token, with their match score.'
+        matches: Dict[str, float] = {}
+        if query_token in self._postings:
+            matches[query_token] = self.EXACT_SCORE
+        if prefix:
+            position = bisect_left(self._vocabulary, query_token)
+            while position < len(self._vocabulary) and self._vocabulary[position].startswith(query_token):
+                matches.setdefault(self._vocabulary[position], self.PREFIX_SCORE)
+                position += 1
+        if fuzzy and not matches:
+            query_trigrams = trigrams(query_token)
+            shared: Dict[str, int] = {}
+            for trigram in query_trigrams:
+                for token in self._trigrams.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            for token, count in shared.items():
+                similarity = count / (len(query_trigrams) + len(trigrams(token)) - count)  # Jaccard similarity
+                if similarity >= self._min_similarity:
+                    matches[token] = self.FUZZY_SCORE * similarity
+        return list(matches.items())
+
+    def __index(self, expense_id: UUID, account_id: UUID, tokens: List[str]) -> None:
+        self.remove(expense_id)
+        self._documents[expense_id] = (account_id, tokens)
+        for token in tokens:
+            expense_ids = self._postings.get(token)
+            if expense_ids is None:
+                expense_ids = self._postings[token] = set()
+                insort(self._vocabulary, token)
+                for trigram in trigrams(token):
+                    self._trigrams.setdefault(trigram, set()).add(token)
+            expense_ids.add(expense_id)
+
+    def __drop_token(self, token: str) -> None:
+        del self._postings[token]
+        del self._vocabulary[bisect_left(self._vocabulary, token)]
+        for trigram in trigrams(token):
+            tokens = self._trigrams[trigram]
+            tokens.discard(token)
+            if not tokens:
+                del self._trigrams[trigram]
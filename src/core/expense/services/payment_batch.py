@@ -0,0 +1,150 @@
+from uuid import UUID
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ...shared.currency_rates import group_by_currency
+from ...shared.exceptions import CurrencyMismatchException
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.value_objects import Amount, Currency
+from ...period.models import Period
+from ..enums import PaymentStatus
+from ..models import Expense, Payment
+
+
+class StatementEntry:
+    'A single line of a closed card statement: the payment it settles and its final amount and status.'
+
+    def __init__(self, payment_id: UUID, amount: Amount, status: PaymentStatus = PaymentStatus.CONFIRMED):
+        self.payment_id = payment_id
+        self.amount = amount
+        self.status = status
+
+
+class PaymentBatchSummary:
+    'Summary of the changes applied by a payment batch.'
+
+    def __init__(
+        self,
+        updated_payments: int,
+        updated_expense_ids: List[UUID],
+        missing_payment_ids: List[UUID],
+        period_totals: Dict[UUID, Dict[Currency, Amount]],
+    ):
+        self.updated_payments = updated_payments  # Number of payments changed
+        self.updated_expense_ids = updated_expense_ids  # Expenses recomputed, once each
+        self.missing_payment_ids = missing_payment_ids  # Entries whose payment is unknown
+        self.period_totals = period_totals  # New total of every affected period, per currency, for the caller to store or show
+
+    @property
+    def has_missing_payments(self) -> bool:
+        'Check if some entries did not match any known payment.'
+        return bool(self.missing_payment_ids)
+
+
+class PaymentBatchProcessor:
+    '''
+    Applies a closed statement to many expenses at once.
+
+    Entries are grouped by their parent expense so every expense applies its whole group with a
+    single `update_payments` call (one redistribution or re-sort per expense).
+
+    Periods keep no stored totals, they add up their payments when read, so the batch does not
+    update them: it reports the new totals of the affected periods in the summary. Those are read
+    once before anything changes and then adjusted by the payments that changed, instead of being
+    recomputed after each payment.
+    '''
+
+    def __init__(self, expenses: Iterable[Expense], periods: Iterable[Period] = ()):
+        self._periods_by_payment: Dict[UUID, Period] = {}
+        for period in periods:
+            for payment in period.payments:
+                self._periods_by_payment[payment.id] = period
+        self._payments: Dict[UUID, Payment] = {}
+        # The payments of each expense that belong to a known period, to adjust its total
+        self._placements: Dict[UUID, List[Tuple[Payment, Period]]] = {}
+        for expense in expenses:
+            placements = []
+            for payment in expense.payments:
+                self._payments[payment.id] = payment
+                period = self._periods_by_payment.get(payment.id)
+                if period is not None:
+                    placements.append((payment, period))
+            if placements:
+                self._placements[expense.id] = placements
+
+    def get_payment(self, payment_id: UUID) -> Optional[Payment]:
+        'Get a known payment by its ID.'
+        return self._payments.get(payment_id)
+
+    def apply(self, entries: Iterable[StatementEntry]) -> PaymentBatchSummary:
+        '''
+        Apply the statement entries, grouped by expense, and summarize what changed.
+
+        Every entry is checked before anything is changed, so an entry in a currency other than the
+        one of its expense rejects the whole batch.
+
+        :param entries: The statement entries.
+        :return: The summary, with the new totals of the affected periods per currency.
+        '''
+        groups: Dict[UUID, Tuple[Expense, List[Payment]]] = {}
+        missing_payment_ids: List[UUID] = []
+        for entry in entries:
+            payment = self._payments.get(entry.payment_id)
+            if payment is None:
+                missing_payment_ids.append(entry.payment_id)
+                continue
+            expense = payment.expense
+            if entry.amount.currency != expense.amount.currency:
+                raise CurrencyMismatchException(
+                    f'Statement entry in {entry.amount.currency.value} for payment {payment.id} '
+                    f'of a {expense.amount.currency.value} expense.'
+                )
+            _, updates = groups.setdefault(expense.id, (expense, []))
+            updates.append(Payment(
+                expense=expense,
+                amount=entry.amount,
+                no_installment=payment.no_installment,
+                status=entry.status,
+                payment_date=payment.payment_date,
+                id=payment.id
+            ))
+
+        # Periods are keyed by identity, cheaper to hash than their IDs
+        baseline: Dict[Period, Dict[Currency, Amount]] = {}
+        previous_amounts: Dict[UUID, List[Amount]] = {}
+        for expense_id in groups:
+            placements = self._placements.get(expense_id, ())
+            for _, period in placements:
+                if period not in baseline:
+                    baseline[period] = period.totals_by_currency()
+            previous_amounts[expense_id] = [payment.amount for payment, _ in placements]
+
+        updated_payments = 0
+        for expense, updates in groups.values():
+            expense.update_payments(updates)
+            updated_payments += len(updates)
+
+        # Cents added to each period by the changed payments, per currency and precision
+        deltas: Dict[Period, Dict[Tuple[Currency, int], int]] = {period: {} for period in baseline}
+        for expense_id, previous in previous_amounts.items():
+            for (payment, period), amount in zip(self._placements.get(expense_id, ()), previous):
+                current = payment.amount
+                if current is amount:
+                    continue
+                period_deltas = deltas[period]
+                key = (current.currency, current.precision)
+                period_deltas[key] = period_deltas.get(key, 0) + to_cents(current)
+                key = (amount.currency, amount.precision)
+                period_deltas[key] = period_deltas.get(key, 0) - to_cents(amount)
+
+        return PaymentBatchSummary(
+            updated_payments=updated_payments,
+            updated_expense_ids=list(groups),
+            missing_payment_ids=missing_payment_ids,
+            period_totals={
+                period.id: group_by_currency([
+                    *baseline[period].values(),
+                    *(from_cents(cents, precision, currency) for (currency, precision), cents in period_deltas.items()),
+                ])
+                for period, period_deltas in deltas.items()
+            },
+        )
@@ -0,0 +1,302 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from datetime import date
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from ...shared.events import EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.interning import DEFAULT_MAX_STRINGS, StringInterner
+from ...shared.value_objects import Currency
+from ...account.models.account import Account
+from ..enums import ExpenseStatus, ExpenseType, PaymentStatus
+from ..events import PaymentAdded, PaymentEvent, PaymentRemoved, PaymentUpdated
+from ..models import Expense, Payment, Purchase, Subscription
+
+
+class LedgerRecordKind(IntEnum):
+    EXPENSE_SNAPSHOT = 1
+    PAYMENT_ADDED = 2
+    PAYMENT_UPDATED = 3
+    PAYMENT_REMOVED = 4
+
+
+def _date_to_str(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def _str_to_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value is not None else None
+
+
+def payment_to_state(payment: Payment) -> dict:
+    'Serialize the state of a payment to a plain dictionary.'
+    return {
+        'id': payment.id.hex,
+        'amount': to_cents(payment.amount),
+        'no_installment': payment.no_installment,
+        'status': payment.status.value,
+        'payment_date': _date_to_str(payment.payment_date),
+    }
+
+
+def expense_to_state(expense: Expense) -> dict:
+    'Serialize the state of an expense and its payments to a plain dictionary.'
+    category = expense.category_id
+    category_id = getattr(category, 'id', category)
+    return {
+        'id': expense.id.hex,
+        'expense_type': expense.expense_type.value,
+        'title': expense.title,
+        'cc_name': expense.cc_name,
+        'acquired_at': _date_to_str(expense.acquired_at),
+        'amount': to_cents(expense.amount),
+        'currency': expense.amount.currency.value,
+        'installments': expense.installments,
+        'first_payment_date': _date_to_str(expense.first_payment_date),
+        'status': expense.status.value,
+        'category_id': category_id.hex if isinstance(category_id, UUID) else None,
+        'payments': [payment_to_state(payment) for payment in expense.payments],
+    }
+
+
+def expense_from_state(
+    state: dict, account: Account, category: object = None, interner: Optional[StringInterner] = None
+) -> Expense:
+    '''
+    Hydrate an expense and its payments from a state dictionary, without publishing events.
+
+    :param state: The state, as returned by `expense_to_state`.
+    :param account: The account the expense belongs to.
+    :param category: The category of the expense, if any.
+    :param interner: Keeps one copy of the repeated titles and credit card names, if given.
+    :return: The hydrated Purchase or Subscription.
+    '''
+    currency = Currency(state.get('currency', Currency.ARS.value))  # Older states have no currency
+    payments = [
+        Payment(
+            expense=None,
+            amount=from_cents(payment['amount'], currency=currency),
+            no_installment=payment['no_installment'],
+            status=PaymentStatus(payment['status']),
+            payment_date=_str_to_date(payment['payment_date']),
+            id=UUID(payment['id']),
+        )
+        for payment in state['payments']
+    ]
+    return hydrate_expense(
+        ExpenseType(state['expense_type']),
+        ExpenseStatus(state['status']),
+        payments,
+        account=account,
+        title=interner.intern(state['title']) if interner is not None else state['title'],
+        cc_name=interner.intern(state['cc_name']) if interner is not None else state['cc_name'],
+        acquired_at=_str_to_date(state['acquired_at']),
+        amount=from_cents(state['amount'], currency=currency),
+        installments=state['installments'],
+        first_payment_date=_str_to_date(state['first_payment_date']),
+        category=category,
+        id=UUID(state['id']),
+    )
+
+
+def hydrate_expense(
+    expense_type: ExpenseType,
+    status: ExpenseStatus,
+    payments: List[Payment],
+    installments: int = 1,
+    **fields,
+) -> Expense:
+    '''
+    Build an expense around already built payments, without publishing events or recalculating them.
+
+    :param expense_type: The type of the expense.
+    :param status: The stored status of the expense.
+    :param payments: The payments of the expense, with no expense set yet.
+    :param installments: The installments of a purchase.
+    :param fields: The other constructor arguments of the expense (account, title, amount...).
+    :return: The hydrated Purchase or Subscription.
+    '''
+    with default_dispatcher.muted():
+        # An expense without payments calculates them on creation into the list it gets, so give it
+        # a copy and restore the stored list afterwards
+        if expense_type == ExpenseType.PURCHASE:
+            expense: Expense = Purchase(installments=installments, payments=list(payments), **fields)
+        else:
+            expense = Subscription(payments=list(payments), **fields)
+        expense.payments = payments
+    for payment in payments:
+        payment.expense = expense
+    expense.status = status
+    return expense
+
+
+class PaymentLedger:
+    '''
+    Append-only log of the payment changes of the expenses, stored in a compact local file.
+
+    Every record is a fixed header (payload length, record kind and expense ID) followed by a
+    compact JSON payload. The payment events are appended as they are published, and a snapshot
+    of the whole expense is appended every `snapshot_every` records of that expense, so a rebuild
+    only replays the records written after the latest snapshot. The file is read through a
+    read-only memory map and only the headers are scanned when it is opened.
+
+    The expense fields that change without a payment event (title, purchase amount) are restored
+    from the latest snapshot, so call `record_snapshot` after changing them. Appends and reads share a
+    lock, so events published from several threads never interleave their records and a read never
+    sees the memory map being replaced or closed.
+    '''
+
+    HEADER = struct.Struct('<IB16s')
+
+    def __init__(self, path: str, snapshot_every: int = 50, dispatcher: EventDispatcher = default_dispatcher):
+        if snapshot_every <= 0:
+            raise ValueError('snapshot_every must be greater than zero')
+        self._path = path
+        self._snapshot_every = snapshot_every
+        self._dispatcher = dispatcher
+        self._file = open(path, 'ab')
+        self._map: Optional[mmap.mmap] = None
+        self._offsets: Dict[UUID, List[int]] = {}  # Record offsets of each expense
+        self._snapshots: Dict[UUID, int] = {}  # Position, in the offsets of the expense, of its latest snapshot
+        self._lock = threading.RLock()
+        self._interner = StringInterner(DEFAULT_MAX_STRINGS)  # Shares the strings of the rebuilt expenses
+        self.__scan()
+
+    def __enter__(self) -> 'PaymentLedger':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        'Unsubscribe and close the underlying file.'
+        self.unsubscribe()
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+    def subscribe(self) -> None:
+        'Append the payment events to the log as they are published.'
+        self._dispatcher.subscribe(PaymentEvent, self._on_payment_event)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentEvent, self._on_payment_event)
+
+    def record_snapshot(self, expense: Expense) -> None:
+        'Append a snapshot of the whole expense.'
+        with self._lock:
+            self.__append(LedgerRecordKind.EXPENSE_SNAPSHOT, expense.id, expense_to_state(expense))
+
+    def history(self, expense_id: UUID) -> Iterator[Tuple[LedgerRecordKind, dict]]:
+        'Iterate over every record of an expense, oldest first, for auditing.'
+        with self._lock:
+            offsets = list(self._offsets.get(expense_id, []))
+        for offset in offsets:
+            yield self.__read(offset)
+
+    def rebuild(self, expense_id: UUID, account: Account, category: object = None) -> Optional[Expense]:
+        'Rebuild an expense from its latest snapshot and the records written after it.'
+        # Records are never rewritten, so a copy of the offsets is enough to rebuild consistently
+        with self._lock:
+            offsets = list(self._offsets.get(expense_id, []))
+            snapshot_position = self._snapshots.get(expense_id)
+        if not offsets or snapshot_position is None:
+            return None
+        _, state = self.__read(offsets[snapshot_position])
+        payments = {payment['id']: payment for payment in state['payments']}
+        for offset in offsets[snapshot_position + 1:]:
+            kind, payload = self.__read(offset)
+            if kind == LedgerRecordKind.PAYMENT_REMOVED:
+                payments.pop(payload['id'], None)
+            else:
+                payments[payload['id']] = payload
+        ordered = sorted(payments.values(), key=lambda payment: (payment['payment_date'] or '', payment['no_installment']))
+        if state['expense_type'] == ExpenseType.SUBSCRIPTION.value:
+            # Subscriptions renumber their payments by date and follow the amount of the last one
+            for no_installment, payment in enumerate(ordered, start=1):
+                payment['no_installment'] = no_installment
+            if ordered:
+                state['amount'] = ordered[-1]['amount']
+        state['payments'] = ordered
+        expense = expense_from_state(state, account, category, self._interner)
+        if isinstance(expense, Purchase):
+            expense.update_status()
+        return expense
+
+    def _on_payment_event(self, event: PaymentEvent) -> None:
+        payment = event.payment
+        expense = payment.expense
+        if isinstance(event, PaymentAdded):
+            kind = LedgerRecordKind.PAYMENT_ADDED
+        elif isinstance(event, PaymentRemoved):
+            kind = LedgerRecordKind.PAYMENT_REMOVED
+        elif isinstance(event, PaymentUpdated):
+            kind = LedgerRecordKind.PAYMENT_UPDATED
+        else:
+            return
+        with self._lock:
+            if expense.id not in self._snapshots:
+                # The first record of an expense is always a snapshot, so it can be rebuilt on its own.
+                # The event follows it so the history still shows the change; replaying it is a no-op.
+                self.record_snapshot(expense)
+            self.__append(kind, expense.id, payment_to_state(payment))
+            if len(self._offsets[expense.id]) - self._snapshots[expense.id] > self._snapshot_every:
+                self.record_snapshot(expense)
+
+    def __append(self, kind: LedgerRecordKind, expense_id: UUID, payload: dict) -> None:
+        'Append a record and index it.'
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        offset = self._file.tell()
+        self._file.write(self.HEADER.pack(len(data), kind, expense_id.bytes))
+        self._file.write(data)
+        self._file.flush()
+        self.__index(offset, kind, expense_id)
+
+    def __index(self, offset: int, kind: int, expense_id: UUID) -> None:
+        offsets = self._offsets.setdefault(expense_id, [])
+        if kind == LedgerRecordKind.EXPENSE_SNAPSHOT:
+            self._snapshots[expense_id] = len(offsets)
+        offsets.append(offset)
+
+    def __read(self, offset: int) -> Tuple[LedgerRecordKind, dict]:
+        'Read the record at an offset through the memory map.'
+        with self._lock:
+            data_map = self.__mapped(offset + self.HEADER.size)
+            length, kind, _ = self.HEADER.unpack_from(data_map, offset)
+            start = offset + self.HEADER.size
+            payload = data_map[start:start + length]
+        return LedgerRecordKind(kind), json.loads(payload)
+
+    def __mapped(self, min_size: int) -> mmap.mmap:
+        'Get a memory map of the file that covers at least the given size. Call it holding the lock.'
+        if self._map is None or len(self._map) < min_size:
+            if self._map is not None:
+                self._map.close()
+            with open(self._path, 'rb') as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __scan(self) -> None:
+        'Index the records of an existing file by reading their headers only.'
+        size = os.path.getsize(self._path)
+        offset = 0
+        while offset + self.HEADER.size <= size:
+            length, kind, expense_id = self.HEADER.unpack_from(self.__mapped(size), offset)
+            if offset + self.HEADER.size + length > size:
+                break
+            self.__index(offset, kind, UUID(bytes=expense_id))
+            offset += self.HEADER.size + length
+        if offset < size:
+            # Drop the truncated record of an interrupted write, so new records stay readable
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.truncate(offset)
@@ -0,0 +1,224 @@
+import csv
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from ...shared.helpers.amounts import from_cents, split_amount, to_cents
+from ...shared.helpers.dates import add_months_to_date
+from ...shared.helpers.interning import DEFAULT_MAX_STRINGS, StringInterner
+from ...shared.value_objects import Amount
+from ...account.models.account import Account
+from ..enums import PaymentStatus
+from ..helpers.statements import INSTALLMENT_PATTERN, normalize_description, parse_installment
+from ..interfaces.purchase_repository_interface import PurchaseRepositoryInterface
+from ..models import Expense, Payment, Purchase
+from .statement_reconciliation import StatementLine
+
+# (normalized name, first payment date, installment cents, installments)
+PurchaseKey = Tuple[str, Optional[date], int, int]
+
+
+def parse_statement_amount(value: str) -> Amount:
+    '''
+    Parse an amount as exported by banks, accepting both "1,234.56" and "1.234,56" notations.
+
+    :param value: The raw amount text.
+    :return: The parsed amount.
+    '''
+    value = value.strip().replace(' ', '').replace('$', '')
+    if ',' in value and ('.' not in value or value.rfind(',') > value.rfind('.')):
+        value = value.replace('.', '').replace(',', '.')
+    else:
+        value = value.replace(',', '')
+    return Amount(float(value))
+
+
+def read_csv_lines(
+    stream: TextIO,
+    date_format: str = '%Y-%m-%d',
+    delimiter: str = ',',
+    date_column: str = 'date',
+    description_column: str = 'description',
+    amount_column: str = 'amount',
+) -> Iterator[StatementLine]:
+    '''
+    Lazily read the lines of a CSV statement with a header row.
+
+    :param stream: The open CSV text stream.
+    :param date_format: The `strptime` format of the date column.
+    :param delimiter: The CSV delimiter.
+    :return: An iterator over the statement lines, one row at a time.
+    '''
+    for row in csv.DictReader(stream, delimiter=delimiter):
+        yield StatementLine(
+            line_date=datetime.strptime(row[date_column].strip(), date_format).date(),
+            description=row[description_column].strip(),
+            amount=parse_statement_amount(row[amount_column]),
+        )
+
+
+def read_ofx_lines(stream: TextIO) -> Iterator[StatementLine]:
+    '''
+    Lazily read the transactions of an OFX statement.
+
+    Only the `STMTTRN` blocks with their `DTPOSTED`, `TRNAMT` and `NAME`/`MEMO` fields are read.
+    Debits are negative in OFX, so the amounts are negated to get the charged amount.
+
+    :param stream: The open OFX text stream.
+    :return: An iterator over the statement lines, one transaction at a time.
+    '''
+    transaction: Optional[dict] = None
+    for raw_line in stream:
+        line = raw_line.strip()
+        if not line.startswith('<'):
+            continue
+        tag, _, value = line[1:].partition('>')
+        tag = tag.upper()
+        if tag == 'STMTTRN':
+            transaction = {}
+        elif tag == '/STMTTRN' and transaction is not None:
+            if 'DTPOSTED' in transaction and 'TRNAMT' in transaction:
+                yield StatementLine(
+                    line_date=datetime.strptime(transaction['DTPOSTED'][:8], '%Y%m%d').date(),
+                    description=transaction.get('NAME') or transaction.get('MEMO', ''),
+                    amount=Amount(-parse_statement_amount(transaction['TRNAMT']).value),
+                )
+            transaction = None
+        elif transaction is not None and tag in {'DTPOSTED', 'TRNAMT', 'NAME', 'MEMO'}:
+            transaction[tag] = value.split('<', 1)[0].strip()
+
+
+class ImportReport:
+    'Counters and throughput of a statement import.'
+
+    def __init__(self):
+        self.rows_read = 0
+        self.purchases_created = 0
+        self.duplicates = 0
+        self.skipped = 0  # Credits, refunds and zero amount rows
+        self.batches_flushed = 0
+        self.elapsed_seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        'Get the import throughput.'
+        return self.rows_read / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+class StatementImporter:
+    '''
+    Streams statement lines into purchases, saving them in batches.
+
+    Lines are consumed one at a time and only the current batch is kept in memory. Duplicates,
+    either of existing expenses or of another installment of a purchase already imported, are
+    detected by the fields that identify a purchase. A statement only shows the amount of one
+    installment, which is the total split in cents with the remainder on the first installments,
+    so purchases are matched by installment amount: an existing expense is known by each of its
+    installment amounts, and the installments of a purchase imported from the statement may show
+    one cent more or less than the line it was imported from.
+
+    The keys of the existing expenses are all kept, while those of the imported lines are kept in
+    a window of the last `dedup_window` purchases, so the memory of an import does not grow with
+    the size of the file.
+    '''
+
+    def __init__(
+        self,
+        account: Account,
+        repository: PurchaseRepositoryInterface,
+        batch_size: int = 500,
+        existing_expenses: Iterable[Expense] = (),
+        interner: Optional[StringInterner] = None,
+        dedup_window: int = 100_000,
+    ):
+        if batch_size <= 0:
+            raise ValueError('batch_size must be greater than zero')
+        if dedup_window <= 0:
+            raise ValueError('dedup_window must be greater than zero')
+        self._account = account
+        self._repository = repository
+        self._batch_size = batch_size
+        # Recurring charges repeat the same names every statement
+        self._interner = interner if interner is not None else StringInterner(DEFAULT_MAX_STRINGS)
+        self._dedup_window = dedup_window
+        self._existing: Set[PurchaseKey] = set()
+        for expense in existing_expenses:
+            first_payment_date = expense.first_payment_date or expense.acquired_at
+            for installment_amount in set(split_amount(expense.amount, expense.installments)):
+                self._existing.add(self.__purchase_key(expense.cc_name, first_payment_date, to_cents(installment_amount), expense.installments))
+        self._imported: 'OrderedDict[PurchaseKey, None]' = OrderedDict()
+
+    def import_lines(self, lines: Iterable[StatementLine]) -> ImportReport:
+        'Import the statement lines and report what was done.'
+        report = ImportReport()
+        batch: List[Purchase] = []
+        started_at = time.perf_counter()
+        for line in lines:
+            report.rows_read += 1
+            if line.amount.value <= 0:
+                report.skipped += 1
+                continue
+            no_installment, installments = parse_installment(line.description) or (1, 1)
+            first_payment_date = add_months_to_date(line.line_date, 1 - no_installment)
+            installment_cents = to_cents(line.amount)
+            cc_name = self._interner.intern(INSTALLMENT_PATTERN.sub(' ', line.description).strip())
+            key = self.__purchase_key(cc_name, first_payment_date, installment_cents, installments)
+            if key in self._existing or self.__imported(key):
+                report.duplicates += 1
+                continue
+            self._imported[key] = None
+            if len(self._imported) > self._dedup_window:
+                self._imported.popitem(last=False)
+            batch.append(self.__build_purchase(cc_name, first_payment_date, line.amount, installments, no_installment))
+            if len(batch) >= self._batch_size:
+                self.__flush(batch, report)
+        self.__flush(batch, report)
+        report.elapsed_seconds = time.perf_counter() - started_at
+        return report
+
+    def __build_purchase(
+        self, cc_name: str, first_payment_date: date, installment_amount: Amount, installments: int, no_installment: int
+    ) -> Purchase:
+        'Build the purchase of a line, settling the installments already charged.'
+        # The remainder of the original total is not on the statement, so every installment gets
+        # the charged amount, which keeps the charged installment exact
+        purchase = Purchase(
+            account=self._account,
+            title=cc_name,
+            cc_name=cc_name,
+            acquired_at=first_payment_date,
+            amount=from_cents(to_cents(installment_amount) * installments, installment_amount.precision, installment_amount.currency),
+            installments=installments,
+            first_payment_date=first_payment_date,
+        )
+        if no_installment > 1:
+            purchase.update_payments([
+                Payment(purchase, payment.amount, payment.no_installment, PaymentStatus.PAID, payment.payment_date, payment.id)
+                for payment in purchase.payments[:no_installment - 1]
+            ])
+        return purchase
+
+    def __imported(self, key: PurchaseKey) -> bool:
+        'Check if a line belongs to a purchase imported from a previous line.'
+        name, first_payment_date, installment_cents, installments = key
+        if installments == 1:
+            return key in self._imported
+        return any(
+            (name, first_payment_date, cents, installments) in self._imported
+            for cents in (installment_cents - 1, installment_cents, installment_cents + 1)
+        )
+
+    def __flush(self, batch: List[Purchase], report: ImportReport) -> None:
+        'Save the pending batch and clear it.'
+        if not batch:
+            return
+        self._repository.save_many(batch)
+        report.purchases_created += len(batch)
+        report.batches_flushed += 1
+        batch.clear()
+
+    @staticmethod
+    def __purchase_key(cc_name: str, first_payment_date: Optional[date], installment_cents: int, installments: int) -> PurchaseKey:
+        'Get the fields that identify a purchase across statements.'
+        return normalize_description(cc_name), first_payment_date, installment_cents, installments
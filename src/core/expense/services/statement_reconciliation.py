@@ -0,0 +1,156 @@
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ...shared.helpers.amounts import to_cents
+from ...shared.value_objects import Amount, Currency
+from ...period.models import Period
+from ..enums import PaymentStatus
+from ..helpers.statements import normalize_description
+from ..models import Payment
+from .payment_batch import StatementEntry
+
+
+class StatementLine:
+    'A flat line of an exported bank statement.'
+
+    def __init__(self, line_date: date, description: str, amount: Amount):
+        self.line_date = line_date
+        self.description = description
+        self.amount = amount
+
+
+class ReconciliationMatch:
+    'A statement line paired with the expected payment it settles.'
+
+    def __init__(self, line: StatementLine, payment: Payment):
+        self.line = line
+        self.payment = payment
+
+    @property
+    def amount_difference(self) -> Amount:
+        'Get the difference between the charged amount and the expected amount.'
+        return Amount(self.line.amount.value - self.payment.amount.value, currency=self.payment.amount.currency)
+
+    def to_payment(self, status: PaymentStatus = PaymentStatus.CONFIRMED) -> Payment:
+        'Build the payment update to pass to `Expense.update_payment(s)`.'
+        return Payment(
+            expense=self.payment.expense,
+            amount=self.line.amount,
+            no_installment=self.payment.no_installment,
+            status=status,
+            payment_date=self.payment.payment_date,
+            id=self.payment.id
+        )
+
+    def to_statement_entry(self, status: PaymentStatus = PaymentStatus.CONFIRMED) -> StatementEntry:
+        'Build the entry to pass to a `PaymentBatchProcessor`.'
+        return StatementEntry(self.payment.id, self.line.amount, status)
+
+
+class ReconciliationResult:
+    'Outcome of reconciling statement lines against the expected payments of a period.'
+
+    def __init__(
+        self,
+        matched: List[ReconciliationMatch],
+        amount_mismatches: List[ReconciliationMatch],
+        unmatched: List[StatementLine],
+    ):
+        self.matched = matched  # Same amount, within the date window
+        self.amount_mismatches = amount_mismatches  # Same expense name, within the date window, different amount
+        self.unmatched = unmatched  # Lines without any expected payment
+
+    def to_payments(self, status: PaymentStatus = PaymentStatus.CONFIRMED) -> List[Payment]:
+        'Build the payment updates of every matched and mismatched line.'
+        return [match.to_payment(status) for match in self.matched + self.amount_mismatches]
+
+    def to_statement_entries(self, status: PaymentStatus = PaymentStatus.CONFIRMED) -> List[StatementEntry]:
+        'Build the batch entries of every matched and mismatched line.'
+        return [match.to_statement_entry(status) for match in self.matched + self.amount_mismatches]
+
+
+class StatementReconciler:
+    '''
+    Matches imported statement lines against the expected payments of a period.
+
+    Expected payments are indexed once in sorted lists of (payment date, position): by amount
+    (currency and cents), by amount and normalized expense name (`cc_name` and `title`), and by
+    name alone. Each line is resolved with a couple of binary searches around its date, and the
+    payment it takes is removed from a copy of the lists, so reconciling n lines against m
+    payments costs O((n + m) log m) however many payments share an amount or a name.
+    '''
+
+    def __init__(self, period: Period, date_window_days: int = 3):
+        if date_window_days < 0:
+            raise ValueError('date_window_days cannot be negative')
+        self._window = date_window_days
+        self._payments: List[Payment] = [
+            payment for payment in period.payments
+            if payment.payment_date is not None and not payment.is_final_status()
+        ]
+        self._names: List[Set[str]] = [
+            {normalize_description(payment.expense.cc_name), normalize_description(payment.expense.title)} - {''}
+            for payment in self._payments
+        ]
+        self._keys: Dict[tuple, List[Tuple[int, int]]] = {}
+        for position, payment in enumerate(self._payments):
+            for key in self.__keys(position):
+                self._keys.setdefault(key, []).append((payment.payment_date.toordinal(), position))
+        for keys in self._keys.values():
+            keys.sort()
+
+    def reconcile(self, lines: Iterable[StatementLine]) -> ReconciliationResult:
+        'Reconcile the lines, using every expected payment at most once.'
+        remaining = {key: list(keys) for key, keys in self._keys.items()}
+        matched: List[ReconciliationMatch] = []
+        amount_mismatches: List[ReconciliationMatch] = []
+        unmatched: List[StatementLine] = []
+        for line in sorted(lines, key=lambda line: line.line_date):
+            name = normalize_description(line.description)
+            amount = self.__amount_key(line.amount)
+            ordinal = line.line_date.toordinal()
+            # The closest payment with the same amount, preferring one with the same expense name
+            position = self.__take_closest(remaining, (*amount, name), ordinal)
+            if position is None:
+                position = self.__take_closest(remaining, amount, ordinal)
+            if position is not None:
+                matched.append(ReconciliationMatch(line, self._payments[position]))
+                continue
+            # Otherwise the closest payment of an expense with the same name, whatever its amount
+            position = self.__take_closest(remaining, (name,), ordinal)
+            if position is not None:
+                amount_mismatches.append(ReconciliationMatch(line, self._payments[position]))
+                continue
+            unmatched.append(line)
+        return ReconciliationResult(matched, amount_mismatches, unmatched)
+
+    def __keys(self, position: int) -> List[tuple]:
+        'Get the keys of the lists that index a payment.'
+        amount = self.__amount_key(self._payments[position].amount)
+        names = self._names[position]
+        return [amount, *((*amount, name) for name in names), *((name,) for name in names)]
+
+    def __take_closest(self, remaining: Dict[tuple, List[Tuple[int, int]]], key: tuple, ordinal: int) -> Optional[int]:
+        'Find the remaining payment of a list closest to a date, within the window, and remove it from every list.'
+        keys = remaining.get(key)
+        if not keys:
+            return None
+        index = bisect_left(keys, (ordinal, -1))
+        candidates = []
+        if index < len(keys):
+            candidates.append(keys[index])
+        if index > 0:
+            # The first payment of the latest earlier date, so ties go to the lowest position
+            candidates.append(keys[bisect_left(keys, (keys[index - 1][0], -1))])
+        payment_ordinal, position = min(candidates, key=lambda candidate: (abs(candidate[0] - ordinal), candidate[1]))
+        if abs(payment_ordinal - ordinal) > self._window:
+            return None
+        for payment_key in self.__keys(position):
+            payment_keys = remaining[payment_key]
+            del payment_keys[bisect_left(payment_keys, (payment_ordinal, position))]
+        return position
+
+    @staticmethod
+    def __amount_key(amount: Amount) -> Tuple[Currency, int]:
+        return amount.currency, to_cents(amount)
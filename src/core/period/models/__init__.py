@@ -1,5 +1,14 @@
-from .period import Period
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .period import Period
 
 __all__ = [
     'Period',
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'Period': '.period',
+})
@@ -1,9 +1,13 @@
 from uuid import UUID
-from typing import Optional
+from datetime import date
+from typing import Callable, Dict, Optional
 from typing import List
 
-from core.shared.value_objects import Month, Year, Amount
+from ...shared.value_objects import Month, Year, Amount, Currency
+from ...shared.currency_rates import CurrencyConverter, group_by_currency, single_currency_total
+from ...shared.helpers.dates import add_months_to_date
 from ...shared.entity_base import EntityBase
+from ...shared.instrumentation import instrumented
 from ...expense.models.payment import Payment
 
 
@@ -12,7 +16,7 @@ class Period(EntityBase):
             self,
             month: Month,
             year: Year,
-            payments: List[Payment] = [],
+            payments: Optional[List[Payment]] = None,
             id: Optional[UUID] = None,
     ):
         super().__init__(id)
@@ -57,22 +61,40 @@ class Period(EntityBase):
         self._payments = value
 
     @property
+    @instrumented('period.total_amount', items=lambda period: len(period.payments))
     def total_amount(self) -> Amount:
         'Calculate the total amount of all payments in the period.'
-        total = sum(payment.amount.value for payment in self._payments)
-        return Amount(total)
+        return single_currency_total(self.totals_by_currency())
 
     @property
+    @instrumented('period.total_one_time_payments', items=lambda period: len(period.payments))
     def total_one_time_payments(self) -> Amount:
         'Calculate the total amount of one-time payments in the period.'
-        total = sum(payment.amount.value for payment in self._payments if payment.is_one_time_payment())
-        return Amount(total)
+        return single_currency_total(self.totals_by_currency(lambda payment: payment.is_one_time_payment()))
 
     @property
+    @instrumented('period.total_last_payments', items=lambda period: len(period.payments))
     def total_last_payments(self) -> Amount:
         'Calculate the total amount of last payments in the period.'
-        total = sum(payment.amount.value for payment in self._payments if payment.is_last_payment())
-        return Amount(total)
+        return single_currency_total(self.totals_by_currency(lambda payment: payment.is_last_payment()))
+
+    def totals_by_currency(self, include: Optional[Callable[[Payment], bool]] = None) -> Dict[Currency, Amount]:
+        'Add up the payments of the period per currency, optionally only those matching a predicate.'
+        return group_by_currency(payment.amount for payment in self._payments if include is None or include(payment))
+
+    def total_in(self, converter: CurrencyConverter, currency: Currency, on: Optional[date] = None) -> Amount:
+        '''
+        Calculate the total amount of all payments in the period in one currency.
+
+        :param converter: The converter with the exchange rates.
+        :param currency: The currency of the total.
+        :param on: The date of the exchange rates. By default, the last day of the period.
+        :return: The converted total.
+        '''
+        if on is None:
+            first_day = date(self._year.value, self._month.value, 1)
+            on = date.fromordinal(add_months_to_date(first_day, 1).toordinal() - 1)
+        return converter.convert_totals(self.totals_by_currency(), currency, on)
 
     def add_payment(self, payment: Payment):
         'Add a payment to the period.'
@@ -0,0 +1,18 @@
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .spending_alerts import SpendingAlertEvaluator, SpendingLimitReached, evaluate_month
+
+__all__ = [
+    'SpendingAlertEvaluator',
+    'SpendingLimitReached',
+    'evaluate_month',
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'SpendingAlertEvaluator': '.spending_alerts',
+    'SpendingLimitReached': '.spending_alerts',
+    'evaluate_month': '.spending_alerts',
+})
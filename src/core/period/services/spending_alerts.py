@@ -0,0 +1,230 @@
+import threading
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from ...shared.currency_rates import CurrencyConverter, group_by_currency, single_currency_total
+from ...shared.events import DomainEvent, EventDispatcher, dispatcher as default_dispatcher
+from ...shared.helpers.amounts import from_cents, to_cents
+from ...shared.helpers.dates import add_months_to_date
+from ...shared.value_objects import Amount, Currency
+from ...expense.enums import NON_SPENDING_PAYMENT_STATUSES
+from ...expense.events import PaymentAdded, PaymentRemoved, PaymentUpdated
+from ...expense.models import Payment
+from ...user import User
+from ..models import Period
+
+DEFAULT_THRESHOLDS = (0.8, 1.0)
+
+
+class SpendingLimitReached(DomainEvent):
+    '''Published when the spending of a user in a month crosses a threshold of their monthly limit.'''
+
+    def __init__(self, user_id: UUID, year: int, month: int, threshold: float, spent: Amount, limit: Amount):
+        self.user_id = user_id
+        self.year = year
+        self.month = month
+        self.threshold = threshold
+        self.spent = spent
+        self.limit = limit
+
+
+class SpendingAlertEvaluator:
+    '''
+    Evaluates `AlertPreferences.monthly_spending_limit` from a running per-user, per-month spend.
+
+    The spend is kept up to date from the payment added, updated and removed events, so every
+    change costs O(thresholds) instead of summing the periods of the user. An alert is published
+    only when a change moves the spend across a threshold boundary.
+
+    The spend is kept per currency. With a converter, the spend in every currency counts towards
+    the limit, converted with the rates of the last day of the month. Without one, only the spend
+    in the currency of the limit does, and `spent` raises for a month with several currencies.
+
+    The payment events arrive from whichever thread changed the payment, so the spend is only read
+    and written holding the lock of the evaluator. The alerts are published once it is released.
+    '''
+
+    def __init__(
+        self,
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+        converter: Optional[CurrencyConverter] = None,
+        dispatcher: EventDispatcher = default_dispatcher,
+    ):
+        if not thresholds or any(threshold <= 0 for threshold in thresholds):
+            raise ValueError('thresholds must be positive ratios of the limit')
+        self._thresholds = tuple(sorted(thresholds))
+        self._converter = converter
+        self._dispatcher = dispatcher
+        self._lock = threading.RLock()
+        self._limits: Dict[UUID, Amount] = {}
+        self._spent: Dict[Tuple[UUID, int, int], Dict[Currency, int]] = {}
+
+    def set_limit(self, user_id: UUID, limit: Amount) -> None:
+        'Set the monthly spending limit of a user. A zero limit disables the alerts.'
+        with self._lock:
+            self._limits[user_id] = limit
+
+    def set_limit_from_user(self, user: User) -> None:
+        'Set the monthly spending limit of a user from their alert preferences.'
+        self.set_limit(user.id, _monthly_spending_limit(user))
+
+    def spent_by_currency(self, user_id: UUID, year: int, month: int) -> Dict[Currency, Amount]:
+        'Get the running spend of a user in a month, per currency.'
+        with self._lock:
+            spent = dict(self._spent.get((user_id, year, month), {}))
+        return {currency: from_cents(cents, currency=currency) for currency, cents in spent.items() if cents}
+
+    def spent(self, user_id: UUID, year: int, month: int) -> Amount:
+        'Get the running spend of a user in a month, when it is in a single currency.'
+        return single_currency_total(self.spent_by_currency(user_id, year, month))
+
+    def track(self, payments: Iterable[Payment]) -> None:
+        'Add existing payments to the running spend without publishing alerts.'
+        with self._lock:
+            for payment in payments:
+                key = self.__key(payment.expense.account.owner.id, payment.payment_date)
+                if key is not None and payment.is_spending():
+                    spent = self._spent.setdefault(key, {})
+                    spent[payment.amount.currency] = spent.get(payment.amount.currency, 0) + to_cents(payment.amount)
+
+    def subscribe(self) -> None:
+        'Start listening to the payment events.'
+        self._dispatcher.subscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.subscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.subscribe(PaymentRemoved, self._on_payment_removed)
+
+    def unsubscribe(self) -> None:
+        'Stop listening to the payment events.'
+        self._dispatcher.unsubscribe(PaymentAdded, self._on_payment_added)
+        self._dispatcher.unsubscribe(PaymentUpdated, self._on_payment_updated)
+        self._dispatcher.unsubscribe(PaymentRemoved, self._on_payment_removed)
+
+    def _on_payment_added(self, event: PaymentAdded) -> None:
+        payment = event.payment
+        if payment.is_spending():
+            with self._lock:
+                alerts = self.__apply(payment.expense.account.owner.id, payment.payment_date, payment.amount.currency, to_cents(payment.amount))
+            self.__publish(alerts)
+
+    def _on_payment_removed(self, event: PaymentRemoved) -> None:
+        payment = event.payment
+        if payment.is_spending():
+            with self._lock:
+                alerts = self.__apply(payment.expense.account.owner.id, payment.payment_date, payment.amount.currency, -to_cents(payment.amount))
+            self.__publish(alerts)
+
+    def _on_payment_updated(self, event: PaymentUpdated) -> None:
+        payment = event.payment
+        owner_id = payment.expense.account.owner.id
+        previous_currency, currency = event.previous_currency, payment.amount.currency
+        previous_cents = to_cents(event.previous_amount) if event.previous_status not in NON_SPENDING_PAYMENT_STATUSES else 0
+        current_cents = to_cents(payment.amount) if payment.is_spending() else 0
+        same_month = self.__key(owner_id, event.previous_payment_date) == self.__key(owner_id, payment.payment_date)
+        with self._lock:
+            if same_month and previous_currency == currency:
+                # Net the change inside the same month so a re-applied amount never looks like a new crossing
+                alerts = self.__apply(owner_id, payment.payment_date, currency, current_cents - previous_cents)
+            else:
+                alerts = self.__apply(owner_id, event.previous_payment_date, previous_currency, -previous_cents)
+                alerts += self.__apply(owner_id, payment.payment_date, currency, current_cents)
+        self.__publish(alerts)
+
+    def __apply(self, user_id: UUID, payment_date: Optional[date], currency: Currency, delta_cents: int) -> List[SpendingLimitReached]:
+        'Apply a spend delta and get the alerts of the crossed thresholds. Call it holding the lock.'
+        key = self.__key(user_id, payment_date)
+        if key is None or not delta_cents:
+            return []
+        spent = self._spent.setdefault(key, {})
+        limit = self._limits.get(user_id)
+        if limit is None or to_cents(limit) <= 0 or (currency != limit.currency and self._converter is None):
+            spent[currency] = spent.get(currency, 0) + delta_cents
+            return []
+        before = self.__spent_cents(spent, limit, key)
+        spent[currency] = spent.get(currency, 0) + delta_cents
+        after = self.__spent_cents(spent, limit, key)
+        limit_cents = to_cents(limit)
+        if after < before:
+            return []
+        return [
+            SpendingLimitReached(user_id, key[1], key[2], threshold, from_cents(after, limit.precision, limit.currency), limit)
+            for threshold in self._thresholds
+            if before < limit_cents * threshold <= after
+        ]
+
+    def __publish(self, alerts: List[SpendingLimitReached]) -> None:
+        'Publish the alerts, outside the lock so their handlers can use the evaluator.'
+        for alert in alerts:
+            self._dispatcher.publish(alert)
+
+    def __spent_cents(self, spent: Dict[Currency, int], limit: Amount, key: Tuple[UUID, int, int]) -> int:
+        'Get the spend of a month that counts towards a limit, in units of the limit.'
+        if self._converter is None:
+            return round(spent.get(limit.currency, 0) * 10 ** (limit.precision - 2))
+        totals = {currency: from_cents(cents, currency=currency) for currency, cents in spent.items() if cents}
+        return to_cents(self._converter.convert_totals(totals, limit.currency, _last_day(key[1], key[2]), limit.precision))
+
+    @staticmethod
+    def __key(user_id: UUID, payment_date: Optional[date]) -> Optional[Tuple[UUID, int, int]]:
+        return (user_id, payment_date.year, payment_date.month) if payment_date is not None else None
+
+
+def _last_day(year: int, month: int) -> date:
+    'Get the last day of a month, the date of the rates used to convert its spend.'
+    return date.fromordinal(add_months_to_date(date(year, month, 1), 1).toordinal() - 1)
+
+
+def _monthly_spending_limit(user: User) -> Amount:
+    'Get the monthly spending limit of a user, zero (no alerts) if they have no profile or alert preferences.'
+    profile = user.profile
+    preferences = profile.alert_preferences if profile is not None else None
+    return preferences.monthly_spending_limit if preferences is not None else Amount(0)
+
+
+def evaluate_month(
+    users_periods: Iterable[Tuple[User, Iterable[Period]]],
+    year: int,
+    month: int,
+    thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+    converter: Optional[CurrencyConverter] = None,
+) -> List[SpendingLimitReached]:
+    '''
+    Evaluate the current month of every user, for the nightly sweep.
+
+    The spend of each user is added up per currency in a single pass over their periods of the
+    month. The highest threshold reached by each user is returned, whether it was crossed today or
+    earlier.
+
+    :param users_periods: The users with their periods.
+    :param year: The year to evaluate.
+    :param month: The month to evaluate.
+    :param thresholds: The ratios of the limit to report.
+    :param converter: The converter of the spend in other currencies than the limit, with the
+        rates of the last day of the month. Without one, such spend raises CurrencyMismatchException.
+    :return: The alerts of the users that reached at least one threshold.
+    '''
+    ordered_thresholds = sorted(thresholds)
+    alerts = []
+    for user, periods in users_periods:
+        limit = _monthly_spending_limit(user)
+        limit_cents = to_cents(limit)
+        if limit_cents <= 0:
+            continue
+        totals = group_by_currency(
+            payment.amount
+            for period in periods
+            if period.year.value == year and period.month.value == month
+            for payment in period.payments
+            if payment.is_spending()
+        )
+        if converter is None:
+            spent = single_currency_total(totals, limit.currency)
+        else:
+            spent = converter.convert_totals(totals, limit.currency, _last_day(year, month), limit.precision)
+        spent_cents = round(to_cents(spent) * 10 ** (limit.precision - spent.precision))
+        reached = [threshold for threshold in ordered_thresholds if spent_cents >= limit_cents * threshold]
+        if reached:
+            alerts.append(SpendingLimitReached(
+                user.id, year, month, reached[-1], from_cents(spent_cents, limit.precision, limit.currency), limit
+            ))
+    return alerts
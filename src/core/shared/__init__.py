@@ -0,0 +1,15 @@
+from .helpers.lazy_imports import lazy_exports
+
+__getattr__, __dir__ = lazy_exports(__name__, submodules=[
+    'currency_rates',
+    'entity_base',
+    'events',
+    'exception_base',
+    'exceptions',
+    'filter_base',
+    'helpers',
+    'instrumentation',
+    'interfaces',
+    'paginated_result',
+    'value_objects',
+])
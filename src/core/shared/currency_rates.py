@@ -0,0 +1,197 @@
+import csv
+from bisect import bisect_right, insort
+from datetime import date
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
+
+from .exceptions import CurrencyMismatchException, ExchangeRateNotFoundException
+from .helpers.amounts import from_cents, to_cents
+from .value_objects import Amount, Currency
+
+# (currency, precision) of a group of amounts added up in cents
+CurrencyGroup = Tuple[Currency, int]
+
+
+class RateTable:
+    '''
+    Daily exchange rates of several currencies against a base currency.
+
+    The rates of each currency are kept sorted by date, so the rate in force on a date (the
+    latest one published on or before it) is found with a binary search. Resolved lookups are
+    cached by (currency, date), since the same few dates are asked over and over while a
+    dashboard or a batch converts the totals of many cards.
+    '''
+
+    def __init__(self, base: Currency = Currency.ARS):
+        self._base = base
+        self._ordinals: Dict[Currency, List[int]] = {}
+        self._rates: Dict[Currency, Dict[int, float]] = {}
+        self._cache: Dict[Tuple[Currency, int], float] = {}
+
+    @property
+    def base(self) -> Currency:
+        'Get the currency the rates are quoted in.'
+        return self._base
+
+    def add_rate(self, currency: Currency, on: date, rate: float) -> None:
+        '''
+        Add or replace the rate of a currency for a date.
+
+        :param currency: The quoted currency.
+        :param on: The date the rate is published for.
+        :param rate: How many units of the base currency one unit of the currency is worth.
+        '''
+        if rate <= 0:
+            raise ValueError('rate must be greater than zero')
+        ordinal = on.toordinal()
+        rates = self._rates.setdefault(currency, {})
+        if ordinal not in rates:
+            insort(self._ordinals.setdefault(currency, []), ordinal)
+        rates[ordinal] = rate
+        self._cache.clear()
+
+    def load_csv(self, stream: TextIO) -> int:
+        '''
+        Load the rates from a CSV with `date`, `currency` and `rate` columns.
+
+        :param stream: The CSV text, with a header row and ISO dates.
+        :return: The number of rates loaded.
+        '''
+        loaded = 0
+        for row in csv.DictReader(stream):
+            self.add_rate(Currency(row['currency'].strip().upper()), date.fromisoformat(row['date'].strip()), float(row['rate']))
+            loaded += 1
+        return loaded
+
+    def rate(self, currency: Currency, on: date) -> float:
+        '''
+        Get the rate of a currency in force on a date.
+
+        :raises ExchangeRateNotFoundException: If there is no rate of the currency on or before the date.
+        '''
+        if currency == self._base:
+            return 1.0
+        key = (currency, on.toordinal())
+        rate = self._cache.get(key)
+        if rate is None:
+            ordinals = self._ordinals.get(currency, [])
+            position = bisect_right(ordinals, key[1])
+            if position == 0:
+                raise ExchangeRateNotFoundException(f'There is no {currency.value} rate on or before {on.isoformat()}.')
+            rate = self._cache[key] = self._rates[currency][ordinals[position - 1]]
+        return rate
+
+    def cross_rate(self, source: Currency, target: Currency, on: date) -> float:
+        'Get how many units of the target currency one unit of the source currency is worth.'
+        if source == target:
+            return 1.0
+        return self.rate(source, on) / self.rate(target, on)
+
+
+class CurrencyConverter:
+    '''
+    Converts amounts between currencies with the rates of a rate table.
+
+    Totals are added up in cents per currency first and each group is converted once, so a total
+    of n amounts in k currencies needs k rate lookups and k roundings instead of n.
+    '''
+
+    def __init__(self, rates: RateTable):
+        self._rates = rates
+
+    @property
+    def rates(self) -> RateTable:
+        'Get the rate table used for the conversions.'
+        return self._rates
+
+    def convert(self, amount: Amount, currency: Currency, on: date) -> Amount:
+        'Convert an amount to a currency with the rate in force on a date.'
+        if amount.currency == currency:
+            return amount
+        return Amount(amount.value * self._rates.cross_rate(amount.currency, currency, on), amount.precision, currency)
+
+    def convert_totals(self, totals: Dict[Currency, Amount], currency: Currency, on: date, precision: int = 2) -> Amount:
+        '''
+        Add up totals in several currencies into one currency.
+
+        :param totals: A total per currency, e.g. from `Period.totals_by_currency`.
+        :param currency: The currency of the result.
+        :param on: The date of the rates.
+        :param precision: The precision of the result.
+        :return: The converted grand total.
+        '''
+        converted = sum(
+            round(to_cents(total) * self._rates.cross_rate(total_currency, currency, on) * 10 ** (precision - total.precision))
+            for total_currency, total in totals.items()
+        )
+        return from_cents(converted, precision, currency)
+
+    def total(self, amounts: Iterable[Amount], currency: Currency, on: date, precision: int = 2) -> Amount:
+        'Add up amounts in any currencies into one currency, converting each currency once.'
+        return self.convert_totals(group_by_currency(amounts, precision), currency, on, precision)
+
+
+def group_by_currency(amounts: Iterable[Amount], precision: Optional[int] = None) -> Dict[Currency, Amount]:
+    '''
+    Add up amounts in exact cents per currency.
+
+    :param amounts: The amounts to add up.
+    :param precision: The precision of the totals. By default, the highest precision of each currency.
+    :return: The total of each currency found.
+    '''
+    groups: Dict[CurrencyGroup, int] = {}
+    for amount in amounts:
+        key = (amount.currency, amount.precision)
+        groups[key] = groups.get(key, 0) + to_cents(amount)
+    precisions: Dict[Currency, int] = {}
+    for currency, group_precision in groups:
+        precisions[currency] = max(precisions.get(currency, 0), group_precision if precision is None else precision)
+    cents: Dict[Currency, int] = {}
+    for (currency, group_precision), group_cents in groups.items():
+        scale = 10 ** (precisions[currency] - group_precision)
+        cents[currency] = cents.get(currency, 0) + round(group_cents * scale)
+    return {currency: from_cents(total, precisions[currency], currency) for currency, total in cents.items()}
+
+
+def single_currency_total(totals: Dict[Currency, Amount], currency: Optional[Currency] = None) -> Amount:
+    '''
+    Get the total of amounts grouped by currency, when they are all in the same currency.
+
+    :param totals: A total per currency, e.g. from `group_by_currency`. Zero totals are ignored.
+    :param currency: The currency the totals must be in. By default, any single currency.
+    :return: The total, or zero in the expected currency (ARS by default) if every total is zero.
+    :raises CurrencyMismatchException: If there are totals in several currencies, or in another one than expected.
+    '''
+    non_zero = {total_currency: total for total_currency, total in totals.items() if to_cents(total)}
+    if currency is not None and any(total_currency != currency for total_currency in non_zero):
+        other_currencies = ', '.join(sorted(total_currency.value for total_currency in non_zero if total_currency != currency))
+        raise CurrencyMismatchException(f'There are amounts in {other_currencies}, use a CurrencyConverter to add them up in {currency.value}.')
+    if len(non_zero) > 1:
+        currencies = ', '.join(sorted(total_currency.value for total_currency in non_zero))
+        raise CurrencyMismatchException(f'There are amounts in {currencies}, use a CurrencyConverter to add them up.')
+    if non_zero:
+        return next(iter(non_zero.values()))
+    return Amount(0, currency=currency or Currency.ARS)
+
+
+def available_amount(
+    limit: Amount,
+    pending: Dict[Currency, Amount],
+    converter: Optional[CurrencyConverter] = None,
+    on: Optional[date] = None,
+) -> Amount:
+    '''
+    Subtract pending totals in any currencies from a limit.
+
+    :param limit: The limit.
+    :param pending: The pending total per currency.
+    :param converter: The converter of the totals in other currencies than the limit. Without
+        one, such totals raise CurrencyMismatchException.
+    :param on: The date of the rates, required with a converter.
+    :return: The available amount, in the currency and precision of the limit.
+    '''
+    if converter is None:
+        total = single_currency_total(pending, limit.currency)
+    else:
+        total = converter.convert_totals(pending, limit.currency, on, limit.precision)
+    pending_cents = round(to_cents(total) * 10 ** (limit.precision - total.precision))
+    return from_cents(to_cents(limit) - pending_cents, limit.precision, limit.currency)
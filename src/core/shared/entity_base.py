@@ -1,19 +1,102 @@
-
+import threading
+from functools import wraps
 from uuid import UUID, uuid4
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 from abc import ABC, abstractmethod
 
+from .exceptions import StaleEntityException
+
+F = TypeVar('F', bound=Callable)
+
+_deferred = threading.local()  # Callbacks waiting for the synchronized methods of the thread to return
+
 
 class EntityBase(ABC):
+    _lock_guard = threading.Lock()  # Guards the lazy creation of the entity locks
+
     def __init__(self, id: Optional[UUID] = None):
         self.id = id if id is not None else uuid4()
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        'Get the stored version of the entity, used for optimistic concurrency.'
+        return self._version
+
+    @version.setter
+    def version(self, value: int):
+        'Set the stored version of the entity. Only repositories should set it.'
+        if not isinstance(value, int) or value < 0:
+            raise ValueError('version must be a non-negative integer')
+        self._version = value
+
+    @property
+    def lock(self) -> threading.RLock:
+        'Get the reentrant lock that guards the mutations of the entity, created on first use.'
+        lock = self.__dict__.get('_lock')
+        if lock is None:
+            with EntityBase._lock_guard:
+                lock = self.__dict__.get('_lock')
+                if lock is None:
+                    lock = self.__dict__['_lock'] = threading.RLock()
+        return lock
+
+    def check_version(self, expected_version: int) -> None:
+        'Raise if the entity was saved by someone else since it was read with the expected version.'
+        if self._version != expected_version:
+            raise StaleEntityException(
+                f'{type(self).__name__} {self.id} was read at version {expected_version}, but version {self._version} is stored.'
+            )
+
+    def __getstate__(self) -> dict:
+        # Locks cannot be pickled nor shared with copies, the copy gets its own lock on first use
+        state = self.__dict__.copy()
+        state.pop('_lock', None)
+        return state
 
     def to_dict(self) -> dict:
         '''Convert the entity to a dictionary representation.'''
-        return self.__dict__
+        return self.__getstate__()
 
     @classmethod
     @abstractmethod
     def from_dict(cls, data: dict)-> 'EntityBase':
         '''Create an entity instance from a dictionary representation.'''
-        ...
\ No newline at end of file
+        ...
+
+
+def synchronized(method: F) -> F:
+    '''
+    Run an entity method while holding the lock of the entity.
+
+    The callbacks deferred with `after_unlock` while the method runs, including those of nested
+    synchronized methods of other entities, run once the outermost one has released its lock.
+    '''
+    @wraps(method)
+    def wrapper(self: EntityBase, *args, **kwargs):
+        if getattr(_deferred, 'callbacks', None) is not None:
+            with self.lock:
+                return method(self, *args, **kwargs)
+        _deferred.callbacks = callbacks = []
+        try:
+            with self.lock:
+                return method(self, *args, **kwargs)
+        finally:
+            _deferred.callbacks = None
+            for callback, args in callbacks:
+                callback(*args)
+    return wrapper  # type: ignore[return-value]
+
+
+def after_unlock(callback: Callable, *args) -> None:
+    '''
+    Run a callback once the calling thread leaves its synchronized methods, or now if it is in none.
+
+    Entities publish their events through it, so the handlers run without the entity locks held
+    and can touch other entities without deadlocking.
+    '''
+    callbacks = getattr(_deferred, 'callbacks', None)
+    if callbacks is None:
+        callback(*args)
+    else:
+        callbacks.append((callback, args))
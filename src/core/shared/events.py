@@ -0,0 +1,76 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Type
+
+
+class DomainEvent:
+    '''Base class for the events published by the domain entities.'''
+
+
+EventHandler = Callable[[DomainEvent], None]
+
+
+class EventDispatcher:
+    '''
+    In-process publish/subscribe dispatcher for domain events.
+
+    Handlers subscribed to a base event class also receive its subclasses. Entities publish with
+    `emit`, which only builds the event when somebody is listening, so publishing on hot paths
+    costs a dictionary lookup while there are no subscribers.
+    '''
+
+    def __init__(self):
+        self._handlers: Dict[Type[DomainEvent], List[EventHandler]] = {}
+        self._resolved: Dict[Type[DomainEvent], List[EventHandler]] = {}
+        self._local = threading.local()  # Muting only applies to the thread that asked for it
+
+    def subscribe(self, event_type: Type[DomainEvent], handler: EventHandler) -> None:
+        'Subscribe a handler to an event type and its subclasses.'
+        self._handlers.setdefault(event_type, []).append(handler)
+        self._resolved.clear()
+
+    def unsubscribe(self, event_type: Type[DomainEvent], handler: EventHandler) -> None:
+        'Unsubscribe a handler from an event type.'
+        handlers = self._handlers.get(event_type, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        self._resolved.clear()
+
+    def has_subscribers(self, event_type: Type[DomainEvent]) -> bool:
+        'Check if any handler would receive an event of the given type.'
+        return bool(self.__resolve(event_type))
+
+    @contextmanager
+    def muted(self) -> Iterator[None]:
+        'Drop every event published by this thread inside the block, e.g. while rebuilding entities that did not change.'
+        self._local.muted = getattr(self._local, 'muted', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.muted -= 1
+
+    def publish(self, event: DomainEvent) -> None:
+        'Deliver an event to every subscribed handler.'
+        for handler in self.__resolve(type(event)):
+            handler(event)
+
+    def emit(self, event_type: Type[DomainEvent], *args, **kwargs) -> None:
+        'Build and publish an event only if it has subscribers.'
+        handlers = self.__resolve(event_type)
+        if handlers:
+            event = event_type(*args, **kwargs)
+            for handler in handlers:
+                handler(event)
+
+    def __resolve(self, event_type: Type[DomainEvent]) -> List[EventHandler]:
+        'Get the handlers of an event type, including those subscribed to its base classes.'
+        if getattr(self._local, 'muted', 0):
+            return []
+        handlers = self._resolved.get(event_type)
+        if handlers is None:
+            handlers = [handler for cls in event_type.__mro__ for handler in self._handlers.get(cls, [])]
+            self._resolved[event_type] = handlers
+        return handlers
+
+
+dispatcher = EventDispatcher()
@@ -0,0 +1,25 @@
+from .exception_base import ExceptionBase
+
+
+class StaleEntityException(ExceptionBase):
+    '''Exception raised when saving an entity that was changed by someone else since it was read.'''
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.code = 'STALE_ENTITY_EXCEPTION'
+
+
+class CurrencyMismatchException(ExceptionBase):
+    '''Exception raised when amounts in different currencies are aggregated without a conversion.'''
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.code = 'CURRENCY_MISMATCH_EXCEPTION'
+
+
+class ExchangeRateNotFoundException(ExceptionBase):
+    '''Exception raised when there is no exchange rate of a currency for a date.'''
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.code = 'EXCHANGE_RATE_NOT_FOUND_EXCEPTION'
@@ -0,0 +1,42 @@
+from typing import List
+
+from ..value_objects import Amount, Currency
+
+
+def to_cents(amount: Amount) -> int:
+    '''
+    Convert an amount to an integer number of its smallest units (cents for a precision of 2).
+
+    :param amount: The amount to convert.
+    :return: The amount expressed as an integer number of units.
+    '''
+    return round(amount.value * 10 ** amount.precision)
+
+
+def from_cents(cents: int, precision: int = 2, currency: Currency = Currency.ARS) -> Amount:
+    '''
+    Build an amount from an integer number of its smallest units.
+
+    :param cents: The number of units (cents for a precision of 2).
+    :param precision: The precision of the resulting amount.
+    :param currency: The currency of the resulting amount.
+    :return: The amount represented by the given units.
+    '''
+    return Amount(cents / 10 ** precision, precision, currency)
+
+
+def split_amount(amount: Amount, parts: int) -> List[Amount]:
+    '''
+    Split an amount into equal parts without losing or creating cents.
+
+    The remainder of the division is spread one unit at a time over the first parts, so the
+    parts always add up exactly to the original amount.
+
+    :param amount: The amount to split.
+    :param parts: The number of parts.
+    :return: The list of parts, ordered from the largest to the smallest.
+    '''
+    if parts <= 0:
+        raise ValueError('parts must be greater than zero')
+    base, remainder = divmod(to_cents(amount), parts)
+    return [from_cents(base + 1 if i < remainder else base, amount.precision, amount.currency) for i in range(parts)]
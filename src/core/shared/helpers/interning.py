@@ -0,0 +1,122 @@
+import sys
+import threading
+from enum import Enum
+from typing import Dict, Generic, List, Optional, Type, TypeVar
+
+E = TypeVar('E', bound=Enum)
+
+DEFAULT_MAX_STRINGS = 100_000  # Bound of the interners owned by the long-lived stores
+
+
+class StringInterner:
+    '''
+    Keeps one canonical copy of repeated strings and numbers them with small-int codes.
+
+    Hydrated and imported expenses repeat the same credit card names and titles (a subscription
+    repeats its title every month), so interning them keeps a single copy of each in memory, and
+    compact records can store the code instead of the string.
+
+    Strings are never evicted, since the codes given out must stay valid, so scope an interner to
+    a store or an import rather than to the process. With a `max_size`, a full interner returns
+    new strings as they are from `intern` and refuses to give them a code.
+    '''
+
+    def __init__(self, max_size: Optional[int] = None):
+        if max_size is not None and max_size <= 0:
+            raise ValueError('max_size must be greater than zero')
+        self._max_size = max_size
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.saved_bytes = 0  # Memory of the duplicate copies replaced by a canonical one
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __contains__(self, value: str) -> bool:
+        return value in self._codes
+
+    @property
+    def is_full(self) -> bool:
+        'Check if the interner reached its maximum size.'
+        return self._max_size is not None and len(self._values) >= self._max_size
+
+    def intern(self, value: str) -> str:
+        'Get the canonical copy of a string, or the string itself if it is new and the interner is full.'
+        with self._lock:
+            code = self._codes.get(value)
+            if code is None:
+                if self.is_full:
+                    return value
+                self.__add(value)
+                return value
+            self.__hit(code, value)
+            return self._values[code]
+
+    def code(self, value: str) -> int:
+        'Get the code of a string, assigning the next one if it is new.'
+        with self._lock:
+            code = self._codes.get(value)
+            if code is None:
+                if self.is_full:
+                    raise ValueError(f'The interner is full ({self._max_size} strings)')
+                return self.__add(value)
+            self.__hit(code, value)
+            return code
+
+    def value(self, code: int) -> str:
+        'Get the string of a code.'
+        return self._values[code]
+
+    def values(self) -> List[str]:
+        'Get the interned strings, in code order.'
+        return list(self._values)
+
+    def memory(self) -> int:
+        'Get the approximate memory held by the interned strings and their table, in bytes.'
+        return (
+            sum(sys.getsizeof(value) for value in self._values)
+            + sys.getsizeof(self._values)
+            + sys.getsizeof(self._codes)
+        )
+
+    def clear(self) -> None:
+        'Forget every string. The codes given so far are no longer valid.'
+        with self._lock:
+            self._codes.clear()
+            self._values.clear()
+            self.hits = 0
+            self.saved_bytes = 0
+
+    def __add(self, value: str) -> int:
+        'Assign the next code to a new string. Called with the lock held.'
+        code = self._codes[value] = len(self._values)
+        self._values.append(value)
+        return code
+
+    def __hit(self, code: int, value: str) -> None:
+        'Count a lookup of a known string. Called with the lock held.'
+        self.hits += 1
+        if self._values[code] is not value:
+            self.saved_bytes += sys.getsizeof(value)
+
+
+class EnumCodec(Generic[E]):
+    'Maps the members of an enum to small-int codes, by definition order.'
+
+    def __init__(self, enum_type: Type[E]):
+        self._members: List[E] = list(enum_type)
+        self._codes: Dict[E, int] = {member: code for code, member in enumerate(self._members)}
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def encode(self, member: E) -> int:
+        'Get the code of a member.'
+        return self._codes[member]
+
+    def decode(self, code: int) -> E:
+        'Get the member of a code.'
+        return self._members[code]
+
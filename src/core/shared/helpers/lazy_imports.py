@@ -0,0 +1,36 @@
+import sys
+from importlib import import_module
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def lazy_exports(
+    package: str, exports: Optional[Dict[str, str]] = None, submodules: Iterable[str] = ()
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    '''
+    Build the PEP 562 `__getattr__` and `__dir__` of a package that imports its exports and
+    submodules on first access.
+
+    :param package: The `__name__` of the package.
+    :param exports: The exported names mapped to the relative module that defines them.
+    :param submodules: The names of the submodules that can be reached as attributes.
+    :return: The `__getattr__` and `__dir__` functions of the package.
+    '''
+    exports = exports or {}
+    submodules = frozenset(submodules)
+
+    def __getattr__(name: str) -> Any:
+        if name in submodules:
+            # Importing a submodule also sets it as an attribute of the package
+            return import_module(f'.{name}', package)
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f'module {package!r} has no attribute {name!r}')
+        value = getattr(import_module(module, package), name)
+        # Cache the export in the package, so next accesses do not go through __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> List[str]:
+        return sorted(set(vars(sys.modules[package])) | exports.keys() | submodules)
+
+    return __getattr__, __dir__
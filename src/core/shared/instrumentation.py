@@ -0,0 +1,279 @@
+import logging
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+F = TypeVar('F', bound=Callable)
+ItemsCounter = Callable[..., int]
+
+
+class OperationStats:
+    'Call count, timing and scanned items of one instrumented operation.'
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.items_scanned = 0
+
+    @property
+    def mean_seconds(self) -> float:
+        'Get the mean duration of a call.'
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+    def copy(self) -> 'OperationStats':
+        'Get a copy of the stats, safe to keep while recording goes on.'
+        stats = OperationStats(self.name)
+        stats.calls = self.calls
+        stats.total_seconds = self.total_seconds
+        stats.max_seconds = self.max_seconds
+        stats.items_scanned = self.items_scanned
+        return stats
+
+
+class InstrumentationSink(ABC):
+    'Destination of the exported operation stats.'
+
+    @abstractmethod
+    def export(self, stats: List[OperationStats]) -> None:
+        ...
+
+
+class InMemorySink(InstrumentationSink):
+    'Keeps every export, mainly for tests and debugging sessions.'
+
+    def __init__(self):
+        self.exports: List[List[OperationStats]] = []
+
+    def export(self, stats: List[OperationStats]) -> None:
+        self.exports.append(stats)
+
+    @property
+    def latest(self) -> Dict[str, OperationStats]:
+        'Get the stats of the latest export by operation name.'
+        return {operation.name: operation for operation in self.exports[-1]} if self.exports else {}
+
+
+class LoggingSink(InstrumentationSink):
+    'Logs one line per operation.'
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self._logger = logger or logging.getLogger(__name__)
+        self._level = level
+
+    def export(self, stats: List[OperationStats]) -> None:
+        for operation in stats:
+            self._logger.log(
+                self._level,
+                '%s calls=%d total=%.6fs mean=%.6fs max=%.6fs items=%d',
+                operation.name,
+                operation.calls,
+                operation.total_seconds,
+                operation.mean_seconds,
+                operation.max_seconds,
+                operation.items_scanned,
+            )
+
+
+class PrometheusTextSink(InstrumentationSink):
+    'Renders the stats in the Prometheus text exposition format, to be served by a metrics endpoint.'
+
+    def __init__(self, prefix: str = 'smm'):
+        self._prefix = prefix
+        self.text = ''
+
+    def export(self, stats: List[OperationStats]) -> None:
+        self.text = self.render(stats)
+
+    def render(self, stats: List[OperationStats]) -> str:
+        'Render the stats as Prometheus metrics labelled by operation.'
+        metrics = [
+            ('operation_calls_total', 'counter', 'Number of calls of the operation.', lambda op: op.calls),
+            ('operation_seconds_total', 'counter', 'Cumulative time spent in the operation.', lambda op: op.total_seconds),
+            ('operation_max_seconds', 'gauge', 'Longest call of the operation.', lambda op: op.max_seconds),
+            ('operation_items_scanned_total', 'counter', 'Items (e.g. payments) scanned by the operation.', lambda op: op.items_scanned),
+        ]
+        lines = []
+        for metric, kind, help_text, value in metrics:
+            name = f'{self._prefix}_{metric}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for operation in stats:
+                label = operation.name.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{operation="{label}"}} {value(operation)}')
+        return '\n'.join(lines) + '\n'
+
+
+class Instrumentation:
+    '''
+    Registry of the stats of the instrumented operations.
+
+    It is disabled by default: an instrumented call then only checks the `enabled` flag before
+    calling through, and the items counters are never evaluated.
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self._stats: Dict[str, OperationStats] = {}
+        self._sinks: List[InstrumentationSink] = []
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        'Start recording.'
+        self.enabled = True
+
+    def disable(self) -> None:
+        'Stop recording, keeping the stats recorded so far.'
+        self.enabled = False
+
+    def add_sink(self, sink: InstrumentationSink) -> None:
+        'Add a destination for the exports.'
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink: InstrumentationSink) -> None:
+        'Remove a destination of the exports.'
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def record(self, name: str, seconds: float, items: int = 0) -> None:
+        'Record one call of an operation.'
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = OperationStats(name)
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.items_scanned += items
+            if seconds > stats.max_seconds:
+                stats.max_seconds = seconds
+
+    def stats(self) -> List[OperationStats]:
+        'Get a copy of the stats of every operation, slowest first.'
+        with self._lock:
+            stats = [operation.copy() for operation in self._stats.values()]
+        return sorted(stats, key=lambda operation: operation.total_seconds, reverse=True)
+
+    def export(self, reset: bool = False) -> List[OperationStats]:
+        'Send the current stats to every sink, optionally starting a new window.'
+        stats = self.stats()
+        if reset:
+            self.reset()
+        for sink in self._sinks:
+            sink.export(stats)
+        return stats
+
+    def reset(self) -> None:
+        'Drop the recorded stats.'
+        with self._lock:
+            self._stats.clear()
+
+    @contextmanager
+    def measure(self, name: str, items: int = 0) -> Iterator[None]:
+        'Record the block as one call of an operation.'
+        if not self.enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started_at, items)
+
+
+instrumentation = Instrumentation()
+
+
+def instrumented(name: str, items: Optional[ItemsCounter] = None) -> Callable[[F], F]:
+    '''
+    Record the calls of a function or method in the instrumentation registry.
+
+    :param name: The name of the operation.
+    :param items: Counts the items scanned by a call, from the same arguments as the function.
+        It is only evaluated while recording.
+    :return: The decorator.
+    '''
+    def decorator(function: F) -> F:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+            started_at = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started_at
+                instrumentation.record(name, elapsed, items(*args, **kwargs) if items is not None else 0)
+        wrapper.__instrumented__ = True
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+class SamplingProfiler:
+    '''
+    Opt-in statistical profiler of one thread.
+
+    A background thread samples the stack of the profiled thread every `interval` seconds and
+    counts the innermost frames, which tells where the time goes without tracing every call.
+    '''
+
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, depth: int = 1):
+        if interval <= 0:
+            raise ValueError('interval must be greater than zero')
+        self._interval = interval
+        self._thread_id = thread_id
+        self._depth = depth
+        self._samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    @property
+    def samples(self) -> int:
+        'Get the number of samples taken.'
+        return sum(self._samples.values())
+
+    def start(self) -> None:
+        'Start sampling, by default the thread that calls it.'
+        if self._sampler is not None:
+            return
+        if self._thread_id is None:
+            self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self.__run, name='sampling-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        'Stop sampling.'
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def top(self, limit: int = 20) -> List[Tuple[str, int]]:
+        'Get the most sampled locations with their sample counts.'
+        return self._samples.most_common(limit)
+
+    def __run(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            locations = []
+            while frame is not None and len(locations) < self._depth:
+                code = frame.f_code
+                locations.append(f'{code.co_filename}:{frame.f_lineno} {code.co_name}')
+                frame = frame.f_back
+            self._samples[' <- '.join(locations)] += 1
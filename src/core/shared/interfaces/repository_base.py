@@ -1,14 +1,33 @@
 from abc import ABC, abstractmethod
+from inspect import isfunction
 from uuid import UUID
-from typing import Optional, Generic, TypeVar
+from typing import Iterable, List, Optional, Generic, Tuple, TypeVar
 
+from ..entity_base import EntityBase
+from ..instrumentation import instrumented
 from ..paginated_result import PaginatedResult
 from ..filter_base import FilterBase
 
-T = TypeVar('T')
+T = TypeVar('T', bound=EntityBase)
 
 
 class RepositoryBase(ABC, Generic[T]):
+    _WRITE_HOOKS = {'_save': 'save', '_save_many': 'save_many'}  # Instrumented after the public method that calls them
+
+    def __init_subclass__(cls, **kwargs):
+        '''Instrument the public methods implemented by each repository, named after the repository class.'''
+        super().__init_subclass__(**kwargs)
+        for name, member in list(vars(cls).items()):
+            label = RepositoryBase._WRITE_HOOKS.get(name, name)
+            if (
+                label.startswith('_')
+                or not isfunction(member)
+                or getattr(member, '__isabstractmethod__', False)
+                or getattr(member, '__instrumented__', False)
+            ):
+                continue
+            setattr(cls, name, instrumented(f'{cls.__name__}.{label}')(member))
+
     @abstractmethod
     def get_paginated(self, page: int, page_size: int, filter: Optional[FilterBase] = None) -> PaginatedResult[T]:
         '''Get a paginated result of entities, optionally filtered by a given filter.'''
@@ -24,11 +43,60 @@ class RepositoryBase(ABC, Generic[T]):
         '''Get an entity by its ID.'''
         ...
 
-    @abstractmethod
     def save(self, entity: T) -> T:
-        '''Save an entity, either creating or updating it based on its ID.'''
+        '''
+        Save an entity, either creating or updating it based on its ID.
+
+        The version of the entity is only bumped once the write succeeded, so a failed save can be retried.
+
+        :raises StaleEntityException: If the entity was saved by someone else since it was read.
+        '''
+        self.check_version(entity)
+        saved = self._save(entity, entity.version + 1)
+        entity.version += 1
+        return saved
+
+    def save_many(self, entities: Iterable[T]) -> List[T]:
+        '''
+        Save several entities at once, bumping their versions once the write succeeded.
+
+        :raises StaleEntityException: If any entity was saved by someone else since it was read. Nothing is written then.
+        '''
+        entities = list(entities)
+        for entity in entities:
+            self.check_version(entity)
+        saved = self._save_many([(entity, entity.version + 1) for entity in entities])
+        for entity in entities:
+            entity.version += 1
+        return saved
+
+    def check_version(self, entity: T) -> None:
+        '''
+        Check that the stored entity was not saved by someone else since the entity was read.
+
+        :raises StaleEntityException: If the stored entity is at another version.
+        '''
+        stored = self.get_by_id(entity.id)
+        if stored is not None:
+            stored.check_version(entity.version)
+
+    @abstractmethod
+    def _save(self, entity: T, version: int) -> T:
+        '''
+        Write an entity with its new version. Implementations should guard the write with the version
+        the entity was read at too (e.g. `UPDATE ... WHERE version = :version - 1`), since another
+        writer can save it between `check_version` and the write.
+
+        :param entity: The entity, still at the version it was read at.
+        :param version: The version to store.
+        :return: The saved entity.
+        '''
         ...
 
+    def _save_many(self, entities: List[Tuple[T, int]]) -> List[T]:
+        '''Write several entities with their new versions. Storage backed repositories should override it with a bulk write.'''
+        return [self._save(entity, version) for entity, version in entities]
+
     @abstractmethod
     def delete(self, id: UUID) -> None:
         '''Delete an entity by its ID.'''
@@ -1,9 +1,11 @@
-from amount import Amount
-from month import Month
-from year import Year
+from .amount import Amount
+from .currency import Currency
+from .month import Month
+from .year import Year
 
 __all__ = [
     'Amount',
+    'Currency',
     'Month',
     'Year',
 ]
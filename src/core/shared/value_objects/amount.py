@@ -1,10 +1,14 @@
+from ..exceptions import CurrencyMismatchException
+from .currency import Currency
+
 
 class Amount:
-    'Represents a decimal value with a fixed precision.'
+    'Represents a decimal value with a fixed precision in a currency.'
 
-    def __init__(self, value: float, precision: int = 2):
+    def __init__(self, value: float, precision: int = 2, currency: Currency = Currency.ARS):
         self.value = round(value, precision)
         self.precision = precision
+        self.currency = currency
 
     def __str__(self) -> str:
         return f'{self.value:.{self.precision}f}'
@@ -12,4 +16,6 @@ class Amount:
     def __add__(self, other: 'Amount') -> 'Amount':
         if not isinstance(other, Amount):
             raise TypeError('Can only add Decimal to Decimal')
-        return Amount(self.value + other.value, max(self.precision, other.precision))
+        if other.currency != self.currency:
+            raise CurrencyMismatchException(f'Cannot add {other.currency.value} to {self.currency.value}, convert the amounts first')
+        return Amount(self.value + other.value, max(self.precision, other.precision), self.currency)
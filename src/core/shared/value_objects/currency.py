@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class Currency(str, Enum):
+    ARS = 'ARS'
+    USD = 'USD'
+    EUR = 'EUR'
+    BRL = 'BRL'
@@ -1,5 +1,24 @@
-from .models import User
+from typing import TYPE_CHECKING
+
+from ..shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .models import User
 
 __all__ = [
     'User',
 ]
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        'User': '.models',
+    },
+    submodules=[
+        'enums',
+        'exceptions',
+        'interfaces',
+        'models',
+        'services',
+    ],
+)
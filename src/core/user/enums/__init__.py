@@ -1,5 +1,7 @@
+from .quota_resource import QuotaResource
 from .role import Role
 
 __all__ = [
+    'QuotaResource',
     'Role',
 ]
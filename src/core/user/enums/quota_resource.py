@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class QuotaResource(str, Enum):
+    CREDIT_CARDS = 'credit_cards'
+    ACTIVE_SUBSCRIPTIONS = 'active_subscriptions'
+    MONTHLY_EXPENSES = 'monthly_expenses'
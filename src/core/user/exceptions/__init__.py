@@ -0,0 +1,7 @@
+from .quota_exceptions import QuotaExceededException, RateLimitExceededException
+
+__all__ = [
+    # Quota exceptions
+    'QuotaExceededException',
+    'RateLimitExceededException',
+]
@@ -0,0 +1,18 @@
+from ...shared.exception_base import ExceptionBase
+
+
+class QuotaExceededException(ExceptionBase):
+    '''Exception raised when an action would exceed a limit of the plan of the user.'''
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.code = 'QUOTA_EXCEEDED_EXCEPTION'
+
+
+class RateLimitExceededException(ExceptionBase):
+    '''Exception raised when a user makes requests faster than their plan allows.'''
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.code = 'RATE_LIMIT_EXCEEDED_EXCEPTION'
+        self.retry_after = retry_after  # Seconds until the request would be allowed
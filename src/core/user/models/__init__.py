@@ -1,9 +1,20 @@
-from .user import User
-from .profile import Profile
-from .alert_preferences import AlertPreferences
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .user import User
+    from .profile import Profile
+    from .alert_preferences import AlertPreferences
 
 __all__ = [
     'User',
     'Profile',
     'AlertPreferences'
 ]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'User': '.user',
+    'Profile': '.profile',
+    'AlertPreferences': '.alert_preferences',
+})
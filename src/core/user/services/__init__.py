@@ -0,0 +1,20 @@
+from typing import TYPE_CHECKING
+
+from ...shared.helpers.lazy_imports import lazy_exports
+
+if TYPE_CHECKING:
+    from .quota_enforcer import DEFAULT_POLICIES, QuotaEnforcer, QuotaPolicy, TokenBucket
+
+__all__ = [
+    'DEFAULT_POLICIES',
+    'QuotaEnforcer',
+    'QuotaPolicy',
+    'TokenBucket',
+]
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'DEFAULT_POLICIES': '.quota_enforcer',
+    'QuotaEnforcer': '.quota_enforcer',
+    'QuotaPolicy': '.quota_enforcer',
+    'TokenBucket': '.quota_enforcer',
+})
@@ -0,0 +1,234 @@
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+from uuid import UUID
+
+from ...shared.entity_base import EntityBase
+from ...shared.filter_base import FilterBase
+from ...shared.interfaces.repository_base import RepositoryBase
+from ..enums import QuotaResource, Role
+from ..exceptions import QuotaExceededException, RateLimitExceededException
+from ..models import User
+
+YearMonth = Tuple[int, int]
+CounterKey = Tuple[QuotaResource, Optional[YearMonth]]
+
+
+class QuotaPolicy:
+    'Limits of a plan. A None limit means unlimited.'
+
+    def __init__(
+        self,
+        limits: Dict[QuotaResource, Optional[int]],
+        requests_per_minute: Optional[float] = None,
+        burst: int = 1,
+    ):
+        self.limits = limits
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst  # Requests allowed at once after an idle period
+
+    def limit(self, resource: QuotaResource) -> Optional[int]:
+        'Get the limit of a resource.'
+        return self.limits.get(resource)
+
+
+UNLIMITED_POLICY = QuotaPolicy({})
+
+DEFAULT_POLICIES: Dict[Role, QuotaPolicy] = {
+    Role.FREE_USER: QuotaPolicy(
+        {
+            QuotaResource.CREDIT_CARDS: 2,
+            QuotaResource.ACTIVE_SUBSCRIPTIONS: 5,
+            QuotaResource.MONTHLY_EXPENSES: 100,
+        },
+        requests_per_minute=60,
+        burst=20,
+    ),
+    Role.PREMIUM_USER: QuotaPolicy(
+        {
+            QuotaResource.CREDIT_CARDS: 20,
+            QuotaResource.ACTIVE_SUBSCRIPTIONS: 100,
+            QuotaResource.MONTHLY_EXPENSES: 5000,
+        },
+        requests_per_minute=600,
+        burst=100,
+    ),
+    Role.ADMIN: UNLIMITED_POLICY,
+    Role.TEST_USER: UNLIMITED_POLICY,
+}
+
+
+class TokenBucket:
+    'Token bucket refilled continuously at a fixed rate up to its capacity.'
+
+    def __init__(self, rate_per_second: float, capacity: int, now: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = now
+
+    def consume(self, now: float, tokens: int = 1) -> float:
+        'Take tokens if available and get 0, or get the seconds to wait until they are.'
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return 0.0
+        return (tokens - self.tokens) / self.rate_per_second
+
+
+class QuotaEnforcer:
+    '''
+    Enforces the plan limits of the users with in-memory counters.
+
+    The counters are updated when entities are saved or deleted (`on_saved`, `on_deleted`), so a
+    quota check is a dictionary lookup instead of a COUNT against the repositories. They are kept
+    honest by periodically calling `reconcile` with the repository counts. Requests are rate
+    limited with a token bucket per user, sized by the role of the user.
+    '''
+
+    def __init__(
+        self,
+        policies: Optional[Dict[Role, QuotaPolicy]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._policies = policies if policies is not None else DEFAULT_POLICIES
+        self._clock = clock
+        self._counters: Dict[UUID, Dict[CounterKey, int]] = {}
+        self._buckets: Dict[Tuple[UUID, Role], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def policy(self, role: Role) -> QuotaPolicy:
+        'Get the policy of a role.'
+        return self._policies.get(role, UNLIMITED_POLICY)
+
+    def usage(self, user_id: UUID, resource: QuotaResource, on: Optional[date] = None) -> int:
+        'Get the counter of a resource, for the month of `on` if the resource is monthly.'
+        return self._counters.get(user_id, {}).get(self.__key(resource, on), 0)
+
+    def remaining(self, user: User, resource: QuotaResource, on: Optional[date] = None) -> Optional[int]:
+        'Get how many more items the user can create, or None if unlimited.'
+        limit = self.policy(user.role).limit(resource)
+        if limit is None:
+            return None
+        return max(limit - self.usage(user.id, resource, on), 0)
+
+    def check(self, user: User, resource: QuotaResource, amount: int = 1, on: Optional[date] = None) -> None:
+        '''
+        Check that the user can create more items of a resource.
+
+        :param user: The user.
+        :param resource: The limited resource.
+        :param amount: How many items are about to be created.
+        :param on: The date of the items, for monthly resources. By default, today.
+        :raises QuotaExceededException: If the plan limit would be exceeded.
+        '''
+        limit = self.policy(user.role).limit(resource)
+        if limit is not None and self.usage(user.id, resource, on) + amount > limit:
+            raise QuotaExceededException(f'The {user.role.value} plan allows up to {limit} {resource.value}.')
+
+    def allow_request(self, user: User) -> None:
+        '''
+        Count a request of the user against their rate limit.
+
+        :raises RateLimitExceededException: If the user has no requests left for now.
+        '''
+        policy = self.policy(user.role)
+        if policy.requests_per_minute is None:
+            return
+        now = self._clock()
+        with self._lock:
+            key = (user.id, user.role)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(policy.requests_per_minute / 60, policy.burst, now)
+            retry_after = bucket.consume(now)
+        if retry_after:
+            raise RateLimitExceededException(f'Too many requests, retry in {retry_after:.1f} seconds.', retry_after)
+
+    def increment(self, user_id: UUID, resource: QuotaResource, amount: int = 1, on: Optional[date] = None) -> None:
+        'Add to the counter of a resource.'
+        key = self.__key(resource, on)
+        with self._lock:
+            counters = self._counters.setdefault(user_id, {})
+            counters[key] = max(counters.get(key, 0) + amount, 0)
+
+    def decrement(self, user_id: UUID, resource: QuotaResource, amount: int = 1, on: Optional[date] = None) -> None:
+        'Subtract from the counter of a resource.'
+        self.increment(user_id, resource, -amount, on)
+
+    def on_saved(self, entity: EntityBase, previous: Optional[EntityBase] = None) -> None:
+        '''
+        Update the counters after an entity is saved.
+
+        :param entity: The saved credit card or expense.
+        :param previous: The stored entity before the save, or None if it was created.
+        '''
+        for user_id, resource, on in self.__counted(previous):
+            self.decrement(user_id, resource, on=on)
+        for user_id, resource, on in self.__counted(entity):
+            self.increment(user_id, resource, on=on)
+
+    def on_deleted(self, entity: EntityBase) -> None:
+        'Update the counters after an entity is deleted.'
+        for user_id, resource, on in self.__counted(entity):
+            self.decrement(user_id, resource, on=on)
+
+    def reconcile(
+        self,
+        user_id: UUID,
+        resource: QuotaResource,
+        repository: RepositoryBase,
+        filter: FilterBase,
+        on: Optional[date] = None,
+    ) -> int:
+        '''
+        Reset a counter from the repository count, to correct any drift.
+
+        :param user_id: The user.
+        :param resource: The counted resource.
+        :param repository: The repository of the counted entities.
+        :param filter: The repository filter that selects the counted entities of the user.
+        :param on: A date of the month, for monthly resources.
+        :return: The difference between the count and the counter before the reset.
+        '''
+        actual = repository.count(filter)
+        key = self.__key(resource, on)
+        with self._lock:
+            counters = self._counters.setdefault(user_id, {})
+            drift = actual - counters.get(key, 0)
+            counters[key] = actual
+        return drift
+
+    def forget(self, user_id: UUID) -> None:
+        'Drop the counters and rate limit buckets of a user, e.g. after deleting it.'
+        with self._lock:
+            self._counters.pop(user_id, None)
+            for key in [key for key in self._buckets if key[0] == user_id]:
+                del self._buckets[key]
+
+    @staticmethod
+    def __key(resource: QuotaResource, on: Optional[date]) -> CounterKey:
+        if resource != QuotaResource.MONTHLY_EXPENSES:
+            return resource, None
+        on = on or date.today()
+        return resource, (on.year, on.month)
+
+    @staticmethod
+    def __counted(entity: Optional[EntityBase]):
+        'Get the counters an entity counts towards, as (user ID, resource, date) tuples.'
+        # Imported here, the user domain must not load the account and expense models at import time
+        from ...account.models.credit_card import CreditCard
+        from ...expense.enums import ExpenseStatus, ExpenseType
+        from ...expense.models.expense import Expense
+
+        if isinstance(entity, CreditCard):
+            return [(entity.owner.id, QuotaResource.CREDIT_CARDS, None)]
+        if isinstance(entity, Expense):
+            user_id = entity.account.owner.id
+            counted = [(user_id, QuotaResource.MONTHLY_EXPENSES, entity.acquired_at)]
+            if entity.expense_type == ExpenseType.SUBSCRIPTION and entity.status == ExpenseStatus.ACTIVE:
+                counted.append((user_id, QuotaResource.ACTIVE_SUBSCRIPTIONS, None))
+            return counted
+        return []
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+from core.account.services import CardFamilyRegistry
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import ConcreteCreditCard
+
+
+@pytest.fixture
+def additional(user, card):
+    return ConcreteCreditCard(user, 'visa extra', Amount(0), main_credit_card_id=card.id)
+
+
+def test_summary_consolidates_the_family(card, additional, factory, purchase):
+    additional.expenses.append(factory.purchase('Extra', Amount(50), date(2024, 1, 6)))
+    registry = CardFamilyRegistry([card, additional])
+
+    summary = registry.get_summary(additional.id)
+
+    assert summary.member_ids == [card.id, additional.id]
+    assert summary.available_limit.value == 950
+    assert summary.available_financing_limit.value == 1700
+
+
+def test_mixed_currencies_raise_or_convert(card, additional, factory, converter):
+    card.expenses.append(factory.purchase('Pesos', Amount(100), date(2024, 1, 5)))
+    additional.expenses.append(factory.purchase('Dollars', Amount(100, currency=Currency.USD), date(2024, 1, 5)))
+    summary = CardFamilyRegistry([card, additional]).get_summary(card.id)
+
+    with pytest.raises(CurrencyMismatchException):
+        summary.available_limit
+    assert summary.available_limit_in(converter, date(2024, 1, 31)).value == -100
+    assert {currency: total.value for currency, total in summary.pending.items()} == {Currency.ARS: 100, Currency.USD: 100}
+
+
+def test_family_without_its_main_card_is_rejected(additional):
+    registry = CardFamilyRegistry([additional])
+
+    with pytest.raises(ValueError):
+        registry.get_summary(additional.id)
+
+
+def test_summary_follows_limits_and_expenses_of_the_members(card, additional, factory):
+    registry = CardFamilyRegistry([card, additional])
+    assert registry.get_summary(card.id).available_limit.value == 1000
+
+    card.limit = Amount(1500)
+    assert registry.get_summary(card.id).available_limit.value == 1500
+    additional.expenses.append(factory.purchase('Extra', Amount(50), date(2024, 1, 6)))
+    assert registry.get_summary(card.id).available_limit.value == 1450
+    additional.expenses.pop()
+    assert registry.get_summary(card.id).available_limit.value == 1500
+
+
+def test_expense_replaced_in_place_needs_an_invalidation(card, factory):
+    card.expenses.append(factory.purchase('Small', Amount(50), date(2024, 1, 6)))
+    registry = CardFamilyRegistry([card])
+    assert registry.get_summary(card.id).available_limit.value == 950
+
+    card.expenses[0] = factory.purchase('Big', Amount(500), date(2024, 1, 6))
+    assert registry.get_summary(card.id).available_limit.value == 950
+    registry.invalidate(card.id)
+    assert registry.get_summary(card.id).available_limit.value == 500
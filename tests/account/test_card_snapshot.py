@@ -0,0 +1,202 @@
+import json
+import os
+import time
+from datetime import date
+from uuid import uuid4
+
+import pytest
+
+from core.account.services import CardSnapshotStore, card_snapshot
+from core.expense.enums import PaymentStatus
+from core.expense.services import ExpenseFactory
+from core.expense.services.payment_ledger import expense_from_state, expense_to_state
+from core.shared.value_objects import Amount
+from tests.conftest import ConcreteCreditCard, ConcretePeriod, amounts, make_period
+
+
+def _empty_copy(card) -> ConcreteCreditCard:
+    'The card as loaded from the repository, without its expenses.'
+    return ConcreteCreditCard(card.owner, card.alias, card.limit, id=card.id)
+
+
+def _fill(card, purchases: int) -> None:
+    factory = ExpenseFactory(card, publish_events=False)
+    card.expenses.extend(factory.purchases(
+        (f'Shop {i % 20}', Amount(1200), date(2024, 1, 5), 12, date(2024, 2, 10)) for i in range(purchases)
+    ))
+    card.expenses.append(factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10)))
+
+
+@pytest.fixture
+def store(tmp_path) -> CardSnapshotStore:
+    return CardSnapshotStore(str(tmp_path))
+
+
+def test_snapshot_round_trip(store, card):
+    _fill(card, 3)
+    store.save(card)
+    loaded = _empty_copy(card)
+
+    assert store.load(loaded)
+    assert [expense.id for expense in loaded.expenses] == [expense.id for expense in card.expenses]
+    for original, copy in zip(card.expenses, loaded.expenses):
+        assert copy.title == original.title and copy.account is loaded
+        assert amounts(copy.payments) == amounts(original.payments)
+
+
+def test_snapshot_keeps_a_subscription_without_payments(store, card):
+    subscription = ExpenseFactory(card, publish_events=False).subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    subscription.payments = []
+    card.expenses.append(subscription)
+    store.save(card)
+    loaded = _empty_copy(card)
+
+    assert store.load(loaded)
+    assert loaded.expenses[0].payments == []
+
+
+def test_payment_changes_mark_the_snapshot_stale_without_touching_the_file(store, card):
+    _fill(card, 3)
+    store.save(card)
+    store.subscribe()
+
+    card.expenses[0].payments[0].status = PaymentStatus.PAID
+
+    assert os.path.exists(store.path(card.id))
+    assert card.id not in store
+    assert not store.load(_empty_copy(card))
+    assert not os.path.exists(store.path(card.id))
+    store.save(card)
+    assert card.id in store and store.load(_empty_copy(card))
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:len(data) // 2],
+    lambda data: data[:64] + bytes([0xFF]) * (len(data) - 64),
+])
+def test_corrupt_snapshot_is_discarded(store, card, corrupt):
+    _fill(card, 3)
+    store.save(card)
+    path = store.path(card.id)
+    with open(path, 'rb') as file:
+        data = file.read()
+    with open(path, 'wb') as file:
+        file.write(corrupt(data))
+
+    assert not store.load(_empty_copy(card))
+    assert not os.path.exists(path)
+
+
+def _versions(card) -> dict:
+    'The stored versions of the expenses and payments of a card, as the repository reports them.'
+    versions = {}
+    for expense in card.expenses:
+        versions[expense.id] = expense.version
+        versions.update((payment.id, payment.version) for payment in expense.payments)
+    return versions
+
+
+def test_snapshot_loads_when_the_stored_versions_match(store, card):
+    _fill(card, 3)
+    store.save(card)
+
+    assert store.load(_empty_copy(card), versions=_versions(card))
+
+
+@pytest.mark.parametrize('change', [
+    lambda card, versions: versions.update({card.expenses[0].id: card.expenses[0].version + 1}),
+    lambda card, versions: versions.update({card.expenses[1].payments[2].id: card.expenses[1].payments[2].version + 1}),
+    lambda card, versions: versions.pop(card.expenses[2].id),
+    lambda card, versions: versions.update({uuid4(): 1}),
+])
+def test_snapshot_with_outdated_versions_falls_back_to_a_cold_load(store, card, change):
+    _fill(card, 3)
+    store.save(card)
+    versions = _versions(card)
+    change(card, versions)
+    loaded = _empty_copy(card)
+
+    assert not store.load(loaded, versions=versions)
+    assert loaded.expenses == []
+    assert not os.path.exists(store.path(card.id))
+
+
+def test_snapshot_restores_the_payments_of_the_periods(tmp_path, card):
+    store = CardSnapshotStore(str(tmp_path), period_type=ConcretePeriod)
+    _fill(card, 2)
+    card.periods = [make_period(2024, 2, [expense.payments[0] for expense in card.expenses[:2]])]
+    store.save(card)
+    loaded = _empty_copy(card)
+
+    assert store.load(loaded)
+    assert [payment.id for payment in loaded.periods[0].payments] == [payment.id for payment in card.periods[0].payments]
+
+
+def test_save_rejects_a_period_payment_of_an_expense_outside_the_card(tmp_path, card):
+    store = CardSnapshotStore(str(tmp_path), period_type=ConcretePeriod)
+    _fill(card, 1)
+    other = ConcreteCreditCard(card.owner, 'Other', card.limit)
+    _fill(other, 1)
+    card.periods = [make_period(2024, 2, [card.expenses[0].payments[0], other.expenses[0].payments[0]])]
+
+    with pytest.raises(ValueError):
+        store.save(card)
+    assert not os.path.exists(store.path(card.id))
+
+
+def _best_of(runs: int, function) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        started_at = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+def test_warm_load_reads_one_compact_file(store, card, monkeypatch):
+    _fill(card, 30)
+    rows_bytes = sum(len(json.dumps(expense_to_state(expense))) for expense in card.expenses)
+    snapshot_bytes = store.save(card)
+    opened = []
+    monkeypatch.setattr(card_snapshot, 'open', lambda path, *args: opened.append(path) or open(path, *args), raising=False)
+
+    assert store.load(_empty_copy(card))
+    assert opened == [store.path(card.id)]
+    assert snapshot_bytes * 2 < rows_bytes
+
+
+@pytest.mark.benchmark
+def test_warm_load_is_faster_than_cold_load(store, card):
+    'Benchmark: a card of 300 purchases in 12 installments, from repository rows and from its snapshot.'
+    _fill(card, 300)
+    # The repository rows, as the JSON states of the expenses
+    rows = [json.dumps(expense_to_state(expense)) for expense in card.expenses]
+    snapshot_bytes = store.save(card)
+
+    def cold():
+        loaded = _empty_copy(card)
+        loaded.expenses[:] = [expense_from_state(json.loads(row), loaded) for row in rows]
+
+    def warm():
+        assert store.load(_empty_copy(card))
+
+    cold_seconds = _best_of(3, cold)
+    warm_seconds = _best_of(3, warm)
+
+    assert warm_seconds < cold_seconds, (
+        f'cold {cold_seconds * 1000:.1f}ms, warm {warm_seconds * 1000:.1f}ms, snapshot {snapshot_bytes} bytes'
+    )
+
+
+def test_payment_changes_cost_no_file_operations(store, card, monkeypatch):
+    _fill(card, 10)
+    store.save(card)
+    store.subscribe()
+    removed = []
+    monkeypatch.setattr(os, 'remove', removed.append)
+
+    for expense in card.expenses[:-1]:
+        for payment in expense.payments:
+            payment.status = PaymentStatus.PAID
+
+    assert removed == []
@@ -0,0 +1,26 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+
+
+def test_settled_purchase_in_another_currency_does_not_block_the_available_limit(card, factory):
+    travel = factory.purchase('Travel', Amount(50, currency=Currency.USD), date(2024, 1, 5))
+    shop = factory.purchase('Shop', Amount(200), date(2024, 1, 6))
+    card.expenses.extend([travel, shop])
+    travel.payments[0].status = PaymentStatus.PAID
+
+    assert card.pending_by_currency()[Currency.USD].value == 0
+    assert card.available_limit.value == 800
+    assert card.available_financing_limit.value == 2000
+
+
+def test_pending_amount_in_another_currency_needs_a_converter(card, factory, converter):
+    card.expenses.append(factory.purchase('Travel', Amount(50, currency=Currency.USD), date(2024, 1, 5)))
+
+    with pytest.raises(CurrencyMismatchException):
+        card.available_limit
+    assert card.available_limit_in(converter, date(2024, 1, 5)).value == 500
@@ -0,0 +1,83 @@
+import threading
+from datetime import date
+
+import pytest
+
+from core.account.services import DashboardSummaryStore
+from core.expense.enums import PaymentStatus
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import make_period
+
+
+def _totals(store, card, year: int, month: int):
+    summary = store.get(card.id)
+    return {currency: summary.month(year, month, currency).total.value for currency in Currency}
+
+
+def test_incremental_updates_match_a_rebuild(card, purchase):
+    store = DashboardSummaryStore()
+    store.rebuild([card])
+    store.subscribe()
+
+    purchase.payments[0].status = PaymentStatus.PAID
+    purchase.payments[1].payment_date = purchase.payments[2].payment_date
+    rebuilt = DashboardSummaryStore()
+    rebuilt.rebuild([card])
+
+    for month in (2, 3, 4):
+        assert _totals(store, card, 2024, month) == _totals(rebuilt, card, 2024, month)
+    assert store.get(card.id).available_financing_limit.value == rebuilt.get(card.id).available_financing_limit.value
+
+
+def test_payment_amount_in_another_currency_is_rejected(card, purchase):
+    store = DashboardSummaryStore()
+    store.rebuild([card])
+    store.subscribe()
+
+    with pytest.raises(CurrencyMismatchException):
+        purchase.payments[0].amount = Amount(100, currency=Currency.USD)
+
+    totals = _totals(store, card, 2024, 2)
+    assert totals[Currency.ARS] == 100
+    assert totals[Currency.USD] == 0
+
+
+def test_last_installments_follow_the_highest_pending_installment(card, purchase):
+    store = DashboardSummaryStore()
+    store.rebuild([card])
+    store.subscribe()
+    periods = {month: make_period(2024, month, [purchase.payments[month - 2]]) for month in (2, 3, 4)}
+
+    purchase.payments[2].status = PaymentStatus.PAID
+
+    for month, period in periods.items():
+        assert store.get(card.id).month(2024, month).last_installments.value == period.total_last_payments.value
+    assert store.get(card.id).month(2024, 3).last_installments.value == 100
+    assert store.get(card.id).month(2024, 4).last_installments.value == 0
+
+
+def test_events_from_several_threads_match_a_rebuild(card, factory):
+    purchases = [factory.purchase(f'Shop {i}', Amount(1200), date(2024, 1, 5), 12, date(2024, 2, 10)) for i in range(4)]
+    card.expenses.extend(purchases)
+    store = DashboardSummaryStore()
+    store.rebuild([card])
+    store.subscribe()
+
+    def pay(purchase):
+        for _ in range(20):
+            for payment in purchase.payments:
+                payment.status = PaymentStatus.PAID if payment.status == PaymentStatus.UNCONFIRMED else PaymentStatus.UNCONFIRMED
+
+    threads = [threading.Thread(target=pay, args=(purchase,)) for purchase in purchases]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    rebuilt = DashboardSummaryStore()
+    rebuilt.rebuild([card])
+
+    for month in range(2, 14):
+        year, month = 2024 + (month - 1) // 12, (month - 1) % 12 + 1
+        assert _totals(store, card, year, month) == _totals(rebuilt, card, year, month)
+    assert store.get(card.id).available_financing_limit.value == rebuilt.get(card.id).available_financing_limit.value
@@ -0,0 +1,58 @@
+from datetime import date
+from uuid import uuid4
+
+from core.account.enums import ReminderKind
+from core.account.services.due_date_scheduler import DueDateScheduler
+from core.expense.enums import PaymentStatus
+from core.expense.models import PaymentDateIndex
+
+
+def test_reminders_pop_in_date_order():
+    scheduler = DueDateScheduler()
+    first, second, third = uuid4(), uuid4(), uuid4()
+    scheduler.schedule(ReminderKind.PAYMENT_DUE, second, date(2024, 3, 10))
+    scheduler.schedule(ReminderKind.CARD_CLOSING, third, date(2024, 4, 1))
+    scheduler.schedule(ReminderKind.PAYMENT_DUE, first, date(2024, 3, 1))
+
+    assert scheduler.peek_due_date() == date(2024, 3, 1)
+    assert [reminder.subject_id for reminder in scheduler.pop_due_until(date(2024, 3, 31))] == [first, second]
+    assert len(scheduler) == 1 and (ReminderKind.CARD_CLOSING, third) in scheduler
+
+
+def test_rescheduled_and_cancelled_reminders_are_dropped_from_the_heap():
+    scheduler = DueDateScheduler()
+    ids = [uuid4() for _ in range(100)]
+    for day, subject_id in enumerate(ids, start=1):
+        scheduler.schedule(ReminderKind.PAYMENT_DUE, subject_id, date.fromordinal(date(2024, 1, 1).toordinal() + day))
+    for subject_id in ids[:90]:
+        scheduler.cancel(ReminderKind.PAYMENT_DUE, subject_id)
+    scheduler.reschedule(ReminderKind.PAYMENT_DUE, ids[-1], date(2024, 1, 1))
+
+    due = scheduler.pop_due_until(date(2025, 1, 1))
+
+    assert [reminder.subject_id for reminder in due] == [ids[-1], *ids[90:-1]]
+    assert len(scheduler) == 0 and scheduler.peek_due_date() is None
+
+
+def test_subscribed_scheduler_follows_the_payments(purchase):
+    scheduler = DueDateScheduler()
+    scheduler.schedule_payments_between(PaymentDateIndex(purchase.payments), date(2024, 1, 1), date(2024, 12, 31))
+    scheduler.subscribe()
+    first, second, _ = purchase.payments
+
+    first.status = PaymentStatus.PAID
+    second.payment_date = date(2024, 2, 20)
+
+    assert (ReminderKind.PAYMENT_DUE, first.id) not in scheduler
+    assert [reminder.subject for reminder in scheduler.pop_due_until(date(2024, 2, 29))] == [second]
+
+
+def test_card_dates_are_scheduled(card):
+    card.next_closing_date = date(2024, 2, 25)
+    scheduler = DueDateScheduler()
+
+    scheduler.schedule_card(card)
+
+    assert [(reminder.kind, reminder.subject) for reminder in scheduler.pop_due_until(date(2024, 2, 28))] == [
+        (ReminderKind.CARD_CLOSING, card)
+    ]
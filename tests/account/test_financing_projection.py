@@ -0,0 +1,45 @@
+from datetime import date
+
+import pytest
+
+from core.account.services.financing_projection import project_financing
+from core.expense.enums import PaymentStatus
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+
+
+@pytest.fixture
+def second_purchase(card, factory):
+    'A purchase of 100 in 2 installments from March 2024, added to the card.'
+    purchase = factory.purchase('Store', Amount(100), date(2024, 2, 1), 2, date(2024, 3, 20))
+    card.expenses.append(purchase)
+    return purchase
+
+
+def test_installments_are_projected_month_by_month(card, purchase, second_purchase):
+    projection = project_financing(card)
+
+    assert projection.financed_balance.value == 400
+    assert [(month.month, month.freed_limit.value, month.remaining_balance.value) for month in projection.months] == [
+        (2, 100, 300), (3, 150, 150), (4, 150, 0),
+    ]
+    assert projection.month(2024, 3).available_financing_limit.value == 1850
+    assert [plan_end.purchase for plan_end in projection.plan_ends] == [purchase, second_purchase]
+    assert projection.payoff_date == date(2024, 4, 20)
+    assert projection.remaining_balance_after(2024, 3).value == 150
+
+
+def test_paid_installments_and_earlier_months_are_folded(card, purchase, second_purchase):
+    purchase.payments[0].status = PaymentStatus.PAID
+
+    projection = project_financing(card, since=date(2024, 4, 1))
+
+    assert projection.financed_balance.value == 300
+    assert [(month.month, month.installments) for month in projection.months] == [(4, 4)]
+
+
+def test_installments_in_another_currency_are_rejected(card, factory):
+    card.expenses.append(factory.purchase('Travel', Amount(300, currency=Currency.USD), date(2024, 1, 5), 3))
+
+    with pytest.raises(CurrencyMismatchException):
+        project_financing(card)
@@ -0,0 +1,60 @@
+from datetime import date
+
+from core.account.services.nightly_batch import NightlyRepositories, _run_shard
+from core.shared.value_objects import Amount
+from tests.conftest import ConcreteCreditCard, make_period, paginate
+
+
+class FakeCreditCards:
+    def __init__(self, cards):
+        self.cards = cards
+
+    def get_by_owner_id(self, owner_id, filters=None, page=1, page_size=None):
+        cards = [card for card in self.cards if str(card.owner.id) == owner_id]
+        return paginate(cards, page, page_size or 1)
+
+
+class FakeExpenses:
+    def __init__(self, expenses):
+        self.expenses = expenses
+        self.requested = set()
+
+    def get_by_account_ids(self, account_ids, page, page_size, filter=None):
+        self.requested.update(account_ids)
+        expenses = [expense for expense in self.expenses if expense.account.id in account_ids]
+        return paginate(expenses, page, page_size)
+
+    def save_many(self, expenses):
+        return expenses
+
+
+class FakePeriods:
+    def save_many(self, periods):
+        return periods
+
+
+def test_shard_reads_every_page_of_cards(user):
+    cards = [ConcreteCreditCard(user, f'card {i}', Amount(1000)) for i in range(5)]
+    purchases = FakeExpenses([])
+    subscriptions = FakeExpenses([])
+    repositories = NightlyRepositories(FakeCreditCards(cards), purchases, subscriptions, FakePeriods())
+
+    report = _run_shard((0, lambda: repositories, [user.id], date(2024, 6, 1), 2))
+
+    assert report.users == 1
+    assert purchases.requested == subscriptions.requested == {card.id for card in cards}
+
+
+def test_shard_refreshes_the_periods_of_each_card_with_its_own_payments(user, card, purchase):
+    other_card = ConcreteCreditCard(user, 'master', Amount(1000))
+    card.periods = [make_period(2024, 2)]
+    other_card.periods = [make_period(2024, 2)]
+    repositories = NightlyRepositories(
+        FakeCreditCards([card, other_card]), FakeExpenses([purchase]), FakeExpenses([]), FakePeriods()
+    )
+
+    report = _run_shard((0, lambda: repositories, [user.id], date(2024, 6, 1), 10))
+
+    assert report.periods_refreshed == 1
+    assert card.periods[0].payments == [purchase.payments[0]]
+    assert other_card.periods[0].payments == []
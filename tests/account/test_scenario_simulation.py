@@ -0,0 +1,83 @@
+from datetime import date
+
+import pytest
+
+from core.account.services import Scenario, ScenarioBaseline, simulate, simulate_many
+from core.expense.enums import PaymentStatus
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import make_period
+
+
+def test_add_purchase_changes_limits_and_months(card, purchase):
+    card.periods = [make_period(2024, month, [purchase.payments[month - 2]]) for month in (2, 3, 4)]
+
+    result = simulate(card, Scenario('new tv').add_purchase('TV', Amount(600), date(2024, 2, 1), 3, date(2024, 3, 10)))
+
+    assert result.available_financing_limit.value == 1100
+    assert result.financing_limit_delta.value == -600
+    assert {key: totals[Currency.ARS].value for key, totals in result.period_totals.items()} == {
+        (2024, 2): 100, (2024, 3): 300, (2024, 4): 300, (2024, 5): 200,
+    }
+    assert card.available_financing_limit.value == 1700
+
+
+def test_mixed_currencies_raise_or_convert(card, purchase, converter):
+    result = simulate(card, Scenario('trip').add_purchase('Hotel', Amount(50, currency=Currency.USD), date(2024, 2, 1), 2))
+
+    with pytest.raises(CurrencyMismatchException):
+        result.available_financing_limit
+    assert result.available_financing_limit_in(converter, date(2024, 2, 1)).value == 1200
+
+
+def test_cancel_expense_only_changes_loaded_periods(card, purchase):
+    assert simulate(card, Scenario('cancel').cancel_expense(purchase.id)).period_totals == {}
+
+    card.periods = [make_period(2024, 2, [purchase.payments[0]])]
+    result = simulate(card, Scenario('cancel').cancel_expense(purchase.id))
+
+    assert {key: totals[Currency.ARS].value for key, totals in result.period_totals.items()} == {(2024, 2): 0}
+
+
+def test_canceled_payments_are_counted_like_the_period_total(card, purchase):
+    purchase.payments[0].status = PaymentStatus.CANCELED
+    period = make_period(2024, 2, [purchase.payments[0]])
+    card.periods = [period]
+
+    result = simulate(card, Scenario('cancel').cancel_expense(purchase.id))
+
+    assert period.total_amount.value == 100
+    assert result.period_totals[(2024, 2)][Currency.ARS].value == 0
+
+
+def test_scale_subscriptions_keeps_the_confirmed_payments(card, factory):
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    subscription.add_new_payment(subscription.get_next_payment())
+    card.expenses.append(subscription)
+    subscription.payments[0].status = PaymentStatus.CONFIRMED
+    card.periods = [make_period(2024, month, [subscription.payments[month - 1]]) for month in (1, 2)]
+
+    result = simulate(card, Scenario('rise').scale_subscriptions(1.5))
+
+    assert {key: totals[Currency.ARS].value for key, totals in result.period_totals.items()} == {(2024, 1): 10, (2024, 2): 15}
+    assert result.pending_delta[Currency.ARS].value == 0  # The pending amount of a subscription is its confirmed payments
+    assert [payment.amount.value for payment in subscription.payments] == [10, 10]
+
+
+def test_simulate_many_matches_simulate_with_a_shared_baseline(card, purchase):
+    card.periods = [make_period(2024, month, [purchase.payments[month - 2]]) for month in (2, 3, 4)]
+    scenarios = [
+        Scenario('tv').add_purchase('TV', Amount(600), date(2024, 2, 1), 3, date(2024, 3, 10)),
+        Scenario('cancel').cancel_expense(purchase.id),
+    ]
+    baseline = ScenarioBaseline(card)
+
+    results = simulate_many(card, scenarios, max_workers=2)
+
+    assert [result.name for result in results] == ['tv', 'cancel']
+    for result, scenario in zip(results, scenarios):
+        expected = simulate(card, scenario, baseline)
+        assert result.available_financing_limit.value == expected.available_financing_limit.value
+        assert {key: totals[Currency.ARS].value for key, totals in result.period_totals.items()} == {
+            key: totals[Currency.ARS].value for key, totals in expected.period_totals.items()
+        }
@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+
+from core.account.models import CreditCard
+from core.expense.services import ExpenseFactory
+from core.period.models.period import Period
+from core.shared.currency_rates import CurrencyConverter, RateTable
+from core.shared.paginated_result import PaginatedResult
+from core.shared.events import dispatcher
+from core.shared.value_objects import Amount, Currency, Month, Year
+from core.user import User
+
+
+class ConcreteCreditCard(CreditCard):
+    'Credit card with the abstract members of the account filled in.'
+
+    balance = None
+
+
+class ConcretePeriod(Period):
+    'Period with the abstract members of the entity filled in.'
+
+    from_dict = None
+
+
+def make_period(year: int, month: int, payments=None) -> ConcretePeriod:
+    return ConcretePeriod(Month(month), Year(year), payments)
+
+
+def paginate(items, page: int, page_size: int) -> PaginatedResult:
+    'Get a page of items the way the repositories return them.'
+    start = (page - 1) * page_size
+    return PaginatedResult(items[start:start + page_size], len(items), -(-len(items) // page_size), page, page_size)
+
+
+def amounts(payments):
+    'Get the value and currency of the amount of each payment, since Amount does not compare by value.'
+    return [(payment.amount.value, payment.amount.currency) for payment in payments]
+
+
+@pytest.fixture
+def user() -> User:
+    return User('user', 'user@example.com', 'secret')
+
+
+@pytest.fixture
+def card(user) -> ConcreteCreditCard:
+    return ConcreteCreditCard(user, 'visa', Amount(1000), financing_limit=Amount(2000))
+
+
+@pytest.fixture
+def factory(card) -> ExpenseFactory:
+    return ExpenseFactory(card)
+
+
+@pytest.fixture
+def purchase(card, factory):
+    'A purchase of 300 in 3 installments from February 2024, added to the card.'
+    purchase = factory.purchase('Shop', Amount(300), date(2024, 1, 5), 3, date(2024, 2, 10))
+    card.expenses.append(purchase)
+    return purchase
+
+
+@pytest.fixture
+def converter() -> CurrencyConverter:
+    'A converter where one dollar is worth ten pesos.'
+    rates = RateTable(Currency.ARS)
+    rates.add_rate(Currency.USD, date(2000, 1, 1), 10)
+    return CurrencyConverter(rates)
+
+
+@pytest.fixture(autouse=True)
+def clean_dispatcher():
+    'Drop the handlers a test left subscribed to the global dispatcher.'
+    handlers = {event_type: list(event_handlers) for event_type, event_handlers in dispatcher._handlers.items()}
+    yield
+    dispatcher._handlers.clear()
+    dispatcher._handlers.update(handlers)
+    dispatcher._resolved.clear()
@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import AnomalyKind, PaymentStatus
+from core.expense.models import Payment
+from core.expense.services import AnomalyDetector
+from core.shared.value_objects import Amount
+
+
+@pytest.fixture
+def detector():
+    detector = AnomalyDetector()
+    detector.subscribe()
+    return detector
+
+
+def test_price_jump_is_flagged(factory, detector):
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    for price in (10, 10, 15):
+        subscription.add_new_payment(subscription.get_next_payment(Amount(price / 10)))
+
+    assert [(anomaly.kind, round(anomaly.ratio, 2)) for anomaly in detector.anomalies] == [(AnomalyKind.PRICE_JUMP, 1.5)]
+
+
+def test_updated_subscription_payment_counts_once(factory, detector):
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    subscription.add_new_payment(subscription.get_next_payment())
+    payment = subscription.payments[-1]
+
+    for _ in range(3):
+        subscription.update_payment(payment.id, payment)
+
+    stats = detector._stats[subscription.id]
+    assert (len(stats), stats.mean) == (2, 1000)
+    assert list(detector.anomalies) == []
+
+
+def test_duplicate_charge_is_reported_once(factory, detector):
+    first = factory.purchase('Shop', Amount(300), date(2024, 3, 1), 3)
+    second = factory.purchase('Shop', Amount(300), date(2024, 3, 2), 3)
+    payment = second.payments[0]
+
+    for amount in (100, 100.5, 100):
+        second.update_payments([Payment(second, Amount(amount), 1, PaymentStatus.UNCONFIRMED, payment.payment_date, payment.id)])
+
+    assert [(anomaly.payment, anomaly.related) for anomaly in detector.anomalies] == [(payment, first.payments[0])]
+
+
+def test_anomalies_are_capped_and_drained(factory):
+    detector = AnomalyDetector(max_anomalies=2)
+    detector.subscribe()
+    for day in range(1, 6):
+        factory.purchase('Shop', Amount(100), date(2024, 3, day))
+
+    assert len(detector.anomalies) == 2
+    assert len(detector.drain()) == 2
+    assert list(detector.anomalies) == []
@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.models import ExpenseCategory
+from core.expense.services import CategoryRollupStore, ExpenseFactory
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from core.user import User
+from tests.conftest import ConcreteCreditCard, paginate
+
+
+@pytest.fixture
+def food(user):
+    return ExpenseCategory(user, 'Food')
+
+
+@pytest.fixture
+def store():
+    store = CategoryRollupStore()
+    store.subscribe()
+    return store
+
+
+def test_rollups_follow_payment_events(user, card, food, store):
+    factory = ExpenseFactory(card, food)
+    purchase = factory.purchase('Market', Amount(300), date(2024, 3, 1), 3, date(2024, 3, 10))
+
+    assert store.get(user.id, food.id, 2024, 3).total.value == 100
+    purchase.payments[0].status = PaymentStatus.CANCELED
+    assert store.get(user.id, food.id, 2024, 3).count == 0
+    assert [year_month for year_month, _ in store.trend(user.id, food.id)] == [(2024, 4), (2024, 5)]
+
+
+def test_mixed_currencies_raise_or_convert(user, card, food, store, converter):
+    factory = ExpenseFactory(card, food)
+    factory.purchase('Market', Amount(100), date(2024, 3, 1))
+    factory.purchase('Duty free', Amount(10, currency=Currency.USD), date(2024, 3, 2))
+    rollup = store.get(user.id, food.id, 2024, 3)
+
+    with pytest.raises(CurrencyMismatchException):
+        rollup.total
+    with pytest.raises(CurrencyMismatchException):
+        store.month_split(user.id, 2024, 3)
+    assert {currency: total.value for currency, total in rollup.totals.items()} == {Currency.ARS: 100, Currency.USD: 10}
+    assert rollup.total_in(converter, Currency.ARS, date(2024, 3, 31)).value == 200
+    income, expenses = store.month_split_in(user.id, 2024, 3, converter, Currency.ARS)
+    assert (income.value, expenses.value) == (0, 200)
+
+
+class ExpensesByAccount:
+    'In-memory stand-in for the expense repository.'
+
+    def __init__(self, expenses):
+        self._expenses = expenses
+
+    def get_by_account_ids(self, account_ids, page, page_size, filter=None):
+        return paginate([expense for expense in self._expenses if expense.account.id in account_ids], page, page_size)
+
+
+def test_rebuild_keeps_the_rollups_of_other_owners(card, food):
+    other_user = User('other', 'other@example.com', 'secret')
+    other_card = ConcreteCreditCard(other_user, 'visa', Amount(1000))
+    store = CategoryRollupStore()
+    mine = [ExpenseFactory(card, food).purchase(f'Market {i}', Amount(100), date(2024, 3, 1)) for i in range(3)]
+    theirs = ExpenseFactory(other_card, food).purchase('Market', Amount(50), date(2024, 3, 1))
+    store.rebuild_from_expenses([*mine, theirs])
+
+    store.rebuild(ExpensesByAccount(mine), [card.id], page_size=2)
+
+    assert store.get(card.owner.id, food.id, 2024, 3).total.value == 300
+    assert store.get(other_user.id, food.id, 2024, 3).total.value == 50
+    store.rebuild_from_expenses([], owner_ids=[other_user.id])
+    assert store.month_breakdown(other_user.id, 2024, 3) == {}
+
+
+def test_category_ids_are_resolved_for_the_income_flag(user, card):
+    salary = ExpenseCategory(user, 'Salary', is_income=True)
+    store = CategoryRollupStore([salary])
+    refund = ExpenseFactory(card).purchase('Refund', Amount(80), date(2024, 3, 1))
+    refund.category_id = salary.id
+
+    store.rebuild_from_expenses([refund])
+
+    assert store.get(user.id, salary.id, 2024, 3).is_income
+    income, expenses = store.month_split(user.id, 2024, 3)
+    assert (income.value, expenses.value) == (80, 0)
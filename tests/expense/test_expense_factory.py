@@ -0,0 +1,65 @@
+import gc
+import tracemalloc
+from datetime import date
+
+from core.expense.models import Purchase
+from core.expense.services import ExpenseFactory
+from core.shared.value_objects import Amount
+
+
+def _rows(count: int):
+    'Statement rows whose repeated titles are equal but distinct strings, as parsed from a file.'
+    return [(''.join(['Market ', str(i % 10)]), Amount(1200), date(2024, 1, 5), 12, date(2024, 2, 10)) for i in range(count)]
+
+
+def _traced(build) -> int:
+    'Get the memory still allocated by what a function builds and keeps.'
+    gc.collect()
+    tracemalloc.start()
+    try:
+        kept = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size
+
+
+def test_default_constructed_purchases_get_their_own_payments(card):
+    first = Purchase(card, 'Shop', 'Shop', date(2024, 1, 5), Amount(300), 3)
+    second = Purchase(card, 'Shop', 'Shop', date(2024, 1, 5), Amount(300), 3)
+
+    assert first.payments is not second.payments
+    assert len(first.payments) == len(second.payments) == 3
+
+
+def test_expenses_of_a_factory_share_repeated_values(factory):
+    first, second = factory.purchases(_rows(11)[::10])
+
+    assert first.title is second.title and first.cc_name is second.cc_name
+    assert all(a.payment_date is b.payment_date for a, b in zip(first.payments, second.payments))
+
+
+def test_memory_stays_flat_while_building_default_purchases(card):
+    'Benchmark: the memory left after each round of default purchases does not grow.'
+    def round():
+        for _ in range(1000):
+            Purchase(card, 'Shop', 'Shop', date(2024, 1, 5), Amount(300), 3)
+
+    sizes = [_traced(round) for _ in range(5)]
+
+    assert max(sizes) - min(sizes) < 64 * 1024, sizes
+
+
+def test_factory_uses_less_memory_than_plain_construction(card):
+    'Benchmark: 500 purchases of 12 installments, built directly and through a factory.'
+    rows = _rows(500)
+
+    plain = _traced(lambda: [
+        Purchase(card, title, title, acquired_at, amount, installments, first_payment_date)
+        for title, amount, acquired_at, installments, first_payment_date in rows
+    ])
+    pooled = _traced(lambda: ExpenseFactory(card).purchases(rows))
+
+    assert pooled < plain * 0.85, f'plain {plain / 1024:.0f} KiB, factory {pooled / 1024:.0f} KiB'
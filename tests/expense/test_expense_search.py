@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+from core.expense.services import ExpenseFactory
+from core.expense.services.expense_search import ExpenseSearchIndex, tokenize
+from core.shared.value_objects import Amount
+from tests.conftest import ConcreteCreditCard
+
+
+@pytest.fixture
+def expenses(factory):
+    return [
+        factory.purchase('Café Martínez', Amount(10), date(2024, 1, 5)),
+        factory.purchase('Supermercado Día', Amount(50), date(2024, 1, 6)),
+        factory.subscription('Netflix', Amount(15), date(2024, 1, 7)),
+    ]
+
+
+@pytest.fixture
+def index(expenses) -> ExpenseSearchIndex:
+    index = ExpenseSearchIndex()
+    index.add_many(expenses)
+    return index
+
+
+def test_tokenize_folds_accents_and_drops_installments():
+    assert tokenize('Café  Martínez Cuota 2/6') == ['cafe', 'martinez']
+
+
+def test_exact_prefix_and_fuzzy_matches(index, expenses):
+    cafe, supermarket, netflix = expenses
+
+    assert index.search('cafe martinez') == [cafe.id]
+    assert index.search_prefix('super') == [supermarket.id]
+    assert index.search('netflx') == [netflix.id]
+    assert index.search('netflx', fuzzy=False) == []
+    assert index.search('cafe netflix') == []
+
+
+def test_search_filters_by_account(index, expenses, user):
+    other_card = ConcreteCreditCard(user, 'master', Amount(1000))
+    other = ExpenseFactory(other_card).purchase('Café Tortoni', Amount(20), date(2024, 1, 8))
+    index.add(other)
+
+    assert set(index.search('cafe')) == {expenses[0].id, other.id}
+    assert index.search('cafe', account_ids=[other_card.id]) == [other.id]
+
+
+def test_renames_and_removals_are_reindexed(index, expenses):
+    index.subscribe()
+    cafe = expenses[0]
+
+    cafe.title = 'Havanna'
+
+    assert index.search('havanna') == [cafe.id]
+    index.remove(cafe.id)
+    assert index.search('havanna') == [] and cafe.id not in index
+
+
+def test_saved_index_loads_back(index, expenses, tmp_path):
+    path = str(tmp_path / 'index.json')
+    index.save(path)
+    loaded = ExpenseSearchIndex()
+
+    loaded.load(path)
+
+    assert len(loaded) == len(expenses)
+    assert loaded.search('supermercado dia') == [expenses[1].id]
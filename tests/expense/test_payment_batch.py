@@ -0,0 +1,144 @@
+import gc
+import time
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.models import Payment
+from core.expense.services import ExpenseFactory, PaymentBatchProcessor, StatementEntry
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import ConcreteCreditCard, amounts, make_period
+
+
+def periods_of(*expenses, months=3):
+    return [make_period(2024, month + 2, [expense.payments[month] for expense in expenses]) for month in range(months)]
+
+
+def test_apply_updates_payments_and_period_totals(card, factory, purchase):
+    other = factory.purchase('Other', Amount(600), date(2024, 1, 5), 3, date(2024, 2, 10))
+    periods = periods_of(purchase, other)
+    processor = PaymentBatchProcessor([purchase, other], periods)
+    unknown = Payment(purchase, Amount(1), 1, PaymentStatus.UNCONFIRMED, date(2024, 2, 10))
+
+    summary = processor.apply([
+        StatementEntry(purchase.payments[0].id, Amount(150)),
+        StatementEntry(other.payments[0].id, Amount(200), PaymentStatus.PAID),
+        StatementEntry(unknown.id, Amount(1)),
+    ])
+
+    assert summary.updated_payments == 2
+    assert summary.updated_expense_ids == [purchase.id, other.id]
+    assert summary.missing_payment_ids == [unknown.id]
+    assert amounts(purchase.payments) == [(150, Currency.ARS), (75, Currency.ARS), (75, Currency.ARS)]
+    assert other.payments[0].status == PaymentStatus.PAID
+    for period in periods:
+        assert summary.period_totals[period.id][Currency.ARS].value == period.total_amount.value
+    assert [summary.period_totals[period.id][Currency.ARS].value for period in periods] == [350, 275, 275]
+
+
+def test_apply_totals_mixed_currency_periods(card, factory, purchase):
+    dollars = factory.purchase('Dollars', Amount(30, currency=Currency.USD), date(2024, 1, 5), 3, date(2024, 2, 10))
+    periods = periods_of(purchase, dollars)
+    processor = PaymentBatchProcessor([purchase, dollars], periods)
+
+    summary = processor.apply([StatementEntry(dollars.payments[0].id, Amount(12, currency=Currency.USD))])
+
+    totals = summary.period_totals[periods[0].id]
+    assert (totals[Currency.ARS].value, totals[Currency.USD].value) == (100, 12)
+    assert summary.period_totals[periods[1].id][Currency.USD].value == 9
+
+
+def test_apply_rejects_foreign_currency_before_changing_anything(card, factory, purchase):
+    dollars = factory.purchase('Dollars', Amount(30, currency=Currency.USD), date(2024, 1, 5), 3, date(2024, 2, 10))
+    processor = PaymentBatchProcessor([purchase, dollars], periods_of(purchase, dollars))
+
+    with pytest.raises(CurrencyMismatchException):
+        processor.apply([
+            StatementEntry(purchase.payments[0].id, Amount(150)),
+            StatementEntry(dollars.payments[0].id, Amount(12)),
+        ])
+
+    assert amounts(purchase.payments) == [(100, Currency.ARS)] * 3
+    assert purchase.payments[0].status == PaymentStatus.UNCONFIRMED
+
+
+def build_statement(user, expenses=400, installments=12):
+    card = ConcreteCreditCard(user, 'visa', Amount(10 ** 9))
+    factory = ExpenseFactory(card, publish_events=False)
+    purchases = [
+        factory.purchase(f'Purchase {i}', Amount(1200 + i), date(2024, 1, 5), installments, date(2024, 1, 10))
+        for i in range(expenses)
+    ]
+    periods = [make_period(2024, month + 1, [purchase.payments[month] for purchase in purchases]) for month in range(installments)]
+    entries = [
+        StatementEntry(purchase.payments[month].id, Amount(100 + month), PaymentStatus.CONFIRMED if month % 2 else PaymentStatus.PAID)
+        for purchase in purchases for month in range(installments // 2)
+    ]
+    return purchases, periods, entries
+
+
+def time_single_updates(user) -> float:
+    purchases, periods, entries = build_statement(user)
+    payments = {payment.id: payment for purchase in purchases for payment in purchase.payments}
+    period_of = {payment.id: period for period in periods for payment in period.payments}
+    start = time.perf_counter()
+    for entry in entries:
+        payment = payments[entry.payment_id]
+        payment.expense.update_payment(Payment(
+            payment.expense, entry.amount, payment.no_installment, entry.status, payment.payment_date, payment.id
+        ))
+        period_of[payment.id].total_amount
+    return time.perf_counter() - start
+
+
+def time_batch(user) -> float:
+    purchases, periods, entries = build_statement(user)
+    start = time.perf_counter()
+    PaymentBatchProcessor(purchases, periods).apply(entries)
+    return time.perf_counter() - start
+
+
+def best_of(runs: int, benchmark, *args) -> float:
+    'Get the best time of several runs, with the garbage collector off like `timeit`.'
+    gc.disable()
+    try:
+        return min(benchmark(*args) for _ in range(runs))
+    finally:
+        gc.enable()
+
+
+def count_calls(monkeypatch, cls, name: str, calls: dict) -> None:
+    'Count the calls to a method of a class in `calls[name]`.'
+    method = getattr(cls, name)
+    calls[name] = 0
+
+    def counted(self, *args, **kwargs):
+        calls[name] += 1
+        return method(self, *args, **kwargs)
+    monkeypatch.setattr(cls, name, counted)
+
+
+def test_batch_recomputes_each_expense_and_reads_each_period_once(user, monkeypatch):
+    purchases, periods, entries = build_statement(user, expenses=20)
+    calls = {}
+    count_calls(monkeypatch, type(purchases[0]), 'update_payments', calls)
+    count_calls(monkeypatch, type(periods[0]), 'totals_by_currency', calls)
+
+    summary = PaymentBatchProcessor(purchases, periods).apply(entries)
+
+    assert summary.updated_payments == len(entries) == 20 * 6
+    # Every installment of the purchases may be redistributed, so every period is affected
+    assert calls == {'update_payments': 20, 'totals_by_currency': len(periods)}
+    for period in periods:
+        assert summary.period_totals[period.id][Currency.ARS].value == period.total_amount.value
+
+
+@pytest.mark.benchmark
+def test_batch_is_ten_times_faster_than_single_updates(user):
+    'Benchmark: a statement of 400 purchases in 12 installments, 6 payments each.'
+    single = best_of(3, time_single_updates, user)
+    batch = best_of(5, time_batch, user)
+
+    assert single / batch >= 10, f'single {single:.3f}s, batch {batch:.3f}s, {single / batch:.1f}x'
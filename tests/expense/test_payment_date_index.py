@@ -0,0 +1,37 @@
+from datetime import date
+
+from core.expense.enums import ExpenseType
+from core.expense.models import PaymentDateIndex
+from core.shared.value_objects import Amount
+
+
+def test_subscribed_index_accepts_every_new_payment_by_default(factory):
+    index = PaymentDateIndex()
+    index.subscribe()
+
+    purchase = factory.purchase('Shop', Amount(300), date(2024, 1, 5), 3, date(2024, 2, 10))
+
+    assert [payment.id for payment in index] == [payment.id for payment in purchase.payments]
+    assert index.count(date(2024, 3, 1), date(2024, 3, 31)) == 1
+
+
+def test_subscribed_index_filters_new_payments(factory):
+    index = PaymentDateIndex(accepts=lambda payment: payment.expense.expense_type == ExpenseType.SUBSCRIPTION)
+    index.subscribe()
+
+    factory.purchase('Shop', Amount(300), date(2024, 1, 5), 3, date(2024, 2, 10))
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+
+    assert list(index) == subscription.payments
+
+
+def test_subscribed_index_follows_date_changes_and_removals(factory):
+    index = PaymentDateIndex()
+    index.subscribe()
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    payment = subscription.payments[0]
+
+    payment.payment_date = date(2024, 5, 10)
+    assert index.month(2024, 5) == [payment] and index.month(2024, 1) == []
+    subscription.remove_payment(payment.id)
+    assert len(index) == 0
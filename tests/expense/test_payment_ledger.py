@@ -0,0 +1,89 @@
+import threading
+from datetime import date
+
+from core.expense.enums import PaymentStatus
+from core.expense.services.payment_ledger import LedgerRecordKind, PaymentLedger, expense_from_state, expense_to_state
+from core.shared.value_objects import Amount
+
+
+def test_first_event_is_recorded_after_the_snapshot(tmp_path, card, purchase):
+    with PaymentLedger(str(tmp_path / 'ledger.bin')) as ledger:
+        ledger.subscribe()
+        purchase.payments[0].status = PaymentStatus.PAID
+
+        kinds = [kind for kind, _ in ledger.history(purchase.id)]
+        assert kinds == [LedgerRecordKind.EXPENSE_SNAPSHOT, LedgerRecordKind.PAYMENT_UPDATED]
+        rebuilt = ledger.rebuild(purchase.id, card)
+        assert [payment.status for payment in rebuilt.payments] == [
+            PaymentStatus.PAID, PaymentStatus.UNCONFIRMED, PaymentStatus.UNCONFIRMED
+        ]
+
+
+def test_expense_stored_without_payments_is_hydrated_without_payments(card, factory):
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    subscription.payments = []
+
+    hydrated = expense_from_state(expense_to_state(subscription), card)
+
+    assert hydrated.payments == []
+
+
+def test_concurrent_appends_do_not_interleave(tmp_path, card, factory):
+    path = str(tmp_path / 'ledger.bin')
+    purchases = [factory.purchase(f'Shop {i}', Amount(100), date(2024, 1, 5), 10, date(2024, 2, 10)) for i in range(8)]
+    with PaymentLedger(path, snapshot_every=5) as ledger:
+        ledger.subscribe()
+
+        def pay(purchase):
+            for payment in purchase.payments:
+                payment.status = PaymentStatus.PAID
+
+        threads = [threading.Thread(target=pay, args=(purchase,)) for purchase in purchases]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        expected = {purchase.id: len(list(ledger.history(purchase.id))) for purchase in purchases}
+
+    with PaymentLedger(path) as reopened:
+        for purchase in purchases:
+            assert len(list(reopened.history(purchase.id))) == expected[purchase.id]
+            rebuilt = reopened.rebuild(purchase.id, card)
+            assert all(payment.status == PaymentStatus.PAID for payment in rebuilt.payments)
+
+
+def test_reads_while_appending_from_other_threads(tmp_path, card, factory):
+    purchases = [factory.purchase(f'Shop {i}', Amount(100), date(2024, 1, 5), 10, date(2024, 2, 10)) for i in range(4)]
+    errors = []
+    with PaymentLedger(str(tmp_path / 'ledger.bin'), snapshot_every=3) as ledger:
+        ledger.subscribe()
+        for purchase in purchases:
+            ledger.record_snapshot(purchase)
+        done = threading.Event()
+
+        def pay(purchase):
+            for payment in purchase.payments:
+                payment.status = PaymentStatus.PAID
+
+        def read():
+            try:
+                while not done.is_set():
+                    for purchase in purchases:
+                        list(ledger.history(purchase.id))
+                        ledger.rebuild(purchase.id, card)
+            except Exception as error:
+                errors.append(error)
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        writers = [threading.Thread(target=pay, args=(purchase,)) for purchase in purchases]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        assert errors == []
+        for purchase in purchases:
+            assert all(payment.status == PaymentStatus.PAID for payment in ledger.rebuild(purchase.id, card).payments)
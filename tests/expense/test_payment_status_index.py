@@ -0,0 +1,56 @@
+from core.expense.enums import PaymentStatus
+from core.expense.models import Payment
+from core.shared.value_objects import Amount
+
+
+def test_index_groups_payments_by_status(purchase):
+    purchase.payments[0].status = PaymentStatus.PAID
+
+    assert purchase.payments_by_status(PaymentStatus.PAID) == [purchase.payments[0]]
+    assert purchase.pending_installments == 2
+    assert purchase.done_installments == 1
+
+
+def test_detached_copy_status_change_does_not_move_indexed_payment(purchase):
+    indexed = purchase.payments[0]
+    copy = Payment(purchase, Amount(100), 1, PaymentStatus.UNCONFIRMED, indexed.payment_date, indexed.id)
+
+    copy.status = PaymentStatus.PAID
+
+    assert purchase.payment_index.get(indexed.id) is indexed
+    assert purchase.payments_by_status(PaymentStatus.PAID) == []
+    indexed.status = PaymentStatus.PAID
+    assert purchase.payments_by_status(PaymentStatus.PAID) == [indexed]
+
+
+def test_update_payments_with_detached_copy(purchase):
+    indexed = purchase.payments[0]
+    copy = Payment(purchase, Amount(100), 1, PaymentStatus.UNCONFIRMED, indexed.payment_date, indexed.id)
+    copy.status = PaymentStatus.PAID
+
+    purchase.update_payments([copy])
+
+    assert indexed.status == PaymentStatus.PAID
+    assert purchase.payments_by_status(PaymentStatus.PAID) == [indexed]
+    assert purchase.pending_installments == 2
+
+
+def test_last_pending_installment_follows_status_changes(purchase):
+    first, second, third = purchase.payments
+
+    assert [payment.is_last_payment() for payment in purchase.payments] == [False, False, True]
+    third.status = PaymentStatus.PAID
+    assert purchase.payment_index.last_pending_installment() == 2
+    assert second.is_last_payment()
+    third.status = PaymentStatus.UNCONFIRMED
+    assert not second.is_last_payment() and third.is_last_payment()
+
+
+def test_last_pending_installment_follows_renumbering(purchase):
+    first, _, third = purchase.payments
+
+    third.no_installment, first.no_installment = 1, 3
+
+    assert first.is_last_payment() and not third.is_last_payment()
+    purchase.payment_index.remove(first.id)
+    assert purchase.payment_index.last_pending_installment() == 2
@@ -0,0 +1,31 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.models import Payment
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import amounts
+
+
+def test_update_payments_redistributes_remaining_amount(purchase):
+    first = purchase.payments[0]
+    update = Payment(purchase, Amount(120), 1, PaymentStatus.CONFIRMED, first.payment_date, first.id)
+
+    purchase.update_payments([update])
+
+    assert amounts(purchase.payments) == [(120, Currency.ARS), (90, Currency.ARS), (90, Currency.ARS)]
+
+
+def test_update_payments_rejects_foreign_currency(card, factory):
+    purchase = factory.purchase('Shop', Amount(300, currency=Currency.USD), date(2024, 1, 5), 3)
+    first = purchase.payments[0]
+    update = Payment(purchase, Amount(110), 1, PaymentStatus.CONFIRMED, first.payment_date, first.id)
+
+    with pytest.raises(CurrencyMismatchException):
+        purchase.update_payments([update])
+
+    assert amounts(purchase.payments) == [(100, Currency.USD)] * 3
+    assert first.status == PaymentStatus.UNCONFIRMED
+    assert purchase.pending_financing_amount.currency == Currency.USD
@@ -0,0 +1,59 @@
+from datetime import date
+
+from core.expense.services import StatementImporter
+from core.expense.services.statement_reconciliation import StatementLine
+from core.shared.value_objects import Amount
+
+
+class SavedPurchases:
+    'In-memory stand-in for the purchase repository.'
+
+    def __init__(self):
+        self.saved = []
+
+    def save_many(self, entities):
+        self.saved.extend(entities)
+        return list(entities)
+
+
+def line(day: date, description: str, amount: float) -> StatementLine:
+    return StatementLine(day, description, Amount(amount))
+
+
+def test_installments_of_one_purchase_are_imported_once(card):
+    repository = SavedPurchases()
+    importer = StatementImporter(card, repository, batch_size=2)
+
+    report = importer.import_lines([
+        line(date(2024, 3, 10), 'TV Store Cuota 1/3', 333.34),
+        line(date(2024, 4, 10), 'TV Store Cuota 2/3', 333.33),
+        line(date(2024, 5, 10), 'TV Store Cuota 3/3', 333.33),
+        line(date(2024, 5, 12), 'Pharmacy 03/12/2024', 20),
+        line(date(2024, 5, 13), 'Refund', -20),
+    ])
+
+    assert (report.rows_read, report.purchases_created, report.duplicates, report.skipped) == (5, 2, 2, 1)
+    tv, pharmacy = repository.saved
+    assert (tv.installments, tv.payments[0].amount.value) == (3, 333.34)
+    assert (pharmacy.installments, pharmacy.amount.value) == (1, 20)
+
+
+def test_existing_purchases_match_any_of_their_installment_amounts(card, factory):
+    existing = factory.purchase('TV Store', Amount(1000), date(2024, 3, 10), 3, date(2024, 3, 10))
+    repository = SavedPurchases()
+    importer = StatementImporter(card, repository, existing_expenses=[existing])
+
+    report = importer.import_lines([line(date(2024, 5, 10), 'TV Store Cuota 3/3', 333.33)])
+
+    assert (report.purchases_created, report.duplicates) == (0, 1)
+
+
+def test_dedup_window_bounds_the_imported_keys(card):
+    repository = SavedPurchases()
+    importer = StatementImporter(card, repository, dedup_window=2)
+
+    importer.import_lines([line(date(2024, 3, day), f'Shop {day}', 10) for day in range(1, 6)])
+    report = importer.import_lines([line(date(2024, 3, 5), 'Shop 5', 10), line(date(2024, 3, 1), 'Shop 1', 10)])
+
+    assert (report.duplicates, report.purchases_created) == (1, 1)
+    assert len(importer._imported) == 2
@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.services.statement_reconciliation import StatementLine, StatementReconciler
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import make_period
+
+
+@pytest.fixture
+def reconciler(factory, purchase):
+    'The period of February 2024, with the first installment of the purchase and a streaming subscription.'
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 2, 12))
+    period = make_period(2024, 2, [purchase.payments[0], subscription.payments[0]])
+    return StatementReconciler(period, date_window_days=3)
+
+
+def test_lines_are_matched_by_amount_within_the_window(reconciler, purchase):
+    result = reconciler.reconcile([StatementLine(date(2024, 2, 12), 'SHOP CUOTA 1/3', Amount(100))])
+
+    assert [match.payment for match in result.matched] == [purchase.payments[0]]
+    assert result.amount_mismatches == [] and result.unmatched == []
+
+
+def test_lines_with_a_different_amount_are_matched_by_name(reconciler):
+    result = reconciler.reconcile([StatementLine(date(2024, 2, 11), 'Streaming', Amount(12))])
+
+    [mismatch] = result.amount_mismatches
+    assert mismatch.payment.expense.title == 'Streaming'
+    assert mismatch.amount_difference.value == 2
+    [update] = result.to_payments(PaymentStatus.PAID)
+    assert update.id == mismatch.payment.id and update.amount.value == 12 and update.status == PaymentStatus.PAID
+
+
+def test_each_payment_is_used_once_and_far_lines_are_unmatched(reconciler):
+    lines = [
+        StatementLine(date(2024, 2, 10), 'Shop', Amount(100)),
+        StatementLine(date(2024, 2, 11), 'Shop', Amount(100)),
+        StatementLine(date(2024, 2, 28), 'Streaming', Amount(10)),
+    ]
+
+    result = reconciler.reconcile(lines)
+
+    assert [match.line for match in result.matched] == lines[:1]
+    assert result.unmatched == lines[1:]
+
+
+def test_amounts_only_match_in_the_same_currency(reconciler):
+    result = reconciler.reconcile([StatementLine(date(2024, 2, 10), 'Travel', Amount(100, currency=Currency.USD))])
+
+    assert result.matched == [] and len(result.unmatched) == 1
+
+
+def test_many_payments_with_the_same_amount_are_each_matched_once(factory):
+    purchases = [factory.purchase('Shop', Amount(50), date(2024, 2, 1)) for _ in range(2000)]
+    period = make_period(2024, 2, [purchase.payments[0] for purchase in purchases])
+    payment_date = purchases[0].payments[0].payment_date
+    lines = [StatementLine(payment_date, 'Shop', Amount(50)) for _ in range(2001)]
+
+    result = StatementReconciler(period).reconcile(lines)
+
+    assert {match.payment.id for match in result.matched} == {purchase.payments[0].id for purchase in purchases}
+    assert len(result.unmatched) == 1
+
+
+def test_negative_window_is_rejected():
+    with pytest.raises(ValueError):
+        StatementReconciler(make_period(2024, 2), date_window_days=-1)
@@ -0,0 +1,22 @@
+import pytest
+
+from core.expense.helpers.statements import normalize_description, parse_installment
+
+
+@pytest.mark.parametrize('description, expected', [
+    ('Cuota 3/12', (3, 12)),
+    ('MERCADOLIBRE C.03/12', (3, 12)),
+    ('cuotas 2/6 Shop', (2, 6)),
+    ('MERCADOLIBRE 03/12', (3, 12)),
+    ('Compra 03/12/2024 Shop', None),
+    ('MERCADOLIBRE 03/12/2024', None),
+    ('Shop 03/12 online', None),
+    ('Cuota 13/12', None),
+])
+def test_parse_installment(description, expected):
+    assert parse_installment(description) == expected
+
+
+def test_normalize_description_keeps_dates():
+    assert normalize_description('Farmacia  03/12/2024') == 'farmacia 03 12 2024'
+    assert normalize_description('MercadoLibre C.03/12') == 'mercadolibre'
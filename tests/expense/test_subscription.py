@@ -0,0 +1,23 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.models import Payment
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import amounts
+
+
+def test_update_payment_rejects_foreign_currency(card, factory):
+    subscription = factory.subscription('Streaming', Amount(10, currency=Currency.USD), date(2024, 1, 5))
+    payment = subscription.payments[0]
+    update = Payment(subscription, Amount(11), 1, PaymentStatus.CONFIRMED, payment.payment_date, payment.id)
+
+    with pytest.raises(CurrencyMismatchException):
+        subscription.update_payment(payment.id, update)
+    with pytest.raises(CurrencyMismatchException):
+        subscription.update_payments([update])
+
+    assert subscription.payments == [payment]
+    assert amounts(subscription.payments) == [(10, Currency.USD)]
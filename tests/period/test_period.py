@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.models import Payment
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import make_period
+
+
+def test_zero_total_in_another_currency_is_ignored(purchase, factory):
+    refund = factory.subscription('Refund', Amount(0, currency=Currency.USD), date(2024, 2, 1), date(2024, 2, 15))
+    period = make_period(2024, 2, [purchase.payments[0], refund.payments[0]])
+
+    assert period.total_amount.value == 100
+    assert period.total_one_time_payments.value == 0
+    assert period.total_last_payments.value == 0
+
+
+def test_totals_in_several_currencies_need_a_converter(purchase, factory, converter):
+    travel = factory.purchase('Travel', Amount(5, currency=Currency.USD), date(2024, 2, 1))
+    period = make_period(2024, 2, [purchase.payments[0], travel.payments[0]])
+
+    with pytest.raises(CurrencyMismatchException):
+        period.total_amount
+    assert period.total_in(converter, Currency.ARS).value == 150
@@ -0,0 +1,81 @@
+from datetime import date
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.period.services import SpendingAlertEvaluator, SpendingLimitReached, evaluate_month
+from core.shared.events import dispatcher
+from core.shared.exceptions import CurrencyMismatchException
+from core.shared.value_objects import Amount, Currency
+from tests.conftest import make_period
+
+
+def test_evaluator_publishes_each_crossed_threshold_once(user, card, factory):
+    alerts = []
+    dispatcher.subscribe(SpendingLimitReached, alerts.append)
+    evaluator = SpendingAlertEvaluator()
+    evaluator.set_limit(user.id, Amount(1000))
+    evaluator.subscribe()
+
+    first = factory.purchase('First', Amount(850), date(2024, 3, 1))
+    factory.purchase('Second', Amount(100), date(2024, 3, 2))
+    factory.purchase('Third', Amount(100), date(2024, 3, 3))
+    first.payments[0].status = PaymentStatus.CANCELED
+
+    assert [alert.threshold for alert in alerts] == [0.8, 1.0]
+    assert evaluator.spent(user.id, 2024, 3).value == 200
+
+
+def test_evaluate_month_reports_highest_threshold(user, factory):
+    user.profile.alert_preferences.monthly_spending_limit = Amount(1000)
+    periods = [
+        make_period(2024, 3, [factory.purchase('Shop', Amount(900), date(2024, 3, 1)).payments[0]]),
+        make_period(2024, 4, [factory.purchase('Shop', Amount(5000), date(2024, 4, 1)).payments[0]]),
+    ]
+
+    alerts = evaluate_month([(user, periods)], 2024, 3)
+
+    assert [(alert.user_id, alert.threshold, alert.spent.value) for alert in alerts] == [(user.id, 0.8, 900)]
+
+
+def test_users_without_profile_have_no_limit(factory):
+    user = SimpleNamespace(id=uuid4(), profile=None)
+    periods = [make_period(2024, 3, [factory.purchase('Shop', Amount(900), date(2024, 3, 1)).payments[0]])]
+    evaluator = SpendingAlertEvaluator()
+
+    evaluator.set_limit_from_user(user)
+
+    assert evaluate_month([(user, periods)], 2024, 3) == []
+
+
+def test_foreign_currency_spend_is_kept_apart_or_converted(user, factory, converter):
+    alerts = []
+    dispatcher.subscribe(SpendingLimitReached, alerts.append)
+    apart = SpendingAlertEvaluator()
+    converted = SpendingAlertEvaluator(converter=converter, dispatcher=dispatcher)
+    for evaluator in (apart, converted):
+        evaluator.set_limit(user.id, Amount(1000))
+        evaluator.subscribe()
+
+    factory.purchase('Shop', Amount(500), date(2024, 3, 1))
+    factory.purchase('Trip', Amount(40, currency=Currency.USD), date(2024, 3, 2))
+
+    assert [alert.spent.value for alert in alerts] == [900]
+    with pytest.raises(CurrencyMismatchException):
+        apart.spent(user.id, 2024, 3)
+    assert apart.spent_by_currency(user.id, 2024, 3)[Currency.USD].value == 40
+
+
+def test_evaluate_month_raises_or_converts_mixed_currencies(user, factory, converter):
+    user.profile.alert_preferences.monthly_spending_limit = Amount(1000)
+    periods = [make_period(2024, 3, [
+        factory.purchase('Shop', Amount(500), date(2024, 3, 1)).payments[0],
+        factory.purchase('Trip', Amount(40, currency=Currency.USD), date(2024, 3, 2)).payments[0],
+    ])]
+
+    with pytest.raises(CurrencyMismatchException):
+        evaluate_month([(user, periods)], 2024, 3)
+    alerts = evaluate_month([(user, periods)], 2024, 3, converter=converter)
+    assert [(alert.threshold, alert.spent.value) for alert in alerts] == [(0.8, 900)]
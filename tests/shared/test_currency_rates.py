@@ -0,0 +1,53 @@
+import io
+from datetime import date
+
+import pytest
+
+from core.shared.currency_rates import RateTable, available_amount, group_by_currency, single_currency_total
+from core.shared.exceptions import CurrencyMismatchException, ExchangeRateNotFoundException
+from core.shared.value_objects import Amount, Currency
+
+
+def test_rate_in_force_is_the_latest_on_or_before_the_date():
+    rates = RateTable(Currency.ARS)
+    loaded = rates.load_csv(io.StringIO('date,currency,rate\n2024-01-01,usd,800\n2024-02-01,USD,850\n'))
+
+    assert loaded == 2
+    assert rates.rate(Currency.USD, date(2024, 1, 31)) == 800
+    assert rates.rate(Currency.USD, date(2024, 3, 1)) == 850
+    assert rates.rate(Currency.ARS, date(2000, 1, 1)) == 1.0
+    rates.add_rate(Currency.USD, date(2024, 1, 15), 820)
+    assert rates.rate(Currency.USD, date(2024, 1, 31)) == 820
+    with pytest.raises(ExchangeRateNotFoundException):
+        rates.rate(Currency.USD, date(2023, 12, 31))
+
+
+def test_totals_are_grouped_in_cents_and_converted_once_per_currency(converter):
+    amounts = [Amount(0.1), Amount(0.2), Amount(1.5, currency=Currency.USD), Amount(2.25, currency=Currency.USD)]
+
+    totals = group_by_currency(amounts)
+
+    assert {currency: total.value for currency, total in totals.items()} == {Currency.ARS: 0.3, Currency.USD: 3.75}
+    assert converter.convert_totals(totals, Currency.ARS, date(2024, 1, 1)).value == 37.8
+    assert converter.total(amounts, Currency.USD, date(2024, 1, 1)).value == 3.78
+    assert converter.convert(Amount(5, currency=Currency.USD), Currency.ARS, date(2024, 1, 1)).value == 50
+
+
+def test_single_currency_total_rejects_mixed_currencies():
+    usd = Amount(10, currency=Currency.USD)
+
+    assert single_currency_total({Currency.ARS: Amount(0), Currency.USD: usd}) is usd
+    assert single_currency_total({}, Currency.USD).currency == Currency.USD
+    with pytest.raises(CurrencyMismatchException):
+        single_currency_total({Currency.ARS: Amount(1), Currency.USD: usd})
+    with pytest.raises(CurrencyMismatchException):
+        single_currency_total({Currency.USD: usd}, Currency.ARS)
+
+
+def test_available_amount_converts_only_with_a_converter(converter):
+    pending = {Currency.ARS: Amount(100), Currency.USD: Amount(5, currency=Currency.USD)}
+
+    assert available_amount(Amount(1000), pending, converter, date(2024, 1, 1)).value == 850
+    assert available_amount(Amount(1000), {Currency.ARS: Amount(100)}).value == 900
+    with pytest.raises(CurrencyMismatchException):
+        available_amount(Amount(1000), pending)
@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import date
+
+import pytest
+
+from core.expense.enums import PaymentStatus
+from core.expense.events import PaymentAdded, PaymentUpdated
+from core.expense.models import Payment
+from core.shared.entity_base import EntityBase, after_unlock, synchronized
+from core.shared.events import dispatcher
+from core.shared.helpers.amounts import to_cents
+from core.shared.value_objects import Amount
+
+THREADS = 4
+ROUNDS = 200
+
+
+def _toggle(purchase, rounds: int) -> None:
+    'Pay and unpay each installment of a purchase in turn, in batches.'
+    for round in range(rounds):
+        payment = purchase.payments[round % len(purchase.payments)]
+        status = PaymentStatus.UNCONFIRMED if payment.status == PaymentStatus.PAID else PaymentStatus.PAID
+        purchase.update_payments([Payment(purchase, payment.amount, payment.no_installment, status, payment.payment_date, payment.id)])
+
+
+def _run(threads) -> float:
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads), 'deadlocked'
+    return time.perf_counter() - started_at
+
+
+def test_after_unlock_runs_callbacks_once_every_lock_is_released(purchase):
+    held = []
+    observed = []
+
+    @synchronized
+    def mutate(expense):
+        after_unlock(lambda: observed.append(purchase.lock._is_owned()))
+        held.append(purchase.lock._is_owned())
+
+    mutate(purchase)
+    after_unlock(observed.append, 'now')
+
+    assert held == [True]
+    assert observed == [False, 'now']
+
+
+def test_payment_setters_wait_for_the_expense_lock(purchase):
+    payment = purchase.payments[0]
+    changed = threading.Event()
+
+    def change():
+        payment.amount = Amount(50)
+        payment.payment_date = date(2024, 3, 1)
+        changed.set()
+
+    with purchase.lock:
+        thread = threading.Thread(target=change, daemon=True)
+        thread.start()
+        assert not changed.wait(0.05)
+    thread.join(timeout=5)
+
+    assert changed.is_set()
+    assert payment.amount.value == 50 and payment.payment_date == date(2024, 3, 1)
+
+
+def test_detached_payment_setters_need_no_expense():
+    payment = Payment(None, Amount(100), 1)
+    dispatcher.subscribe(PaymentUpdated, lambda event: None)
+
+    payment.status = PaymentStatus.PAID
+    payment.amount = Amount(50)
+    payment.payment_date = date(2024, 3, 1)
+
+    assert payment.status == PaymentStatus.PAID
+    assert payment.amount.value == 50 and payment.payment_date == date(2024, 3, 1)
+
+
+def test_concurrent_updates_on_one_card_keep_the_invariants(card, factory):
+    purchases = [
+        factory.purchase(f'Shop {i}', Amount(1200), date(2024, 1, 5), 12, date(2024, 2, 10)) for i in range(THREADS)
+    ]
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5), date(2024, 1, 10))
+    card.expenses.extend([*purchases, subscription])
+    errors = []
+
+    def on_payment_updated(event: PaymentUpdated) -> None:
+        # Touch the other expenses of the card, which deadlocks if the handler runs under the lock
+        for expense in card.expenses:
+            if expense is not event.payment.expense and expense is not subscription:
+                expense.update_status()
+
+    def add_subscription_payments() -> None:
+        for _ in range(ROUNDS // 10):
+            with subscription.lock:
+                subscription.add_new_payment(subscription.get_next_payment())
+
+    def guarded(target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as error:  # Collected, a thread swallows its exceptions
+                errors.append(error)
+        return threading.Thread(target=run, daemon=True)
+
+    added = []
+    dispatcher.subscribe(PaymentUpdated, on_payment_updated)
+    dispatcher.subscribe(PaymentAdded, added.append)
+    threads = [guarded(_toggle, purchase, ROUNDS) for purchase in purchases]
+    threads.append(guarded(add_subscription_payments))
+    _run(threads)
+
+    assert errors == []
+    for purchase in purchases:
+        counts = purchase.count_payments_by_status()
+        assert sum(counts.values()) == len(purchase.payments) == 12
+        assert sum(to_cents(payment.amount) for payment in purchase.payments) == 120000
+        assert purchase.pending_installments == counts.get(PaymentStatus.UNCONFIRMED, 0)
+    assert [payment.no_installment for payment in subscription.payments] == list(range(1, ROUNDS // 10 + 2))
+    dates = [payment.payment_date for payment in subscription.payments]
+    assert dates == sorted(set(dates))
+    assert len(added) == ROUNDS // 10
+
+
+class _NoLock:
+    'Stands in for the entity locks to measure what they cost.'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+@pytest.mark.benchmark
+def test_lock_overhead(card, factory, monkeypatch):
+    purchase = factory.purchase('Shop', Amount(1200), date(2024, 1, 5), 12, date(2024, 2, 10))
+    card.expenses.append(purchase)
+
+    def best_of(rounds: int = 5) -> float:
+        best = float('inf')
+        for _ in range(rounds):
+            started_at = time.perf_counter()
+            _toggle(purchase, ROUNDS)
+            best = min(best, time.perf_counter() - started_at)
+        return best
+
+    locked = best_of()
+    no_lock = _NoLock()
+    monkeypatch.setattr(EntityBase, 'lock', property(lambda self: no_lock))
+    unlocked = best_of()
+
+    ratio = locked / unlocked
+    print(f'locked {ROUNDS / locked:.0f} updates/s, unlocked {ROUNDS / unlocked:.0f} updates/s, ratio {ratio:.2f}')
+    assert ratio < 2, f'the locks make the updates {ratio:.2f} times slower'
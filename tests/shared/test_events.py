@@ -0,0 +1,32 @@
+import threading
+
+from core.shared.events import DomainEvent, EventDispatcher
+
+
+class Pinged(DomainEvent):
+    def __init__(self, source: str):
+        self.source = source
+
+
+def test_muting_only_drops_the_events_of_the_muting_thread():
+    dispatcher = EventDispatcher()
+    received = []
+    dispatcher.subscribe(Pinged, lambda event: received.append(event.source))
+    muted = threading.Event()
+    done = threading.Event()
+
+    def publish_while_muted():
+        with dispatcher.muted():
+            dispatcher.emit(Pinged, 'muted thread')
+            muted.set()
+            done.wait(5)
+
+    thread = threading.Thread(target=publish_while_muted)
+    thread.start()
+    muted.wait(5)
+    dispatcher.emit(Pinged, 'other thread')
+    done.set()
+    thread.join()
+    dispatcher.emit(Pinged, 'after')
+
+    assert received == ['other thread', 'after']
@@ -0,0 +1,63 @@
+import time
+from datetime import date
+
+import pytest
+
+from core.shared.instrumentation import InMemorySink, PrometheusTextSink, SamplingProfiler, instrumentation
+from core.shared.value_objects import Amount
+
+
+@pytest.fixture
+def recording():
+    'Record the instrumented operations during a test.'
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_disabled_instrumentation_records_nothing(factory):
+    instrumentation.reset()
+
+    factory.purchase('Shop', Amount(300), date(2024, 1, 5), 3)
+
+    assert instrumentation.stats() == []
+
+
+def test_instrumented_calls_are_recorded_with_their_items(recording, factory):
+    factory.purchase('Shop', Amount(1200), date(2024, 1, 5), 12)
+    with recording.measure('custom', items=5):
+        pass
+
+    stats = {operation.name: operation for operation in recording.stats()}
+    assert stats['purchase.calculate_payments'].calls == 1
+    assert stats['purchase.calculate_payments'].items_scanned == 12
+    assert stats['custom'].items_scanned == 5
+
+
+def test_export_sends_the_stats_to_the_sinks_and_resets(recording):
+    memory = InMemorySink()
+    prometheus = PrometheusTextSink(prefix='test')
+    recording.add_sink(memory)
+    recording.add_sink(prometheus)
+    try:
+        recording.record('ledger.append', 0.5, items=2)
+        recording.export(reset=True)
+    finally:
+        recording.remove_sink(memory)
+        recording.remove_sink(prometheus)
+
+    assert memory.latest['ledger.append'].calls == 1
+    assert 'test_operation_calls_total{operation="ledger.append"} 1' in prometheus.text
+    assert recording.stats() == []
+
+
+def test_sampling_profiler_samples_the_busy_thread():
+    with SamplingProfiler(interval=0.001) as profiler:
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            pass
+
+    assert profiler.samples > 0
+    assert 'test_sampling_profiler_samples_the_busy_thread' in profiler.top(1)[0][0]
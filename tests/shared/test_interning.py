@@ -0,0 +1,62 @@
+import threading
+from datetime import date
+
+import pytest
+
+from core.expense.services.compact_records import compact_expense, expand_expense
+from core.shared.helpers.interning import StringInterner
+from core.shared.value_objects import Amount
+
+
+def test_intern_keeps_one_copy_of_equal_strings():
+    interner = StringInterner()
+    first = interner.intern(''.join(['Stream', 'ing']))
+    second = ''.join(['Stream', 'ing'])
+
+    assert interner.intern(second) is first
+    assert interner.hits == 1 and interner.saved_bytes > 0
+
+
+def test_full_interner_stops_growing():
+    interner = StringInterner(max_size=2)
+    interner.intern('a')
+    interner.code('b')
+    new = ''.join(['c', 'd'])
+
+    assert interner.is_full
+    assert interner.intern(new) is new
+    assert len(interner) == 2 and new not in interner
+    with pytest.raises(ValueError):
+        interner.code(new)
+    assert interner.value(interner.code('a')) == 'a'
+
+
+def test_counters_are_exact_under_concurrent_lookups():
+    interner = StringInterner()
+    names = [f'name {i}' for i in range(50)]
+    for name in names:
+        interner.intern(name)
+
+    def look_up():
+        for _ in range(200):
+            for name in names:
+                interner.intern(''.join([name]))
+
+    threads = [threading.Thread(target=look_up) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(interner) == 50
+    assert interner.hits == 4 * 200 * 50
+
+
+def test_compact_record_round_trip(card, factory):
+    interner = StringInterner()
+    purchase = factory.purchase('Shop', Amount(300), date(2024, 1, 5), 3, date(2024, 2, 10))
+
+    expanded = expand_expense(compact_expense(purchase, interner), card, interner)
+
+    assert expanded.id == purchase.id and expanded.title == 'Shop'
+    assert [payment.payment_date for payment in expanded.payments] == [payment.payment_date for payment in purchase.payments]
@@ -0,0 +1,73 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import core
+
+SOURCE_ROOT = os.path.dirname(os.path.dirname(core.__file__))
+
+
+def _modules():
+    'Get the name of every module of the package.'
+    names = []
+    for root, directories, files in os.walk(os.path.dirname(core.__file__)):
+        directories[:] = sorted(directory for directory in directories if directory != '__pycache__')
+        for file in sorted(files):
+            if file.endswith('.py'):
+                name = os.path.relpath(os.path.join(root, file[:-3]), SOURCE_ROOT).replace(os.sep, '.')
+                names.append(name[:-len('.__init__')] if name.endswith('.__init__') else name)
+    return names
+
+
+def _python(code: str) -> subprocess.Popen:
+    'Start a fresh interpreter that runs some code with the sources on the path.'
+    env = dict(os.environ, PYTHONPATH=SOURCE_ROOT)
+    return subprocess.Popen([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def _run(code: str):
+    process = _python(code)
+    stdout, stderr = process.communicate(timeout=60)
+    assert process.returncode == 0, stderr
+    return json.loads(stdout)
+
+
+LOADED = 'import json, sys; print(json.dumps(sorted(name for name in sys.modules if name.startswith("core"))))'
+TIMED = 'import json, time; started_at = time.perf_counter(); {}; print(json.dumps(time.perf_counter() - started_at))'
+
+
+def test_every_module_imports_on_its_own():
+    'Guards against import cycles, which only show when a module is the first one imported.'
+    modules = _modules()
+    processes = {module: _python(f'import {module}') for module in modules}
+    failures = {}
+    for module, process in processes.items():
+        _, stderr = process.communicate(timeout=60)
+        if process.returncode != 0:
+            failures[module] = stderr.strip().splitlines()[-1]
+
+    assert len(modules) > 50
+    assert failures == {}
+
+
+def test_importing_a_domain_does_not_load_the_others():
+    assert _run(f'import core.user; {LOADED}') == [
+        'core', 'core.shared', 'core.shared.helpers', 'core.shared.helpers.lazy_imports', 'core.user'
+    ]
+    loaded = _run(f'import core.user; core.user.User; {LOADED}')
+    assert 'core.user.models.user' in loaded
+    assert {name.split('.')[1] for name in loaded if '.' in name}.isdisjoint({'account', 'expense', 'period'})
+    assert len(loaded) * 3 <= len(_modules())
+
+
+@pytest.mark.benchmark
+def test_lazy_import_is_faster_than_loading_every_module():
+    'Benchmark: the import time of the user domain against importing every module.'
+    eager_code = '; '.join(f'import {module}' for module in _modules())
+    lazy = min(_run(TIMED.format('import core.user; core.user.User')) for _ in range(3))
+    eager = min(_run(TIMED.format(eager_code)) for _ in range(3))
+
+    assert eager / lazy >= 3, f'lazy {lazy * 1000:.1f}ms, eager {eager * 1000:.1f}ms'
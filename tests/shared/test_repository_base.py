@@ -0,0 +1,59 @@
+import copy
+
+import pytest
+
+from core.shared.exceptions import StaleEntityException
+from core.shared.interfaces.repository_base import RepositoryBase
+from core.user.models import User
+
+
+class MemoryRepository(RepositoryBase[User]):
+    def __init__(self, fail_writes: bool = False):
+        self.stored = {}
+        self.fail_writes = fail_writes
+
+    def _save(self, entity, version):
+        if self.fail_writes:
+            raise OSError('disk full')
+        stored = copy.copy(entity)
+        stored.version = version
+        self.stored[entity.id] = stored
+        return entity
+
+    def get_by_id(self, id):
+        return self.stored.get(id)
+
+    get_paginated = get_one = delete = count = exists = None
+
+
+def test_save_bumps_the_version_after_writing():
+    repository = MemoryRepository()
+    user = User('user', 'user@example.com', 'secret')
+
+    repository.save(user)
+    repository.save_many([user])
+
+    assert user.version == repository.stored[user.id].version == 2
+
+
+def test_saving_an_entity_saved_by_someone_else_is_rejected():
+    repository = MemoryRepository()
+    user = User('user', 'user@example.com', 'secret')
+    repository.save(user)
+    other_copy = copy.copy(user)
+    repository.save(other_copy)
+
+    with pytest.raises(StaleEntityException):
+        repository.save(user)
+    with pytest.raises(StaleEntityException):
+        repository.save_many([user])
+    assert user.version == 1
+
+
+def test_failed_write_keeps_the_version():
+    repository = MemoryRepository(fail_writes=True)
+    user = User('user', 'user@example.com', 'secret')
+
+    with pytest.raises(OSError):
+        repository.save(user)
+    assert user.version == 0
@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from core.expense.enums import ExpenseStatus
+from core.shared.value_objects import Amount
+from core.user.enums import QuotaResource, Role
+from core.user.exceptions import QuotaExceededException, RateLimitExceededException
+from core.user.services.quota_enforcer import QuotaEnforcer, QuotaPolicy
+from tests.conftest import ConcreteCreditCard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_counters_follow_saved_and_deleted_entities(user, card, factory):
+    enforcer = QuotaEnforcer()
+    subscription = factory.subscription('Streaming', Amount(10), date(2024, 1, 5))
+
+    enforcer.on_saved(card)
+    enforcer.on_saved(subscription)
+
+    assert enforcer.usage(user.id, QuotaResource.CREDIT_CARDS) == 1
+    assert enforcer.usage(user.id, QuotaResource.ACTIVE_SUBSCRIPTIONS) == 1
+    assert enforcer.usage(user.id, QuotaResource.MONTHLY_EXPENSES, on=date(2024, 1, 20)) == 1
+    assert enforcer.usage(user.id, QuotaResource.MONTHLY_EXPENSES, on=date(2024, 2, 1)) == 0
+
+    previous = factory.subscription('Streaming', Amount(10), date(2024, 1, 5))
+    subscription.status = ExpenseStatus.CANCELLED
+    enforcer.on_saved(subscription, previous)
+    enforcer.on_deleted(card)
+    assert enforcer.usage(user.id, QuotaResource.ACTIVE_SUBSCRIPTIONS) == 0
+    assert enforcer.usage(user.id, QuotaResource.CREDIT_CARDS) == 0
+
+
+def test_check_raises_when_the_plan_limit_would_be_exceeded(user):
+    enforcer = QuotaEnforcer()
+    for _ in range(2):
+        enforcer.on_saved(ConcreteCreditCard(user, 'visa', Amount(1000)))
+
+    assert enforcer.remaining(user, QuotaResource.CREDIT_CARDS) == 0
+    with pytest.raises(QuotaExceededException):
+        enforcer.check(user, QuotaResource.CREDIT_CARDS)
+    user.role = Role.ADMIN
+    enforcer.check(user, QuotaResource.CREDIT_CARDS)
+    assert enforcer.remaining(user, QuotaResource.CREDIT_CARDS) is None
+
+
+def test_requests_are_rate_limited_by_a_token_bucket(user):
+    clock = FakeClock()
+    enforcer = QuotaEnforcer({Role.FREE_USER: QuotaPolicy({}, requests_per_minute=60, burst=2)}, clock=clock)
+    enforcer.allow_request(user)
+    enforcer.allow_request(user)
+
+    with pytest.raises(RateLimitExceededException) as raised:
+        enforcer.allow_request(user)
+    assert raised.value.retry_after == pytest.approx(1.0)
+    clock.now = 1.0
+    enforcer.allow_request(user)
+
+
+def test_reconcile_resets_a_drifted_counter(user):
+    class Repository:
+        def count(self, filter=None):
+            return 3
+
+    enforcer = QuotaEnforcer()
+    enforcer.increment(user.id, QuotaResource.CREDIT_CARDS, 5)
+
+    assert enforcer.reconcile(user.id, QuotaResource.CREDIT_CARDS, Repository(), filter=None) == -2
+    assert enforcer.usage(user.id, QuotaResource.CREDIT_CARDS) == 3